@@ -0,0 +1,242 @@
+"""
+Services d'activité : agrégats quotidiens (jour × catégorie × genre) pour les statistiques
+"""
+
+import datetime
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from .models import Book, CustomUser, Loan, Reservation, BookPurchase, Payment, DailyActivity
+
+
+class DailyActivityService:
+    """
+    Maintien de la table DailyActivity.
+
+    Chaque ligne source (emprunt, réservation, achat, paiement) apporte une contribution
+    à un ou plusieurs agrégats ; à chaque modification, la différence entre la nouvelle
+    et l'ancienne contribution est appliquée par des UPDATE ... SET x = x + delta.
+    """
+
+    METRICS = ('loans_started', 'returns', 'reservations', 'purchases', 'revenue', 'late_fees')
+    REVENUE_PAYMENT_TYPES = ('purchase',)
+    LATE_FEE_PAYMENT_TYPES = ('late_fee', 'fine')
+
+    # ----- Contributions -----
+
+    @staticmethod
+    def primary_genre_id(book_id):
+        """Genre principal d'un livre (premier par ordre alphabétique), None s'il n'en a pas"""
+        if book_id is None:
+            return None
+        return Book.genres.through.objects.filter(book_id=book_id).order_by(
+            'genre__name'
+        ).values_list('genre_id', flat=True).first()
+
+    @staticmethod
+    def primary_genres():
+        """Genre principal de tous les livres : {livre: genre}"""
+        genres = {}
+        rows = Book.genres.through.objects.order_by('book_id', '-genre__name').values_list('book_id', 'genre_id')
+        for book_id, genre_id in rows.iterator():
+            genres[book_id] = genre_id
+        return genres
+
+    @staticmethod
+    def user_category(user_id):
+        return CustomUser.objects.filter(pk=user_id).values_list('category', flat=True).first() or ''
+
+    @classmethod
+    def payment_book_id(cls, payment):
+        if payment.payment_type in cls.REVENUE_PAYMENT_TYPES and payment.purchase_id:
+            return BookPurchase.objects.filter(pk=payment.purchase_id).values_list('book_id', flat=True).first()
+        if payment.payment_type in cls.LATE_FEE_PAYMENT_TYPES and payment.loan_id:
+            return Loan.objects.filter(pk=payment.loan_id).values_list('book_id', flat=True).first()
+        return None
+
+    @classmethod
+    def events(cls, instance):
+        """Événements datés d'une ligne source : [(date, indicateur, valeur, livre)]"""
+        if isinstance(instance, Loan):
+            events = [(instance.loan_date, 'loans_started', 1, instance.book_id)]
+            if instance.return_date:
+                events.append((instance.return_date, 'returns', 1, instance.book_id))
+            return events
+        if isinstance(instance, Reservation):
+            return [(instance.reservation_date, 'reservations', 1, instance.book_id)]
+        if isinstance(instance, BookPurchase):
+            return [(instance.purchase_date, 'purchases', 1, instance.book_id)]
+        if isinstance(instance, Payment) and instance.status == 'completed':
+            if instance.payment_type in cls.REVENUE_PAYMENT_TYPES:
+                return [(instance.payment_date, 'revenue', instance.amount, cls.payment_book_id(instance))]
+            if instance.payment_type in cls.LATE_FEE_PAYMENT_TYPES:
+                return [(instance.payment_date, 'late_fees', instance.amount, cls.payment_book_id(instance))]
+        return []
+
+    @classmethod
+    def contributions(cls, instance, lookups=None):
+        """
+        {(jour, catégorie, genre): {indicateur: valeur}} apportés par une ligne source ;
+        lookups mémorise catégories et genres lus (partagé entre pre_save et post_save).
+        """
+        events = [event for event in cls.events(instance) if event[0] is not None]
+        if not events:
+            return {}
+
+        lookups = {} if lookups is None else lookups
+        if ('category', instance.user_id) not in lookups:
+            lookups[('category', instance.user_id)] = cls.user_category(instance.user_id)
+        category = lookups[('category', instance.user_id)]
+        result = defaultdict(lambda: defaultdict(int))
+        for date, metric, value, book_id in events:
+            if ('genre', book_id) not in lookups:
+                lookups[('genre', book_id)] = cls.primary_genre_id(book_id)
+            result[(timezone.localdate(date), category, lookups[('genre', book_id)])][metric] += value
+        return result
+
+    @staticmethod
+    def difference(new, old):
+        """Contributions new - old, sans les valeurs nulles"""
+        deltas = {}
+        for key in set(new) | set(old):
+            metrics = {}
+            for metric in set(new.get(key, {})) | set(old.get(key, {})):
+                delta = new.get(key, {}).get(metric, 0) - old.get(key, {}).get(metric, 0)
+                if delta:
+                    metrics[metric] = delta
+            if metrics:
+                deltas[key] = metrics
+        return deltas
+
+    @classmethod
+    def apply(cls, deltas):
+        """Ajoute les deltas aux agrégats, en créant les lignes manquantes"""
+        for (day, category, genre_id), metrics in deltas.items():
+            rows = DailyActivity.objects.filter(day=day, user_category=category, genre_id=genre_id)
+            if rows.update(**{metric: F(metric) + value for metric, value in metrics.items()}):
+                continue
+            try:
+                with transaction.atomic():
+                    DailyActivity.objects.create(day=day, user_category=category, genre_id=genre_id, **metrics)
+            except IntegrityError:
+                # Ligne créée entre-temps par une autre transaction
+                rows.update(**{metric: F(metric) + value for metric, value in metrics.items()})
+
+    @classmethod
+    def record_change(cls, instance, before, lookups=None):
+        """Applique la différence entre l'état enregistré et l'état précédent (pre_save)"""
+        cls.apply(cls.difference(cls.contributions(instance, lookups), before))
+
+    @classmethod
+    def record_delete(cls, instance):
+        cls.apply(cls.difference({}, cls.contributions(instance)))
+
+    @classmethod
+    def previous_contributions(cls, instance, lookups=None):
+        """Contributions de la ligne telle qu'elle est en base (avant enregistrement)"""
+        if instance.pk is None:
+            return {}
+        previous = type(instance).objects.filter(pk=instance.pk).first()
+        return cls.contributions(previous, lookups) if previous else {}
+
+    # ----- Reconstruction -----
+
+    @classmethod
+    def source_rows(cls, start, end):
+        """Agrégats bruts des tables sources : [(jour, catégorie, livre, indicateur, valeur)]"""
+        sources = [
+            (Loan.objects.all(), 'loan_date', 'book_id', 'loans_started', Count('pk')),
+            (Loan.objects.filter(return_date__isnull=False), 'return_date', 'book_id', 'returns', Count('pk')),
+            (Reservation.objects.all(), 'reservation_date', 'book_id', 'reservations', Count('pk')),
+            (BookPurchase.objects.all(), 'purchase_date', 'book_id', 'purchases', Count('pk')),
+            (
+                Payment.objects.filter(status='completed', payment_type__in=cls.REVENUE_PAYMENT_TYPES),
+                'payment_date', 'purchase__book_id', 'revenue', Sum('amount'),
+            ),
+            (
+                Payment.objects.filter(status='completed', payment_type__in=cls.LATE_FEE_PAYMENT_TYPES),
+                'payment_date', 'loan__book_id', 'late_fees', Sum('amount'),
+            ),
+        ]
+        for queryset, date_field, book_field, metric, aggregate in sources:
+            rows = queryset.filter(**{
+                f'{date_field}__date__gte': start,
+                f'{date_field}__date__lte': end,
+            }).order_by().annotate(
+                day=TruncDate(date_field),
+                activity_book=F(book_field),
+                activity_category=F('user__category'),
+            ).values('day', 'activity_category', 'activity_book').annotate(
+                value=aggregate
+            ).values_list('day', 'activity_category', 'activity_book', 'value')
+            for day, category, book_id, value in rows.iterator():
+                yield day, category, book_id, metric, value
+
+    @classmethod
+    def rebuild(cls, start, end):
+        """Recalcule les agrégats des jours start à end inclus ; retourne le nombre de lignes"""
+        genres = cls.primary_genres()
+        totals = defaultdict(lambda: defaultdict(int))
+        for day, category, book_id, metric, value in cls.source_rows(start, end):
+            totals[(day, category, genres.get(book_id))][metric] += value
+
+        with transaction.atomic():
+            DailyActivity.objects.filter(day__gte=start, day__lte=end).delete()
+            DailyActivity.objects.bulk_create(
+                [
+                    DailyActivity(day=day, user_category=category, genre_id=genre_id, **metrics)
+                    for (day, category, genre_id), metrics in totals.items()
+                ],
+                batch_size=2000,
+            )
+        return len(totals)
+
+    @staticmethod
+    def first_activity_date():
+        """Date de la plus ancienne activité enregistrée (None si aucune)"""
+        dates = [
+            Loan.objects.order_by('loan_date').values_list('loan_date', flat=True).first(),
+            Reservation.objects.order_by('reservation_date').values_list('reservation_date', flat=True).first(),
+            BookPurchase.objects.order_by('purchase_date').values_list('purchase_date', flat=True).first(),
+            Payment.objects.order_by('payment_date').values_list('payment_date', flat=True).first(),
+        ]
+        dates = [timezone.localdate(date) for date in dates if date]
+        return min(dates) if dates else None
+
+    # ----- Lecture -----
+
+    @staticmethod
+    def month_start(day, months_back=0):
+        """Premier jour du mois, months_back mois avant celui de day"""
+        month_index = day.year * 12 + day.month - 1 - months_back
+        return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+    @classmethod
+    def monthly_totals(cls, months=6, metrics=None):
+        """
+        Totaux mensuels des derniers mois (mois courant inclus), du plus ancien au plus récent :
+        [{'month': date, indicateur: total, ...}]
+        """
+        metrics = metrics or cls.METRICS
+        today = timezone.localdate()
+        first_month = cls.month_start(today, months - 1)
+        rows = DailyActivity.objects.filter(day__gte=first_month).annotate(
+            month=TruncMonth('day')
+        ).values('month').annotate(**{metric: Sum(metric) for metric in metrics})
+        by_month = {row['month']: row for row in rows}
+
+        totals = []
+        for offset in range(months - 1, -1, -1):
+            month = cls.month_start(today, offset)
+            row = by_month.get(month, {})
+            totals.append({'month': month, **{metric: row.get(metric) or 0 for metric in metrics}})
+        return totals
+
+    @staticmethod
+    def totals_by_category(metric):
+        """Total d'un indicateur par catégorie d'utilisateur, sur tout l'historique"""
+        return dict(
+            DailyActivity.objects.values('user_category').annotate(total=Sum(metric)).values_list('user_category', 'total')
+        )
@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db import transaction
 from django.utils.html import format_html
 from .models import (
     CustomUser, Book, Author, Publisher, Genre, Loan, Reservation,
-    BookPurchase, Payment, Deposit
+    BookPurchase, Payment, Deposit, Report, TitleTurnover, GenreTurnover
 )
+from .counter_services import StatusCounterService
+from .collection_services import CollectionReportService
+from .reservation_services import ReservationQueueService, reservations_changed
 
 
 @admin.register(CustomUser)
@@ -87,10 +91,6 @@ class BookAdmin(admin.ModelAdmin):
 
     readonly_fields = ('cover_image_preview',)
 
-    def authors_display(self, obj):
-        return obj.authors_list
-    authors_display.short_description = 'Auteurs'
-
     def is_available(self, obj):
         if obj.is_available:
             return format_html('<span style="color: green;">✓ Disponible</span>')
@@ -165,7 +165,7 @@ class LoanAdmin(admin.ModelAdmin):
 @admin.register(Reservation)
 class ReservationAdmin(admin.ModelAdmin):
     """Administration des réservations"""
-    list_display = ('user', 'book_title', 'reservation_date', 'expiry_date', 'status', 'notification_sent')
+    list_display = ('user', 'book_title', 'reservation_date', 'expiry_date', 'status', 'queue_position', 'notification_sent')
     list_filter = ('status', 'reservation_date', 'notification_sent')
     search_fields = ('user__username', 'user__first_name', 'user__last_name', 'book__title')
     ordering = ('-reservation_date',)
@@ -178,7 +178,11 @@ class ReservationAdmin(admin.ModelAdmin):
     actions = ['cancel_reservations']
 
     def cancel_reservations(self, request, queryset):
-        queryset.update(status='cancelled')
+        book_ids = list(queryset.order_by().values_list('book_id', flat=True).distinct())
+        with transaction.atomic():
+            StatusCounterService.bulk_update_status(queryset, 'cancelled')
+            ReservationQueueService.resequence(*book_ids)
+        reservations_changed(book_ids)
         self.message_user(request, f"{queryset.count()} réservation(s) annulée(s).")
     cancel_reservations.short_description = "Annuler les réservations"
 
@@ -274,27 +278,27 @@ class BookPurchaseAdmin(admin.ModelAdmin):
     ]
 
     def mark_as_pending(self, request, queryset):
-        updated = queryset.update(status='pending')
+        updated = StatusCounterService.bulk_update_status(queryset, 'pending')
         self.message_user(request, f"{updated} achat(s) marqué(s) comme en attente.")
     mark_as_pending.short_description = "📋 Marquer comme en attente"
 
     def mark_as_confirmed(self, request, queryset):
-        updated = queryset.update(status='confirmed')
+        updated = StatusCounterService.bulk_update_status(queryset, 'confirmed')
         self.message_user(request, f"{updated} achat(s) marqué(s) comme confirmé(s).")
     mark_as_confirmed.short_description = "✅ Marquer comme confirmé"
 
     def mark_as_paid(self, request, queryset):
-        updated = queryset.update(status='paid')
+        updated = StatusCounterService.bulk_update_status(queryset, 'paid')
         self.message_user(request, f"{updated} achat(s) marqué(s) comme payé(s).")
     mark_as_paid.short_description = "💳 Marquer comme payé"
 
     def mark_as_delivered(self, request, queryset):
-        updated = queryset.update(status='delivered')
+        updated = StatusCounterService.bulk_update_status(queryset, 'delivered')
         self.message_user(request, f"{updated} achat(s) marqué(s) comme livré(s).")
     mark_as_delivered.short_description = "📦 Marquer comme livré"
 
     def mark_as_cancelled(self, request, queryset):
-        updated = queryset.update(status='cancelled')
+        updated = StatusCounterService.bulk_update_status(queryset, 'cancelled')
         self.message_user(request, f"{updated} achat(s) marqué(s) comme annulé(s).")
     mark_as_cancelled.short_description = "❌ Marquer comme annulé"
 
@@ -391,4 +395,63 @@ class DepositAdmin(admin.ModelAdmin):
     forfeit_deposits.short_description = "Confisquer les cautions"
 
 
+class ReadOnlyReportAdmin(admin.ModelAdmin):
+    """Tables de rapport : recalculées par commande, consultables seulement"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TitleTurnover)
+class TitleTurnoverAdmin(ReadOnlyReportAdmin):
+    """Rotation par titre (désherbage et acquisitions)"""
+    list_display = ('book', 'genre', 'copies', 'loans', 'turnover', 'idle_copies', 'last_loan_date', 'queue_length', 'has_persistent_queue')
+    list_filter = ('has_persistent_queue', 'genre')
+    search_fields = ('book__title', 'book__isbn')
+    ordering = ('turnover',)
+    list_select_related = ('book', 'genre')
+
+
+@admin.register(GenreTurnover)
+class GenreTurnoverAdmin(ReadOnlyReportAdmin):
+    """Rotation par genre"""
+    list_display = ('genre', 'titles', 'copies', 'loans', 'turnover', 'idle_titles', 'idle_copies', 'queued_titles', 'computed_at')
+    ordering = ('turnover',)
+    list_select_related = ('genre',)
+
+
+@admin.register(Report)
+class ReportAdmin(admin.ModelAdmin):
+    """Administration des rapports"""
+    list_display = ('title', 'report_type', 'format', 'status', 'created_by', 'created_at', 'total_records')
+    list_filter = ('report_type', 'format', 'status')
+    search_fields = ('title', 'description')
+    ordering = ('-created_at',)
+    readonly_fields = ('status', 'generated_at', 'expires_at', 'file', 'file_size', 'total_records', 'generation_time', 'download_count', 'error_message')
+
+    actions = ['generate_collection_reports']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_exclude(self, request, obj=None):
+        return ('created_by',)
 
+    def generate_collection_reports(self, request, queryset):
+        generated = 0
+        for report in queryset.filter(report_type='collection'):
+            success, message = CollectionReportService.generate(report)
+            if success:
+                generated += 1
+            else:
+                self.message_user(request, f"{report.title} : {message}", level='error')
+        self.message_user(request, f"{generated} rapport(s) de rotation généré(s).")
+    generate_collection_reports.short_description = "Générer les rapports de rotation des collections"
@@ -0,0 +1,333 @@
+"""
+Analyses de circulation : durées d'emprunt, retards et attentes de réservation (calcul vectorisé NumPy)
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from .models import CustomUser, Genre, Loan, Reservation
+from .activity_services import DailyActivityService
+
+
+class CirculationAnalytics:
+    """
+    Les colonnes utiles sont lues par paquets (values_list) et converties en tableaux
+    NumPy. Le cache ne conserve que des statistiques suffisantes et fusionnables :
+    histogrammes horaires des durées par catégorie, comptes et sommes par catégorie
+    et par genre, histogramme des attentes. Chaque rafraîchissement n'ajoute que les
+    emprunts rendus et les réservations devenues prêtes depuis le précédent (repère
+    (date, pk)) ; une reconstruction complète a lieu périodiquement.
+
+    Les emprunts en cours (peu nombreux) sont relus à chaque rafraîchissement pour
+    les taux de retard : un emprunt compte comme en retard s'il a été rendu après sa
+    date prévue, ou s'il est encore en cours après celle-ci.
+    """
+
+    CACHE_KEY = 'analytics:circulation'
+    REFRESH_INTERVAL = 300
+    FULL_REBUILD_INTERVAL = 24 * 3600
+    CHUNK_SIZE = 5000
+
+    # Durées d'emprunt : histogramme horaire, la dernière case regroupe tout au-delà
+    MAX_DURATION_HOURS = 365 * 24
+    PERCENTILES = (25, 50, 75, 90, 95)
+    DURATION_BINS_DAYS = (0, 1, 3, 7, 14, 21, 30, 60, 90)
+    WAIT_BINS_DAYS = (0, 1, 2, 3, 5, 7, 14, 21, 30, 60, 90)
+
+    # ----- Lecture des colonnes -----
+
+    @staticmethod
+    def timestamps(values):
+        return np.array([value.timestamp() if value else np.nan for value in values], dtype=float)
+
+    @staticmethod
+    def ordinals(values):
+        return np.array([value.toordinal() if value else 0 for value in values], dtype=np.int64)
+
+    @classmethod
+    def fetch_columns(cls, queryset, columns):
+        """
+        {nom: tableau} pour columns = [(nom, champ, conversion)], lus par paquets de CHUNK_SIZE.
+        conversion transforme une liste de valeurs Python en tableau NumPy.
+        """
+        fields = [field for _, field, _ in columns]
+        parts = {name: [] for name, _, _ in columns}
+        rows = queryset.order_by().values_list(*fields).iterator(chunk_size=cls.CHUNK_SIZE)
+        while True:
+            chunk = [row for _, row in zip(range(cls.CHUNK_SIZE), rows)]
+            if not chunk:
+                break
+            for (name, _, convert), values in zip(columns, zip(*chunk)):
+                parts[name].append(convert(list(values)))
+            if len(chunk) < cls.CHUNK_SIZE:
+                break
+        return {
+            name: np.concatenate(arrays) if arrays else convert([])
+            for (name, _, convert), arrays in zip(columns, parts.values())
+        }
+
+    @staticmethod
+    def after(date_field, watermark):
+        """Lignes postérieures au repère (date, pk) d'un précédent rafraîchissement"""
+        if watermark is None:
+            return Q()
+        date, pk = watermark
+        return Q(**{f'{date_field}__gt': date}) | Q(**{date_field: date, 'pk__gt': pk})
+
+    @staticmethod
+    def next_watermark(queryset, date_field, watermark):
+        row = queryset.order_by(f'-{date_field}', '-pk').values_list(date_field, 'pk').first()
+        return row or watermark
+
+    @staticmethod
+    def genre_codes(book_ids):
+        """Genre principal de chaque livre (-1 sans genre), par recherche vectorisée"""
+        genres = DailyActivityService.primary_genres()
+        if not genres or not len(book_ids):
+            return np.full(len(book_ids), -1, dtype=np.int64)
+        keys = np.fromiter(genres.keys(), dtype=np.int64, count=len(genres))
+        values = np.fromiter((genre or -1 for genre in genres.values()), dtype=np.int64, count=len(genres))
+        order = np.argsort(keys)
+        keys, values = keys[order], values[order]
+        positions = np.clip(np.searchsorted(keys, book_ids), 0, len(keys) - 1)
+        return np.where(keys[positions] == book_ids, values[positions], -1)
+
+    # ----- Statistiques suffisantes -----
+
+    @classmethod
+    def empty_state(cls):
+        return {
+            'loans_watermark': None,
+            'waits_watermark': None,
+            'duration_histograms': {},
+            'returned': {'category': {}, 'genre': {}},
+            'wait_histogram': np.zeros(len(cls.WAIT_BINS_DAYS), dtype=np.int64),
+            'wait_count': 0,
+            'wait_sum_days': 0.0,
+            'open': {'category': {}, 'genre': {}},
+            'built_at': None,
+            'refreshed_at': None,
+        }
+
+    @staticmethod
+    def group_totals(totals, keys, columns):
+        """Ajoute à totals[clé] les sommes de chaque colonne sur les lignes de cette clé"""
+        if not len(keys):
+            return
+        unique, inverse = np.unique(keys, return_inverse=True)
+        sums = [np.bincount(inverse.ravel(), weights=column, minlength=len(unique)) for column in columns]
+        for index, key in enumerate(unique.tolist()):
+            current = totals.get(key, [0.0] * len(columns))
+            totals[key] = [current[i] + float(sums[i][index]) for i in range(len(columns))]
+
+    @classmethod
+    def add_returned_loans(cls, state, queryset):
+        """Intègre les emprunts rendus de queryset (durées, retards) à l'état"""
+        data = cls.fetch_columns(queryset, [
+            ('book', 'book_id', lambda values: np.array(values, dtype=np.int64)),
+            ('category', 'user__category', lambda values: np.array(values, dtype=object)),
+            ('loan_date', 'loan_date', cls.timestamps),
+            ('return_date', 'return_date', cls.timestamps),
+            ('return_day', 'return_date__date', cls.ordinals),
+            ('due_day', 'due_date', cls.ordinals),
+        ])
+        if not len(data['book']):
+            return 0
+
+        hours = np.clip((data['return_date'] - data['loan_date']) / 3600, 0, None)
+        bins = np.minimum(hours.astype(np.int64), cls.MAX_DURATION_HOURS)
+        late = (data['return_day'] > data['due_day']).astype(float)
+        days = hours / 24
+
+        categories = data['category'].astype(str)
+        for category in np.unique(categories).tolist():
+            mask = categories == category
+            histogram = state['duration_histograms'].get(category)
+            if histogram is None:
+                histogram = np.zeros(cls.MAX_DURATION_HOURS + 1, dtype=np.int64)
+            histogram += np.bincount(bins[mask], minlength=cls.MAX_DURATION_HOURS + 1)
+            state['duration_histograms'][category] = histogram
+
+        ones = np.ones(len(days))
+        cls.group_totals(state['returned']['category'], categories, [ones, late, days])
+        cls.group_totals(state['returned']['genre'], cls.genre_codes(data['book']), [ones, late, days])
+        return len(days)
+
+    @classmethod
+    def open_loans(cls):
+        """Emprunts en cours ayant dépassé leur date prévue, par catégorie et par genre"""
+        data = cls.fetch_columns(Loan.objects.filter(return_date__isnull=True), [
+            ('book', 'book_id', lambda values: np.array(values, dtype=np.int64)),
+            ('category', 'user__category', lambda values: np.array(values, dtype=object)),
+            ('due_day', 'due_date', cls.ordinals),
+        ])
+        totals = {'category': {}, 'genre': {}}
+        if not len(data['book']):
+            return totals
+        overdue = (data['due_day'] < timezone.localdate().toordinal()).astype(float)
+        cls.group_totals(totals['category'], data['category'].astype(str), [overdue])
+        cls.group_totals(totals['genre'], cls.genre_codes(data['book']), [overdue])
+        return totals
+
+    @classmethod
+    def add_waits(cls, state, queryset):
+        """Intègre les attentes (réservation → livre prêt) des réservations de queryset"""
+        data = cls.fetch_columns(queryset, [
+            ('reserved', 'reservation_date', cls.timestamps),
+            ('ready', 'ready_date', cls.timestamps),
+        ])
+        days = np.clip((data['ready'] - data['reserved']) / 86400, 0, None)
+        if not len(days):
+            return 0
+        edges = np.asarray(cls.WAIT_BINS_DAYS, dtype=float)
+        state['wait_histogram'] += np.bincount(np.searchsorted(edges, days, side='right') - 1, minlength=len(edges))
+        state['wait_count'] += len(days)
+        state['wait_sum_days'] += float(days.sum())
+        return len(days)
+
+    # ----- Rafraîchissement -----
+
+    @classmethod
+    def refresh(cls, state=None):
+        """Met l'état à jour (complètement s'il est absent) et le remet en cache"""
+        now = timezone.now()
+        if state is None:
+            state = cls.empty_state()
+            state['built_at'] = now
+
+        returned = Loan.objects.filter(return_date__isnull=False)
+        new_returns = returned.filter(cls.after('return_date', state['loans_watermark']))
+        watermark = cls.next_watermark(new_returns, 'return_date', state['loans_watermark'])
+        cls.add_returned_loans(state, new_returns.filter(~cls.after('return_date', watermark)))
+        state['loans_watermark'] = watermark
+
+        ready = Reservation.objects.filter(ready_date__isnull=False)
+        new_ready = ready.filter(cls.after('ready_date', state['waits_watermark']))
+        watermark = cls.next_watermark(new_ready, 'ready_date', state['waits_watermark'])
+        cls.add_waits(state, new_ready.filter(~cls.after('ready_date', watermark)))
+        state['waits_watermark'] = watermark
+
+        state['open'] = cls.open_loans()
+        state['refreshed_at'] = now
+        cache.set(cls.CACHE_KEY, state, None)
+        return state
+
+    @classmethod
+    def get_state(cls, force=False):
+        state = None if force else cache.get(cls.CACHE_KEY)
+        now = timezone.now()
+        if state is not None and (now - state['built_at']).total_seconds() > cls.FULL_REBUILD_INTERVAL:
+            # Reconstruction périodique : emprunts supprimés ou dates corrigées
+            state = None
+        if state is None or (now - state['refreshed_at']).total_seconds() > cls.REFRESH_INTERVAL:
+            state = cls.refresh(state)
+        return state
+
+    @classmethod
+    def invalidate(cls):
+        cache.delete(cls.CACHE_KEY)
+
+    # ----- Résultats -----
+
+    @staticmethod
+    def histogram_percentiles(histogram, percentiles):
+        """Percentiles (en heures) d'un histogramme horaire : milieu de la case atteinte"""
+        total = histogram.sum()
+        if not total:
+            return {percentile: None for percentile in percentiles}
+        cumulative = np.cumsum(histogram)
+        targets = np.ceil(np.asarray(percentiles, dtype=float) / 100 * total)
+        positions = np.searchsorted(cumulative, np.maximum(targets, 1))
+        return {percentile: float(position) + 0.5 for percentile, position in zip(percentiles, positions)}
+
+    @classmethod
+    def binned(cls, histogram, edges_days, unit_days):
+        """Regroupe un histogramme fin (cases de unit_days jours) selon des bornes en jours"""
+        edges = np.asarray(edges_days, dtype=float) / unit_days
+        positions = np.searchsorted(edges, np.arange(len(histogram)), side='right') - 1
+        counts = np.bincount(positions, weights=histogram, minlength=len(edges)).astype(np.int64)
+        return cls.histogram_rows(edges_days, counts)
+
+    @staticmethod
+    def histogram_rows(edges_days, counts):
+        rows = []
+        for index, count in enumerate(counts.tolist()):
+            low = edges_days[index]
+            high = edges_days[index + 1] if index + 1 < len(edges_days) else None
+            label = f"{low}–{high} j" if high is not None else f"{low} j et plus"
+            rows.append({'label': label, 'min_days': low, 'max_days': high, 'count': int(count)})
+        return rows
+
+    @classmethod
+    def loan_duration_stats(cls, category=None):
+        """Distribution des durées d'emprunt (emprunts rendus), toutes catégories ou une seule"""
+        state = cls.get_state()
+        histograms = state['duration_histograms']
+        if category is not None:
+            histograms = {category: histograms[category]} if category in histograms else {}
+        histogram = sum(histograms.values(), np.zeros(cls.MAX_DURATION_HOURS + 1, dtype=np.int64))
+
+        totals = state['returned']['category']
+        keys = [category] if category is not None else list(totals)
+        count = sum(totals[key][0] for key in keys if key in totals)
+        sum_days = sum(totals[key][2] for key in keys if key in totals)
+
+        percentiles = {
+            percentile: round(hours / 24, 2) if hours is not None else None
+            for percentile, hours in cls.histogram_percentiles(histogram, cls.PERCENTILES).items()
+        }
+        return {
+            'count': int(count),
+            'mean_days': round(sum_days / count, 2) if count else None,
+            'median_days': percentiles[50],
+            'percentiles': percentiles,
+            'histogram': cls.binned(histogram, cls.DURATION_BINS_DAYS, 1 / 24),
+        }
+
+    @staticmethod
+    def rate_row(returned, open_overdue):
+        loans, late = (returned[0], returned[1]) if returned else (0, 0)
+        overdue = late + open_overdue
+        denominator = loans + open_overdue
+        return {
+            'returned': int(loans),
+            'overdue': int(overdue),
+            'rate': round(overdue / denominator * 100, 1) if denominator else 0,
+        }
+
+    @classmethod
+    def overdue_rates(cls):
+        """Taux de retard par catégorie d'utilisateur et par genre principal du livre"""
+        state = cls.get_state()
+        returned, current = state['returned'], state['open']
+
+        by_category = {}
+        for category, label in CustomUser.USER_CATEGORIES:
+            open_overdue = current['category'].get(category, [0])[0]
+            by_category[category] = {'label': label, **cls.rate_row(returned['category'].get(category), open_overdue)}
+
+        genre_ids = set(returned['genre']) | set(current['genre'])
+        names = Genre.objects.in_bulk([genre_id for genre_id in genre_ids if genre_id >= 0])
+        by_genre = []
+        for genre_id in genre_ids:
+            open_overdue = current['genre'].get(genre_id, [0])[0]
+            genre = names.get(genre_id)
+            by_genre.append({
+                'genre_id': genre_id if genre_id >= 0 else None,
+                'name': genre.name if genre else 'Sans genre',
+                **cls.rate_row(returned['genre'].get(genre_id), open_overdue),
+            })
+        by_genre.sort(key=lambda row: (-row['rate'], row['name']))
+        return {'by_category': by_category, 'by_genre': by_genre}
+
+    @classmethod
+    def wait_time_stats(cls):
+        """Attente entre réservation et mise à disposition du livre"""
+        state = cls.get_state()
+        count = state['wait_count']
+        return {
+            'count': count,
+            'mean_days': round(state['wait_sum_days'] / count, 2) if count else None,
+            'histogram': cls.histogram_rows(cls.WAIT_BINS_DAYS, state['wait_histogram']),
+        }
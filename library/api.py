@@ -0,0 +1,312 @@
+"""
+API JSON en lecture seule du catalogue (version 1)
+
+Points d'entrée : livres, auteurs, genres et disponibilité. Chaque liste accepte :
+  - fields=a,b,c    sélection des champs renvoyés (les jointures suivent les champs demandés)
+  - ids=1,2,3       restriction à quelques identifiants
+  - cursor=...      pagination par curseur (page_size, 500 au plus)
+  - format=jsonl    export complet en flux JSON-lines, à mémoire constante
+"""
+
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, Min, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from .models import Book, Author, Genre, Loan, Reservation
+from .pagination import KeysetPaginator
+
+
+class ApiField:
+    """
+    Champ exposé par l'API : colonnes à charger (only), jointures et annotations
+    nécessaires, et calcul de la valeur à partir de l'objet.
+    """
+
+    def __init__(self, columns=(), select_related=(), prefetch_related=(), annotations=None, value=None):
+        self.columns = tuple(columns)
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.annotations = annotations or {}
+        self.value = value
+
+
+def column(name):
+    """Champ correspondant directement à une colonne du modèle"""
+    return ApiField(columns=[name], value=lambda obj: getattr(obj, name))
+
+
+def count_subquery(model, **filters):
+    """Nombre de lignes liées au livre courant (sous-requête, sans multiplier les jointures)"""
+    rows = model.objects.filter(book=OuterRef('pk'), **filters).order_by().values('book')
+    return Coalesce(
+        Subquery(rows.annotate(total=Count('pk')).values('total'), output_field=IntegerField()),
+        Value(0),
+    )
+
+
+class ApiResource:
+    """Ressource de l'API : modèle, champs disponibles et champs renvoyés par défaut"""
+
+    name = None
+    model = None
+    fields = {}
+    default_fields = ()
+
+    @classmethod
+    def base_queryset(cls):
+        return cls.model.objects.all()
+
+    @classmethod
+    def parse_fields(cls, raw):
+        """Champs demandés (fields=a,b) ; lève ValueError pour un champ inconnu"""
+        if not raw:
+            return list(cls.default_fields)
+        names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+        unknown = [name for name in names if name not in cls.fields]
+        if unknown:
+            raise ValueError(
+                f"Champ(s) inconnu(s) pour « {cls.name} » : {', '.join(unknown)}. "
+                f"Champs disponibles : {', '.join(cls.fields)}"
+            )
+        return names or list(cls.default_fields)
+
+    @classmethod
+    def queryset(cls, field_names):
+        """Queryset limité aux colonnes, jointures et annotations des champs demandés"""
+        columns, select_related, prefetch_related, annotations = {'pk'}, [], [], {}
+        for name in field_names:
+            field = cls.fields[name]
+            columns.update(field.columns)
+            select_related.extend(field.select_related)
+            prefetch_related.extend(field.prefetch_related)
+            annotations.update(field.annotations)
+
+        queryset = cls.base_queryset().only(*columns)
+        if select_related:
+            queryset = queryset.select_related(*dict.fromkeys(select_related))
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.order_by('pk')
+
+    @classmethod
+    def serialize(cls, obj, field_names):
+        return {name: cls.fields[name].value(obj) for name in field_names}
+
+
+class BookResource(ApiResource):
+    name = 'books'
+    model = Book
+    fields = {
+        'id': column('id'),
+        'title': column('title'),
+        'isbn': column('isbn'),
+        'isbn13': column('isbn13'),
+        'language': column('language'),
+        'publication_date': column('publication_date'),
+        'pages': column('pages'),
+        'description': column('description'),
+        'authors_display': column('authors_display'),
+        'genres_display': column('genres_display'),
+        'authors': ApiField(
+            prefetch_related=[Prefetch('authors', queryset=Author.objects.only('id', 'first_name', 'last_name'))],
+            value=lambda book: [{'id': author.pk, 'name': author.full_name} for author in book.authors.all()],
+        ),
+        'genres': ApiField(
+            prefetch_related=[Prefetch('genres', queryset=Genre.objects.only('id', 'name'))],
+            value=lambda book: [{'id': genre.pk, 'name': genre.name} for genre in book.genres.all()],
+        ),
+        'publisher': ApiField(
+            columns=['publisher', 'publisher__name'],
+            select_related=['publisher'],
+            value=lambda book: {'id': book.publisher.pk, 'name': book.publisher.name} if book.publisher else None,
+        ),
+        'total_copies': column('total_copies'),
+        'available_copies': column('available_copies'),
+        'is_available': ApiField(columns=['available_copies'], value=lambda book: book.is_available),
+        'cover_url': ApiField(
+            columns=['cover_image'],
+            value=lambda book: book.cover_image.url if book.cover_image else None,
+        ),
+        'updated_date': column('updated_date'),
+    }
+    default_fields = (
+        'id', 'title', 'isbn', 'authors_display', 'genres_display',
+        'language', 'publication_date', 'available_copies', 'total_copies',
+    )
+
+
+class AuthorResource(ApiResource):
+    name = 'authors'
+    model = Author
+    fields = {
+        'id': column('id'),
+        'first_name': column('first_name'),
+        'last_name': column('last_name'),
+        'full_name': ApiField(columns=['first_name', 'last_name'], value=lambda author: author.full_name),
+        'birth_date': column('birth_date'),
+        'death_date': column('death_date'),
+        'nationality': column('nationality'),
+        'biography': column('biography'),
+        'book_count': ApiField(
+            annotations={'api_book_count': Count('book')},
+            value=lambda author: author.api_book_count,
+        ),
+    }
+    default_fields = ('id', 'first_name', 'last_name', 'nationality')
+
+
+class GenreResource(ApiResource):
+    name = 'genres'
+    model = Genre
+    fields = {
+        'id': column('id'),
+        'name': column('name'),
+        'description': column('description'),
+        'book_count': ApiField(
+            annotations={'api_book_count': Count('book')},
+            value=lambda genre: genre.api_book_count,
+        ),
+    }
+    default_fields = ('id', 'name')
+
+
+class AvailabilityResource(ApiResource):
+    """Disponibilité des livres : exemplaires, files d'attente et prochain retour prévu"""
+
+    name = 'availability'
+    model = Book
+    fields = {
+        'id': column('id'),
+        'isbn13': column('isbn13'),
+        'total_copies': column('total_copies'),
+        'available_copies': column('available_copies'),
+        'is_available': ApiField(columns=['available_copies'], value=lambda book: book.is_available),
+        'active_reservations': ApiField(
+            annotations={'api_active_reservations': count_subquery(Reservation, status='active')},
+            value=lambda book: book.api_active_reservations,
+        ),
+        'ready_reservations': ApiField(
+            annotations={'api_ready_reservations': count_subquery(Reservation, status='ready')},
+            value=lambda book: book.api_ready_reservations,
+        ),
+        'next_due_date': ApiField(
+            annotations={'api_next_due_date': Subquery(
+                Loan.objects.filter(book=OuterRef('pk'), status__in=['borrowed', 'overdue'])
+                .order_by().values('book').annotate(next_due=Min('due_date')).values('next_due')
+            )},
+            value=lambda book: book.api_next_due_date,
+        ),
+        'version': column('circulation_version'),
+        'changed_at': column('circulation_changed_at'),
+    }
+    default_fields = ('id', 'available_copies', 'total_copies', 'is_available', 'active_reservations')
+
+
+class CatalogApi:
+    """Traitement commun des requêtes de liste et de détail"""
+
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+    MAX_IDS = 500
+    STREAM_CHUNK_SIZE = 2000
+
+    @staticmethod
+    def error(message, status=400):
+        return JsonResponse({'success': False, 'message': message}, status=status)
+
+    @classmethod
+    def parse_ids(cls, raw):
+        try:
+            ids = [int(value) for value in raw.split(',') if value.strip()]
+        except ValueError:
+            raise ValueError("Le paramètre ids doit être une liste d'entiers séparés par des virgules")
+        if len(ids) > cls.MAX_IDS:
+            raise ValueError(f"Au plus {cls.MAX_IDS} identifiants par requête")
+        return ids
+
+    @classmethod
+    def page_size(cls, request):
+        try:
+            size = int(request.GET.get('page_size', cls.DEFAULT_PAGE_SIZE))
+        except ValueError:
+            return cls.DEFAULT_PAGE_SIZE
+        return min(max(size, 1), cls.MAX_PAGE_SIZE)
+
+    @staticmethod
+    def page_url(request, cursor):
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return f"{request.path}?{params.urlencode()}"
+
+    @classmethod
+    def stream(cls, resource, queryset, field_names):
+        """Une ligne JSON par objet ; les préchargements sont faits par paquet de STREAM_CHUNK_SIZE"""
+        for obj in queryset.iterator(chunk_size=cls.STREAM_CHUNK_SIZE):
+            yield json.dumps(resource.serialize(obj, field_names), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    @classmethod
+    def list(cls, request, resource):
+        try:
+            field_names = resource.parse_fields(request.GET.get('fields'))
+            ids = cls.parse_ids(request.GET['ids']) if request.GET.get('ids') else None
+        except ValueError as e:
+            return cls.error(str(e))
+
+        queryset = resource.queryset(field_names)
+        if ids is not None:
+            queryset = queryset.filter(pk__in=ids)
+
+        if request.GET.get('format') == 'jsonl':
+            response = StreamingHttpResponse(
+                cls.stream(resource, queryset, field_names),
+                content_type='application/x-ndjson; charset=utf-8',
+            )
+            response['Content-Disposition'] = f'inline; filename="{resource.name}.jsonl"'
+            return response
+
+        page = KeysetPaginator(queryset, cls.page_size(request)).get_page(request.GET.get('cursor'))
+        return JsonResponse({
+            'results': [resource.serialize(obj, field_names) for obj in page],
+            'next': cls.page_url(request, page.next_cursor) if page.has_next else None,
+            'previous': cls.page_url(request, page.previous_cursor) if page.has_previous else None,
+        }, json_dumps_params={'ensure_ascii': False})
+
+    @classmethod
+    def detail(cls, request, resource, pk):
+        try:
+            field_names = resource.parse_fields(request.GET.get('fields'))
+        except ValueError as e:
+            return cls.error(str(e))
+
+        obj = resource.queryset(field_names).filter(pk=pk).first()
+        if obj is None:
+            return cls.error(f"Objet introuvable dans « {resource.name} »", status=404)
+        return JsonResponse(resource.serialize(obj, field_names), json_dumps_params={'ensure_ascii': False})
+
+
+RESOURCES = {resource.name: resource for resource in (
+    BookResource, AuthorResource, GenreResource, AvailabilityResource,
+)}
+
+
+def get_resource(name):
+    try:
+        return RESOURCES[name]
+    except KeyError:
+        raise Http404(f"Ressource inconnue : {name}")
+
+
+@require_GET
+def api_list(request, resource):
+    """Liste paginée (ou export JSON-lines) d'une ressource"""
+    return CatalogApi.list(request, get_resource(resource))
+
+
+@require_GET
+def api_detail(request, resource, pk):
+    """Détail d'un objet d'une ressource"""
+    return CatalogApi.detail(request, get_resource(resource), pk)
@@ -0,0 +1,183 @@
+"""
+Cache des pages complètes pour les visiteurs anonymes et validation HTTP conditionnelle
+"""
+
+import hashlib
+from urllib.parse import urlencode
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from .models import Book
+
+
+class PageCacheService:
+    """
+    Cache des réponses anonymes, invalidé par étiquettes.
+
+    Chaque page mise en cache mémorise la version des étiquettes qu'elle porte
+    (« book:12 », « book-list », « genres »...). Purger une étiquette revient à
+    incrémenter sa version : toutes les pages qui la portent deviennent
+    obsolètes, sans avoir à connaître leurs clés.
+    """
+
+    KEY_PREFIX = 'pagecache'
+    DEFAULT_TIMEOUT = 300
+
+    # Étiquettes partagées
+    BOOK_LIST_TAG = 'book-list'
+    GENRES_TAG = 'genres'
+
+    @staticmethod
+    def book_tag(book_id):
+        return f'book:{book_id}'
+
+    @classmethod
+    def make_key(cls, request):
+        """Clé de cache : chemin et paramètres normalisés (triés, sans valeurs vides)"""
+        params = sorted(
+            (name, value)
+            for name, values in request.GET.lists()
+            for value in values
+            if value != ''
+        )
+        raw = f"{request.path}?{urlencode(params)}"
+        return f"{cls.KEY_PREFIX}:page:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    @classmethod
+    def tag_key(cls, tag):
+        return f"{cls.KEY_PREFIX}:tag:{tag}"
+
+    @classmethod
+    def is_cacheable(cls, request):
+        """Seules les requêtes GET/HEAD anonymes sans message en attente sont servies depuis le cache"""
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return False
+        return not len(get_messages(request))
+
+    @classmethod
+    def tag(cls, request, *tags):
+        """
+        Déclare les étiquettes de la page en cours de rendu (sans effet hors cache).
+
+        Les versions sont relevées au moment de l'appel, avant la lecture des données :
+        une purge survenant pendant le rendu rend donc la page obsolète dès son stockage.
+        """
+        page_tags = getattr(request, '_page_cache_tags', None)
+        if page_tags is None:
+            return
+        new_tags = [tag for tag in tags if tag not in page_tags]
+        if new_tags:
+            page_tags.update(cls.tag_versions(new_tags))
+
+    @classmethod
+    def tag_versions(cls, tags):
+        keys = {cls.tag_key(tag): tag for tag in tags}
+        versions = cache.get_many(list(keys))
+        return {tag: versions.get(key, 0) for key, tag in keys.items()}
+
+    @classmethod
+    def invalidate(cls, *tags):
+        """Purge toutes les pages portant l'une des étiquettes"""
+        for tag in tags:
+            key = cls.tag_key(tag)
+            if not cache.add(key, 1, timeout=None):
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    # Clé expulsée entre-temps : toute nouvelle version diffère de celles mémorisées
+                    cache.set(key, 1, timeout=None)
+
+    @classmethod
+    def get(cls, request):
+        """Réponse en cache pour la requête, ou None si absente ou obsolète"""
+        entry = cache.get(cls.make_key(request))
+        if entry is None or cls.tag_versions(entry['tags']) != entry['tags']:
+            return None
+
+        return HttpResponse(entry['content'], status=entry['status'], content_type=entry['content_type'])
+
+    @classmethod
+    def store(cls, request, response, timeout=None):
+        """Met en cache une réponse si elle est partageable entre visiteurs"""
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return False
+        if request.META.get('CSRF_COOKIE_USED'):
+            # Le jeton CSRF est propre au visiteur
+            return False
+
+        entry = {
+            'content': response.content,
+            'status': response.status_code,
+            'content_type': response['Content-Type'],
+            'tags': getattr(request, '_page_cache_tags', {}),
+        }
+        cache.set(cls.make_key(request), entry, timeout or cls.DEFAULT_TIMEOUT)
+        return True
+
+    @classmethod
+    def record(cls, outcome):
+        """Incrémente le compteur 'hits' ou 'misses'"""
+        key = f"{cls.KEY_PREFIX}:stats:{outcome}"
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    @classmethod
+    def get_stats(cls):
+        """Compteurs de succès/échecs du cache de pages"""
+        counters = cache.get_many([f"{cls.KEY_PREFIX}:stats:hits", f"{cls.KEY_PREFIX}:stats:misses"])
+        hits = counters.get(f"{cls.KEY_PREFIX}:stats:hits", 0)
+        misses = counters.get(f"{cls.KEY_PREFIX}:stats:misses", 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits * 100 / total, 1) if total else 0,
+        }
+
+    @classmethod
+    def reset_stats(cls):
+        cache.delete_many([f"{cls.KEY_PREFIX}:stats:hits", f"{cls.KEY_PREFIX}:stats:misses"])
+
+
+def book_validators(request, book_id):
+    """
+    (ETag, Last-Modified) des pages d'un livre pour les visiteurs anonymes, calculés une
+    seule fois par requête à partir de updated_date, de circulation_changed_at et de la
+    version de circulation.
+
+    Pas de réponse conditionnelle pour un lecteur connecté : la page porte son jeton CSRF
+    (renouvelé à chaque connexion) et son éligibilité, qui change avec son activité sur
+    d'autres livres (limite d'emprunts, frais) sans toucher à celui-ci.
+    """
+    validators = getattr(request, '_book_validators', None)
+    if validators is not None:
+        return validators
+
+    state = None
+    if not request.user.is_authenticated and not len(get_messages(request)):
+        state = Book.objects.filter(pk=book_id).values_list(
+            'updated_date', 'circulation_changed_at', 'circulation_version'
+        ).first()
+    if state is None:
+        # Lecteur connecté, message à afficher ou livre introuvable (404) : pas de réponse 304
+        validators = (None, None)
+    else:
+        updated_date, circulation_changed_at, version = state
+        # La page affiche le stock et la file d'attente : le plus récent des deux horodatages
+        changed = max(updated_date, circulation_changed_at or updated_date)
+        stamp = int(changed.timestamp() * 1_000_000)
+        validators = (f'W/"book-{book_id}-{stamp}-{version}"', changed)
+
+    request._book_validators = validators
+    return validators
+
+
+def book_etag(request, book_id):
+    return book_validators(request, book_id)[0]
+
+
+def book_last_modified(request, book_id):
+    return book_validators(request, book_id)[1]
@@ -0,0 +1,137 @@
+"""
+Circulation des exemplaires : prêts et retours transactionnels sur le stock des livres
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Book, Loan, Reservation
+from .cache_services import PageCacheService
+from .counter_services import StatusCounterService
+from .reservation_services import NotificationService, ReservationPromotionService
+
+
+class CirculationConflict(Exception):
+    """Opération devenue impossible (exemplaire parti, emprunt déjà rendu, ...) : transaction annulée"""
+
+
+class CirculationService:
+    """
+    Prêt d'un exemplaire : décrément conditionnel du stock (take_copy), dont le nombre de
+    lignes modifiées décide du succès, puis création de l'emprunt dans la même transaction.
+
+    Retour d'un exemplaire en une transaction :
+
+    1. stock du livre incrémenté par F('available_copies') + 1, plafonné à total_copies
+       (WHERE available_copies < total_copies) ; cet UPDATE, premier ordre de la
+       transaction, prend le verrou du livre (verrou d'écriture de la base sous SQLite,
+       sans montée de verrou lecture → écriture). Un stock déjà complet (incohérence
+       antérieure) n'est pas incrémenté : le retour est enregistré sans changer le stock ;
+    2. relecture du livre (select_for_update) puis de l'emprunt verrouillé : un emprunt
+       déjà rendu par un retour concurrent annule la transaction ;
+    3. emprunt enregistré comme rendu (save(), donc signaux : compteurs, activité, ...) ;
+    4. promotion des réservations servables du livre (moteur ensembliste) ;
+    5. notifications envoyées après validation (transaction.on_commit).
+
+    Deux retours simultanés du même titre sont ainsi sérialisés sur la ligne du livre :
+    aucun incrément perdu, aucune réservation promue deux fois.
+    """
+
+    RETURNABLE_STATUSES = ['borrowed', 'overdue', 'renewed']
+
+    @staticmethod
+    def copies_changed(book_id, before, after):
+        """
+        Équivalent des signaux du livre pour un UPDATE de stock : compteurs de
+        disponibilité et purge des pages (listes comprises si la disponibilité bascule).
+        """
+        toggled = (before > 0) != (after > 0)
+        if toggled:
+            StatusCounterService.adjust('book', {
+                'available': 1 if after > 0 else -1,
+                'unavailable': -1 if after > 0 else 1,
+            })
+        tags = [PageCacheService.book_tag(book_id)]
+        if toggled:
+            tags.append(PageCacheService.BOOK_LIST_TAG)
+        PageCacheService.invalidate(*tags)
+
+    @classmethod
+    def take_copy(cls, book_id):
+        """
+        UPDATE ... SET available_copies = available_copies - 1 WHERE id = ? AND available_copies > 0.
+        Retourne le stock restant, ou None si aucun exemplaire n'était disponible.
+        """
+        with transaction.atomic():
+            taken = Book.objects.filter(pk=book_id, available_copies__gt=0).update(
+                available_copies=F('available_copies') - 1
+            )
+            if not taken:
+                return None
+            # Ligne verrouillée par l'UPDATE : la relecture est exacte
+            remaining = Book.objects.filter(pk=book_id).values_list('available_copies', flat=True).get()
+            cls.copies_changed(book_id, remaining + 1, remaining)
+        return remaining
+
+    @classmethod
+    def lend(cls, user, book, due_date, reservation=None, **loan_fields):
+        """
+        Prend un exemplaire et crée l'emprunt (satisfait la réservation prête éventuelle) ;
+        retourne (succès, emprunt ou message). Les appelants peuvent englober l'appel dans
+        leur propre transaction (paiements) : l'échec annule alors tout.
+        """
+        try:
+            with transaction.atomic():
+                remaining = cls.take_copy(book.pk)
+                if remaining is None:
+                    raise CirculationConflict("Ce livre n'est plus disponible.")
+                if reservation is not None:
+                    locked = Reservation.objects.select_for_update().get(pk=reservation.pk)
+                    if locked.status != 'ready':
+                        raise CirculationConflict("Cette réservation n'est pas prête à être satisfaite.")
+                loan = Loan.objects.create(user=user, book=book, due_date=due_date, **loan_fields)
+                if reservation is not None:
+                    reservation.status = locked.status
+                    reservation.mark_as_fulfilled()
+        except CirculationConflict as conflict:
+            return False, str(conflict)
+
+        book.available_copies = remaining
+        return True, loan
+
+    @classmethod
+    def return_loan(cls, loan, now=None):
+        """Enregistre le retour d'un emprunt ; retourne (succès, message)"""
+        now = now or timezone.now()
+        try:
+            with transaction.atomic():
+                restocked = Book.objects.filter(
+                    pk=loan.book_id, available_copies__lt=F('total_copies')
+                ).update(available_copies=F('available_copies') + 1)
+                available = Book.objects.select_for_update().filter(pk=loan.book_id).values_list(
+                    'available_copies', flat=True
+                ).get()
+                locked = Loan.objects.select_for_update().get(pk=loan.pk)
+                if locked.status not in cls.RETURNABLE_STATUSES:
+                    raise CirculationConflict("Ce livre a déjà été retourné.")
+
+                locked.status = 'returned'
+                locked.return_date = now
+                locked.save()
+                if restocked:
+                    cls.copies_changed(loan.book_id, available - 1, available)
+
+                promoted = ReservationPromotionService.promote_batch([loan.book_id], now)
+                ready = list(Reservation.objects.select_related('user', 'book').filter(pk__in=promoted))
+                transaction.on_commit(lambda: [NotificationService.send_book_ready_notification(r) for r in ready])
+        except CirculationConflict as conflict:
+            return False, str(conflict)
+
+        # Instance de l'appelant alignée sur la base
+        loan.status, loan.return_date = locked.status, locked.return_date
+        if Loan.book.is_cached(loan):
+            loan.book.available_copies = available
+
+        if ready:
+            return True, f"Livre attribué à {ready[0].user.get_full_name()} (réservation)"
+        return True, "Livre remis en stock"
@@ -0,0 +1,270 @@
+"""
+Rapport de rotation des collections : rotation par titre et par genre, stock inactif, files persistantes
+"""
+
+import csv
+import io
+import json
+import time
+from datetime import timedelta
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+from .models import Book, Loan, Reservation, TitleTurnover, GenreTurnover
+from .activity_services import DailyActivityService
+
+
+class CollectionReportService:
+    """
+    Calcul par lots des tables TitleTurnover et GenreTurnover.
+
+    Trois passes ensemblistes (livres, emprunts groupés par livre, réservations actives
+    groupées par livre) et une lecture des genres principaux ; le reste est combiné en
+    mémoire puis réécrit en une transaction.
+
+    - rotation : emprunts de la période / exemplaires / années d'exposition (la période,
+      ou moins pour un titre ajouté depuis) ;
+    - exemplaires inactifs : exemplaires moins emprunts ayant couru pendant les
+      idle_months derniers mois (borne basse : un exemplaire n'est compté actif qu'une fois) ;
+    - file persistante : réservation active la plus ancienne plus vieille que queue_days.
+    """
+
+    PERIOD_MONTHS = 12
+    IDLE_MONTHS = 6
+    QUEUE_DAYS = 14
+    MIN_EXPOSURE_DAYS = 30
+    BATCH_SIZE = 2000
+
+    TITLE_COLUMNS = [
+        ('book_id', 'ID'),
+        ('title', 'Titre'),
+        ('genre', 'Genre'),
+        ('copies', 'Exemplaires'),
+        ('loans', 'Emprunts'),
+        ('turnover', 'Rotation'),
+        ('idle_copies', 'Exemplaires inactifs'),
+        ('last_loan_date', 'Dernier emprunt'),
+        ('queue_length', 'Réservations en attente'),
+        ('has_persistent_queue', 'File persistante'),
+    ]
+    GENRE_COLUMNS = [
+        ('genre', 'Genre'),
+        ('titles', 'Titres'),
+        ('copies', 'Exemplaires'),
+        ('loans', 'Emprunts'),
+        ('turnover', 'Rotation'),
+        ('idle_titles', 'Titres inactifs'),
+        ('idle_copies', 'Exemplaires inactifs'),
+        ('queued_titles', 'Titres avec file persistante'),
+    ]
+
+    # ----- Calcul -----
+
+    @classmethod
+    def compute(cls, period_months=None, idle_months=None, queue_days=None, now=None):
+        """Lignes TitleTurnover et GenreTurnover (non enregistrées)"""
+        period_months = period_months or cls.PERIOD_MONTHS
+        idle_months = idle_months or cls.IDLE_MONTHS
+        queue_days = cls.QUEUE_DAYS if queue_days is None else queue_days
+        now = now or timezone.now()
+        period_start = now - timedelta(days=round(period_months * 365 / 12))
+        idle_start = now - timedelta(days=round(idle_months * 365 / 12))
+        queue_limit = now - timedelta(days=queue_days)
+
+        loans = {
+            row['book_id']: row
+            for row in Loan.objects.order_by().values('book_id').annotate(
+                period_loans=Count('pk', filter=Q(loan_date__gte=period_start)),
+                active_loans=Count('pk', filter=Q(return_date__isnull=True) | Q(return_date__gte=idle_start)),
+                last_loan=Max('loan_date'),
+            ).iterator()
+        }
+        queues = {
+            row['book_id']: row
+            for row in Reservation.objects.filter(status='active').order_by().values('book_id').annotate(
+                queue=Count('pk'),
+                oldest=Min('reservation_date'),
+            ).iterator()
+        }
+        genres = DailyActivityService.primary_genres()
+
+        titles, by_genre = [], {}
+        for book_id, copies, added_date in Book.objects.order_by('pk').values_list('pk', 'total_copies', 'added_date').iterator():
+            loan_row = loans.get(book_id, {})
+            queue_row = queues.get(book_id, {})
+            period_loans = loan_row.get('period_loans', 0)
+            exposure_days = max(min((now - added_date).days, (now - period_start).days), cls.MIN_EXPOSURE_DAYS)
+            oldest = queue_row.get('oldest')
+            title = TitleTurnover(
+                book_id=book_id,
+                genre_id=genres.get(book_id),
+                copies=copies,
+                loans=period_loans,
+                turnover=round(period_loans / copies / (exposure_days / 365), 3) if copies else 0,
+                last_loan_date=loan_row.get('last_loan'),
+                idle_copies=max(copies - loan_row.get('active_loans', 0), 0),
+                queue_length=queue_row.get('queue', 0),
+                oldest_reservation_date=oldest,
+                has_persistent_queue=oldest is not None and oldest < queue_limit,
+                computed_at=now,
+            )
+            titles.append(title)
+
+            genre = by_genre.setdefault(title.genre_id, {'titles': 0, 'copies': 0, 'loans': 0, 'exposure': 0.0,
+                                                         'idle_titles': 0, 'idle_copies': 0, 'queued_titles': 0})
+            genre['titles'] += 1
+            genre['copies'] += copies
+            genre['loans'] += period_loans
+            genre['exposure'] += copies * exposure_days / 365
+            genre['idle_copies'] += title.idle_copies
+            genre['idle_titles'] += bool(copies) and title.idle_copies == copies
+            genre['queued_titles'] += title.has_persistent_queue
+
+        genre_rows = [
+            GenreTurnover(
+                genre_id=genre_id,
+                titles=values['titles'],
+                copies=values['copies'],
+                loans=values['loans'],
+                turnover=round(values['loans'] / values['exposure'], 3) if values['exposure'] else 0,
+                idle_titles=values['idle_titles'],
+                idle_copies=values['idle_copies'],
+                queued_titles=values['queued_titles'],
+                computed_at=now,
+            )
+            for genre_id, values in by_genre.items()
+        ]
+        return titles, genre_rows
+
+    @classmethod
+    def rebuild(cls, **options):
+        """Recalcule et remplace les tables du rapport ; retourne (titres, genres)"""
+        titles, genres = cls.compute(**options)
+        with transaction.atomic():
+            TitleTurnover.objects.all().delete()
+            GenreTurnover.objects.all().delete()
+            TitleTurnover.objects.bulk_create(titles, batch_size=cls.BATCH_SIZE)
+            GenreTurnover.objects.bulk_create(genres, batch_size=cls.BATCH_SIZE)
+        return len(titles), len(genres)
+
+    # ----- Export (formats de Report) -----
+
+    @classmethod
+    def rows(cls, report):
+        """(lignes par genre, lignes par titre) du rapport, filtrées par son genre éventuel"""
+        genres = GenreTurnover.objects.select_related('genre').order_by('turnover')
+        titles = TitleTurnover.objects.select_related('book', 'genre').order_by('turnover', 'book_id')
+        if report.book_genre_id:
+            genres = genres.filter(genre_id=report.book_genre_id)
+            titles = titles.filter(genre_id=report.book_genre_id)
+
+        genre_rows = [
+            {
+                'genre': row.genre.name if row.genre else 'Sans genre',
+                'titles': row.titles, 'copies': row.copies, 'loans': row.loans, 'turnover': row.turnover,
+                'idle_titles': row.idle_titles, 'idle_copies': row.idle_copies, 'queued_titles': row.queued_titles,
+            }
+            for row in genres
+        ]
+        title_rows = []
+        if report.include_details:
+            title_rows = [
+                {
+                    'book_id': row.book_id, 'title': row.book.title,
+                    'genre': row.genre.name if row.genre else 'Sans genre',
+                    'copies': row.copies, 'loans': row.loans, 'turnover': row.turnover,
+                    'idle_copies': row.idle_copies,
+                    'last_loan_date': row.last_loan_date.isoformat() if row.last_loan_date else None,
+                    'queue_length': row.queue_length, 'has_persistent_queue': row.has_persistent_queue,
+                }
+                for row in titles.iterator(chunk_size=cls.BATCH_SIZE)
+            ]
+        return genre_rows, title_rows
+
+    @classmethod
+    def render_csv(cls, genre_rows, title_rows):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        sections = [(cls.GENRE_COLUMNS, genre_rows)] + ([(cls.TITLE_COLUMNS, title_rows)] if title_rows else [])
+        for columns, rows in sections:
+            writer.writerow([label for _, label in columns])
+            for row in rows:
+                writer.writerow([row[name] for name, _ in columns])
+            writer.writerow([])
+        return output.getvalue().encode('utf-8-sig')
+
+    @classmethod
+    def render_json(cls, genre_rows, title_rows):
+        return json.dumps({'genres': genre_rows, 'titles': title_rows}, ensure_ascii=False, indent=2).encode()
+
+    @classmethod
+    def render_excel(cls, genre_rows, title_rows):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheets = [(workbook.active, 'Genres', cls.GENRE_COLUMNS, genre_rows)]
+        if title_rows:
+            sheets.append((workbook.create_sheet(), 'Titres', cls.TITLE_COLUMNS, title_rows))
+        for sheet, name, columns, rows in sheets:
+            sheet.title = name
+            sheet.append([label for _, label in columns])
+            for row in rows:
+                sheet.append([row[name] for name, _ in columns])
+        output = io.BytesIO()
+        workbook.save(output)
+        return output.getvalue()
+
+    @classmethod
+    def render_pdf(cls, genre_rows, title_rows):
+        from reportlab.lib.pagesizes import A4, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+        styles = getSampleStyleSheet()
+        story = []
+        for heading, columns, rows in (('Rotation par genre', cls.GENRE_COLUMNS, genre_rows),
+                                       ('Rotation par titre', cls.TITLE_COLUMNS, title_rows)):
+            if not rows:
+                continue
+            story.append(Paragraph(heading, styles['Heading2']))
+            data = [[label for _, label in columns]]
+            data += [['' if row[name] is None else str(row[name]) for name, _ in columns] for row in rows]
+            story.append(Table(data, repeatRows=1))
+        output = io.BytesIO()
+        SimpleDocTemplate(output, pagesize=landscape(A4)).build(story)
+        return output.getvalue()
+
+    RENDERERS = {
+        'csv': ('render_csv', 'csv'),
+        'json': ('render_json', 'json'),
+        'excel': ('render_excel', 'xlsx'),
+        'pdf': ('render_pdf', 'pdf'),
+    }
+
+    @classmethod
+    def generate(cls, report):
+        """Génère le fichier d'un Report de type « collection » ; retourne (succès, message)"""
+        if report.report_type != 'collection':
+            return False, "Ce rapport n'est pas un rapport de rotation des collections."
+        if not TitleTurnover.objects.exists():
+            return False, "Les données de rotation n'ont pas encore été calculées (build_collection_report)."
+
+        started = time.monotonic()
+        report.mark_as_generating()
+        try:
+            method, extension = cls.RENDERERS[report.format]
+            genre_rows, title_rows = cls.rows(report)
+            content = getattr(cls, method)(genre_rows, title_rows)
+            name = f"rotation_collections_{timezone.localdate():%Y%m%d}_{report.pk}.{extension}"
+            report.file.save(name, ContentFile(content), save=False)
+        except Exception as exc:
+            report.mark_as_failed(str(exc))
+            return False, f"Erreur lors de la génération : {exc}"
+
+        report.mark_as_completed(
+            report.file.name,
+            total_records=len(genre_rows) + len(title_rows),
+            generation_time=timedelta(seconds=time.monotonic() - started),
+        )
+        return True, f"Rapport généré ({report.total_records} ligne(s))."
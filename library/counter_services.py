@@ -0,0 +1,241 @@
+"""
+Compteurs maintenus par statut pour les pages d'administration
+"""
+
+from collections import Counter
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from .models import (
+    CustomUser, Book, Loan, Reservation, BookPurchase, Delivery, StatusCounter, DashboardSummaryMixin, lock_rows,
+)
+from .dashboard_services import DashboardSummaryService
+
+
+def status_labels(values):
+    return {values['status']}
+
+
+def book_labels(values):
+    return {'available' if values['available_copies'] > 0 else 'unavailable'}
+
+
+def user_labels(values):
+    labels = {f"category:{values['category']}"}
+    if values['is_active']:
+        labels.update({'active', f"active_category:{values['category']}"})
+    if values['is_active_member']:
+        labels.update({'member', f"member_category:{values['category']}"})
+    if values['is_staff']:
+        labels.add('staff')
+    if values['is_super_admin']:
+        labels.add('super_admin')
+    return labels
+
+
+class CounterSnapshot:
+    """Valeurs de tous les compteurs, lues en une requête"""
+
+    def __init__(self, counts):
+        self.counts = counts
+
+    def get(self, model, *labels):
+        """Somme des compteurs d'un modèle pour les étiquettes données"""
+        values = self.counts.get(model, {})
+        return sum(values.get(label, 0) for label in labels)
+
+    def total(self, model):
+        return self.get(model, StatusCounterService.TOTAL)
+
+
+class StatusCounterService:
+    """
+    Un compteur par (modèle, étiquette), plus le total du modèle.
+
+    Les étiquettes d'une ligne sont calculées à partir de quelques champs (TRACKED) ; à chaque
+    enregistrement ou suppression, les compteurs des étiquettes quittées et gagnées sont
+    ajustés de ±1 par un seul UPDATE ... SET count = count + CASE label ... END.
+
+    Les enregistrements passent par models.StatusCountedMixin : lecture verrouillée des
+    étiquettes précédentes, écriture et ajustement dans une même transaction. Les
+    suppressions passent par les signaux pre_delete / post_delete, déjà émis dans la
+    transaction de la suppression. Les compteurs d'un modèle sont initialisés par un
+    recalcul à leur premier ajustement.
+    """
+
+    TOTAL = '__all__'
+
+    # modèle : (classe, champs utilisés, calcul des étiquettes)
+    TRACKED = {
+        'loan': (Loan, ('status',), status_labels),
+        'reservation': (Reservation, ('status',), status_labels),
+        'purchase': (BookPurchase, ('status',), status_labels),
+        'delivery': (Delivery, ('status',), status_labels),
+        'book': (Book, ('available_copies',), book_labels),
+        'user': (CustomUser, ('category', 'is_active', 'is_active_member', 'is_staff', 'is_super_admin'), user_labels),
+    }
+
+    @classmethod
+    def key_for(cls, model_class):
+        for key, (tracked, _, _) in cls.TRACKED.items():
+            if tracked is model_class:
+                return key
+        return None
+
+    @classmethod
+    def tracks(cls, model_class, fields):
+        """Vrai si l'un des champs enregistrés entre dans le calcul des étiquettes du modèle"""
+        key = cls.key_for(model_class)
+        return key is not None and not set(cls.TRACKED[key][1]).isdisjoint(fields)
+
+    @classmethod
+    def labels(cls, key, instance):
+        """Étiquettes d'une instance (total compris)"""
+        _, fields, labeler = cls.TRACKED[key]
+        return labeler({field: getattr(instance, field) for field in fields}) | {cls.TOTAL}
+
+    # ----- Ajustements -----
+
+    @classmethod
+    def adjust(cls, key, deltas):
+        """Ajoute les deltas {étiquette: n} aux compteurs du modèle"""
+        deltas = {label: delta for label, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        with transaction.atomic(savepoint=False):
+            rows = StatusCounter.objects.filter(model=key, label__in=list(deltas))
+            updated = rows.update(count=F('count') + Case(
+                *[When(label=label, then=Value(delta)) for label, delta in deltas.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+            if updated == len(deltas):
+                return
+            existing = set(rows.values_list('label', flat=True))
+            missing = [label for label in deltas if label not in existing]
+            if not StatusCounter.objects.filter(model=key, label=cls.TOTAL).exists():
+                # Premiers ajustements : le recalcul inclut déjà la modification en cours
+                cls.recompute(key)
+                return
+            for label in missing:
+                try:
+                    with transaction.atomic():
+                        StatusCounter.objects.create(model=key, label=label, count=deltas[label])
+                except IntegrityError:
+                    StatusCounter.objects.filter(model=key, label=label).update(count=F('count') + deltas[label])
+
+    @classmethod
+    def record_change(cls, instance, previous_labels):
+        key = cls.key_for(type(instance))
+        if key is None:
+            return
+        current = cls.labels(key, instance)
+        deltas = {label: 1 for label in current - previous_labels}
+        deltas.update({label: -1 for label in previous_labels - current})
+        cls.adjust(key, deltas)
+
+    @classmethod
+    def record_delete(cls, instance, previous_labels):
+        """Retire une ligne supprimée (étiquettes lues en base avant la suppression)"""
+        key = cls.key_for(type(instance))
+        if key is not None:
+            cls.adjust(key, {label: -1 for label in previous_labels})
+
+    @classmethod
+    def previous_labels(cls, instance, lock=False):
+        """
+        Étiquettes de la ligne telle qu'elle est en base (ensemble vide pour une création) ;
+        lock : ligne verrouillée avant la lecture (lock_rows), dans la transaction de l'enregistrement.
+        """
+        key = cls.key_for(type(instance))
+        if key is None or instance.pk is None:
+            return set()
+        model_class, fields, labeler = cls.TRACKED[key]
+        rows = model_class.objects.filter(pk=instance.pk)
+        if lock:
+            rows = lock_rows(rows)
+        previous = rows.values(*fields).order_by().first()
+        return labeler(previous) | {cls.TOTAL} if previous else set()
+
+    @classmethod
+    def bulk_update_status(cls, queryset, status):
+        """
+        queryset.update(status=...) avec ajustement des compteurs, et des résumés du tableau
+        de bord pour les modèles qui y contribuent, dans la même transaction (les actions
+        groupées de l'admin ne passent pas par save()).
+        """
+        key = cls.key_for(queryset.model)
+        summarized = issubclass(queryset.model, DashboardSummaryMixin)
+        with transaction.atomic():
+            previous_rows = list(lock_rows(queryset.order_by())) if summarized else []
+            before = dict(queryset.order_by().values('status').annotate(n=Count('pk')).values_list('status', 'n'))
+            updated = queryset.update(status=status)
+            deltas = Counter({label: -count for label, count in before.items()})
+            deltas[status] += sum(before.values())
+            cls.adjust(key, deltas)
+            if summarized:
+                DashboardSummaryService.record_status_update(previous_rows, status)
+        return updated
+
+    # ----- Recalcul et contrôle -----
+
+    @classmethod
+    def actual_counts(cls, key):
+        """Valeurs exactes des compteurs d'un modèle (un GROUP BY sur sa table)"""
+        model_class, fields, labeler = cls.TRACKED[key]
+        counts = Counter()
+        for row in model_class.objects.order_by().values(*fields).annotate(counter_rows=Count('pk')):
+            for label in labeler(row) | {cls.TOTAL}:
+                counts[label] += row['counter_rows']
+        return counts
+
+    @staticmethod
+    def drift(stored, actual):
+        """Écarts {étiquette: (stocké, réel)} ; un compteur absent est un écart même à zéro"""
+        return {
+            label: (stored.get(label, 0), actual.get(label, 0))
+            for label in set(stored) | set(actual)
+            if label not in stored or stored[label] != actual.get(label, 0)
+        }
+
+    @classmethod
+    def recompute(cls, key):
+        """Réécrit les compteurs d'un modèle ; retourne les écarts corrigés"""
+        with transaction.atomic():
+            stored = dict(
+                StatusCounter.objects.select_for_update().filter(model=key).values_list('label', 'count')
+            )
+            drift = cls.drift(stored, cls.actual_counts(key))
+            for label, (_, count) in drift.items():
+                StatusCounter.objects.update_or_create(model=key, label=label, defaults={'count': count})
+        return drift
+
+    @classmethod
+    def check_drift(cls, fix=False):
+        """Écarts entre compteurs et tables, par modèle ; corrigés si fix"""
+        report = {}
+        for key in cls.TRACKED:
+            if fix:
+                drift = cls.recompute(key)
+            else:
+                stored = dict(StatusCounter.objects.filter(model=key).values_list('label', 'count'))
+                drift = cls.drift(stored, cls.actual_counts(key))
+            if drift:
+                report[key] = drift
+        return report
+
+    # ----- Lecture -----
+
+    @classmethod
+    def snapshot(cls):
+        """Tous les compteurs en une requête (les modèles jamais initialisés le sont au passage)"""
+        counts = {}
+        for model, label, count in StatusCounter.objects.values_list('model', 'label', 'count'):
+            counts.setdefault(model, {})[label] = count
+        for key in cls.TRACKED:
+            if cls.TOTAL not in counts.get(key, {}):
+                cls.recompute(key)
+                counts[key] = dict(
+                    StatusCounter.objects.filter(model=key).values_list('label', 'count')
+                )
+        return CounterSnapshot(counts)
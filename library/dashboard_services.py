@@ -0,0 +1,225 @@
+"""
+Services du tableau de bord utilisateur : résumé matérialisé par utilisateur
+"""
+
+from collections import Counter, defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from .models import CustomUser, Book, Genre, Loan, BookPurchase, Payment, UserDashboardSummary, lock_rows
+
+
+class DashboardSummaryService:
+    """
+    Calcul et maintien de UserDashboardSummary.
+
+    Chaque emprunt, achat ou paiement apporte une contribution aux compteurs et montants
+    du résumé de son utilisateur ; à chaque enregistrement (models.DashboardSummaryMixin)
+    ou suppression, la différence est appliquée par UPDATE ... SET champ = champ + delta
+    dans la transaction de l'écriture. Les classements (genres et livres préférés) ne sont
+    que marqués à recalculer : get_for_user() les recalcule à la lecture suivante.
+    compute() reste le recalcul complet (premier ajustement, rebuild_dashboard_summaries).
+    """
+
+    CURRENT_LOAN_STATUSES = ['borrowed', 'overdue']
+    SPENT_PURCHASE_STATUSES = ['paid', 'confirmed']
+    TOP_LIMIT = 3
+    CENT = Decimal('0.01')
+
+    @classmethod
+    def compute(cls, user_id):
+        """Valeurs du résumé d'un utilisateur (cinq requêtes agrégées)"""
+        loans = Loan.objects.filter(user_id=user_id).aggregate(
+            total=Count('pk'),
+            current=Count('pk', filter=Q(status__in=cls.CURRENT_LOAN_STATUSES)),
+            overdue=Count('pk', filter=Q(status='overdue')),
+        )
+
+        spent = Q(status__in=cls.SPENT_PURCHASE_STATUSES)
+        # Remise effective : prix catalogue moins prix payé (arrondi au centime comme total_price)
+        savings = ExpressionWrapper(
+            F('unit_price') * F('quantity') - F('total_price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+        purchases = BookPurchase.objects.filter(user_id=user_id).aggregate(
+            total=Count('pk'),
+            pending=Count('pk', filter=Q(status='pending')),
+            spent=Sum('total_price', filter=spent),
+            savings=Sum(savings, filter=spent),
+        )
+
+        outstanding = Payment.objects.filter(
+            user_id=user_id, status='pending'
+        ).aggregate(total=Sum('amount'))['total']
+
+        return {
+            'current_loans_count': loans['current'],
+            'overdue_loans_count': loans['overdue'],
+            'total_loans_count': loans['total'],
+            'total_purchases_count': purchases['total'],
+            'pending_purchases_count': purchases['pending'],
+            'total_spent': purchases['spent'] or Decimal('0.00'),
+            'total_savings': (purchases['savings'] or Decimal('0')).quantize(cls.CENT),
+            'outstanding_amount': outstanding or Decimal('0.00'),
+            **cls.compute_top_lists(user_id),
+            'top_lists_stale': False,
+        }
+
+    @classmethod
+    def compute_top_lists(cls, user_id):
+        """Genres et livres les plus empruntés d'un utilisateur (deux GROUP BY avec jointures)"""
+        top_genres = Genre.objects.filter(
+            book__loans__user_id=user_id
+        ).annotate(
+            loan_count=Count('book__loans')
+        ).order_by('-loan_count', 'name').values('id', 'name', 'loan_count')[:cls.TOP_LIMIT]
+
+        top_books = Book.objects.filter(
+            loans__user_id=user_id
+        ).annotate(
+            loan_count=Count('loans')
+        ).order_by('-loan_count', 'title').values('id', 'title', 'loan_count')[:cls.TOP_LIMIT]
+
+        return {'top_genres': list(top_genres), 'top_books': list(top_books)}
+
+    # ----- Ajustements -----
+
+    @classmethod
+    def contribution(cls, instance):
+        """Part d'une ligne source dans le résumé de son utilisateur : {champ: valeur}"""
+        if isinstance(instance, Loan):
+            return {
+                'total_loans_count': 1,
+                'current_loans_count': int(instance.status in cls.CURRENT_LOAN_STATUSES),
+                'overdue_loans_count': int(instance.status == 'overdue'),
+            }
+        if isinstance(instance, BookPurchase):
+            spent = instance.status in cls.SPENT_PURCHASE_STATUSES
+            # total_price est arrondi au centime à l'écriture : même arrondi ici
+            total_price = Decimal(instance.total_price).quantize(cls.CENT)
+            list_price = Decimal(instance.unit_price).quantize(cls.CENT) * instance.quantity
+            return {
+                'total_purchases_count': 1,
+                'pending_purchases_count': int(instance.status == 'pending'),
+                'total_spent': total_price if spent else Decimal('0.00'),
+                'total_savings': list_price - total_price if spent else Decimal('0.00'),
+            }
+        if isinstance(instance, Payment):
+            pending = instance.status == 'pending'
+            return {'outstanding_amount': Decimal(instance.amount).quantize(cls.CENT) if pending else Decimal('0.00')}
+        return {}
+
+    @staticmethod
+    def previous_row(instance):
+        """Ligne source telle qu'elle est en base, verrouillée (None pour une création)"""
+        if instance.pk is None:
+            return None
+        return lock_rows(type(instance).objects.filter(pk=instance.pk)).order_by().first()
+
+    @classmethod
+    def apply(cls, user_id, deltas, top_lists_changed=False):
+        """
+        Ajoute les deltas au résumé de l'utilisateur ; un résumé encore absent est
+        calculé en entier (le calcul inclut la modification en cours).
+        """
+        updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+        if top_lists_changed:
+            updates['top_lists_stale'] = True
+        if not updates:
+            return
+        if not UserDashboardSummary.objects.filter(user_id=user_id).update(**updates):
+            cls.refresh(user_id)
+
+    @classmethod
+    def record_change(cls, instance, previous):
+        """Applique la différence entre la ligne enregistrée et son état précédent (previous_row)"""
+        current = cls.contribution(instance)
+        if previous is None or previous.user_id != instance.user_id:
+            if previous is not None:
+                cls.record_delete(previous)
+            cls.apply(instance.user_id, current, top_lists_changed=isinstance(instance, Loan))
+            return
+        before = cls.contribution(previous)
+        cls.apply(
+            instance.user_id,
+            {name: current[name] - before[name] for name in current},
+            top_lists_changed=isinstance(instance, Loan) and previous.book_id != instance.book_id,
+        )
+
+    @classmethod
+    def record_delete(cls, instance):
+        cls.apply(
+            instance.user_id,
+            {name: -value for name, value in cls.contribution(instance).items()},
+            top_lists_changed=isinstance(instance, Loan),
+        )
+
+    @classmethod
+    def record_status_update(cls, previous_rows, status):
+        """
+        Ajustements d'un UPDATE status=... groupé (actions de l'admin, sans save()) :
+        previous_rows sont les lignes lues sous verrou avant l'UPDATE, deltas cumulés par utilisateur.
+        """
+        deltas = defaultdict(Counter)
+        for row in previous_rows:
+            before = cls.contribution(row)
+            row.status = status
+            for name, value in cls.contribution(row).items():
+                deltas[row.user_id][name] += value - before[name]
+        for user_id, user_deltas in deltas.items():
+            cls.apply(user_id, user_deltas)
+
+    # ----- Lecture et recalcul -----
+
+    @classmethod
+    def refresh(cls, user_id):
+        """
+        Recalcule le résumé d'un utilisateur dans la transaction courante.
+        La ligne est verrouillée avant le calcul : deux mises à jour concurrentes
+        pour le même utilisateur sont sérialisées.
+        """
+        with transaction.atomic():
+            summary, _ = UserDashboardSummary.objects.select_for_update().get_or_create(user_id=user_id)
+            for name, value in cls.compute(user_id).items():
+                setattr(summary, name, value)
+            summary.save()
+        return summary
+
+    @classmethod
+    def refresh_top_lists(cls, summary):
+        """
+        Recalcule les classements marqués à recalculer. La marque est levée avant le calcul :
+        un emprunt enregistré pendant celui-ci la repose pour la lecture suivante.
+        """
+        rows = UserDashboardSummary.objects.filter(pk=summary.pk)
+        rows.update(top_lists_stale=False)
+        values = cls.compute_top_lists(summary.user_id)
+        rows.update(**values)
+        summary.top_lists_stale = False
+        for name, value in values.items():
+            setattr(summary, name, value)
+        return summary
+
+    @classmethod
+    def get_for_user(cls, user):
+        """Résumé de l'utilisateur, calculé à la volée s'il n'existe pas encore"""
+        try:
+            summary = UserDashboardSummary.objects.get(user=user)
+        except UserDashboardSummary.DoesNotExist:
+            return cls.refresh(user.pk)
+        if summary.top_lists_stale:
+            cls.refresh_top_lists(summary)
+        return summary
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """Reconstruit les résumés (tous les utilisateurs ou ceux indiqués) ; retourne leur nombre"""
+        users = CustomUser.objects.order_by('pk')
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+
+        count = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            cls.refresh(user_id)
+            count += 1
+        return count
@@ -8,6 +8,7 @@ from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.http import HttpResponseForbidden
+from .cache_services import PageCacheService
 
 
 def super_admin_required(view_func):
@@ -158,3 +159,30 @@ class UserManagementMixin(PermissionMixin):
     Mixin pour les vues de gestion des utilisateurs
     """
     required_permission_level = 'super_admin'
+
+
+def cache_anonymous_page(timeout=None):
+    """
+    Décorateur qui sert la page depuis le cache pour les visiteurs anonymes.
+    La vue déclare ses étiquettes d'invalidation avec PageCacheService.tag().
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not PageCacheService.is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            response = PageCacheService.get(request)
+            if response is not None:
+                PageCacheService.record('hits')
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            PageCacheService.record('misses')
+            request._page_cache_tags = {}
+            response = view_func(request, *args, **kwargs)
+            PageCacheService.store(request, response, timeout)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return _wrapped_view
+    return decorator
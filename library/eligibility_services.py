@@ -0,0 +1,165 @@
+"""
+Éligibilité d'un lecteur à l'emprunt et à la réservation : tous les contrôles en une requête
+"""
+
+from decimal import Decimal
+from django.db.models import Count, DecimalField, Exists, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import CustomUser, Loan, Payment, Reservation, LibraryConfig
+
+
+def count_subquery(queryset):
+    """COUNT(*) corrélé au lecteur (sous-requête scalaire, sans jointure multipliant les lignes)"""
+    return Coalesce(
+        Subquery(
+            queryset.filter(user=OuterRef('pk')).order_by().values('user').annotate(n=Count('pk')).values('n'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+class EligibilityVerdict:
+    """
+    Résultat des contrôles d'un lecteur (et d'un livre éventuel). Les problèmes sont des
+    couples (code, message) dans l'ordre où les vues les signalent ; can_borrow() et
+    can_reserve() suivent la convention (autorisé, message) des validateurs.
+    """
+
+    # Libellés des refus de réservation : ceux de ReservationService.create_reservation
+    # ('service') et ceux, plus courts, de ReservationValidator.can_user_reserve ('validator')
+    RESERVE_MESSAGES = {
+        'service': {
+            'available': "Ce livre est actuellement disponible. Vous pouvez l'emprunter directement.",
+            'already_reserved': "Vous avez déjà une réservation active pour ce livre.",
+            'already_borrowed': "Vous avez déjà emprunté ce livre.",
+            'overdue': "Vous avez {count} livre(s) en retard. Veuillez les retourner avant de faire de nouvelles réservations.",
+        },
+        'validator': {
+            'available': "Ce livre est disponible, vous pouvez l'emprunter directement.",
+            'already_reserved': "Vous avez déjà une réservation pour ce livre.",
+            'already_borrowed': "Vous avez déjà emprunté ce livre.",
+            'overdue': "Vous avez {count} livre(s) en retard.",
+        },
+    }
+
+    def __init__(self, user, book, values):
+        self.user = user
+        self.book = book
+        self.current_loans = values['current_loans']
+        self.overdue_loans = values['overdue_loans']
+        self.active_reservations = values['active_reservations']
+        self.outstanding_fees = Decimal(values['outstanding_fees']).quantize(Decimal('0.01'))
+        self.has_book_loan = values.get('has_book_loan', False)
+        self.has_book_reservation = values.get('has_book_reservation', False)
+        self.max_books = LibraryConfig.get_max_books(user.category)
+
+    def borrow_problems(self):
+        problems = []
+        if self.book is not None and not self.book.is_available:
+            problems.append(('unavailable', f"Le livre '{self.book.title}' n'est pas disponible pour l'emprunt."))
+        if self.current_loans >= self.max_books:
+            problems.append(('loan_limit', f"Vous avez atteint votre limite d'emprunts ({self.max_books} livres)."))
+        if self.overdue_loans:
+            problems.append(('overdue', f"Vous avez {self.overdue_loans} livre(s) en retard. Veuillez les retourner avant d'emprunter de nouveaux livres."))
+        if self.has_book_loan:
+            problems.append(('already_borrowed', f"Vous avez déjà emprunté '{self.book.title}'."))
+        if self.outstanding_fees > 0:
+            problems.append(('outstanding_fees', f"Vous avez {self.outstanding_fees}€ de frais impayés. Veuillez les régler avant d'emprunter de nouveaux livres."))
+        return problems
+
+    def reserve_problems(self, wording='service'):
+        labels = self.RESERVE_MESSAGES[wording]
+        problems = []
+        if self.book is not None and self.book.is_available:
+            problems.append(('available', labels['available']))
+        if self.has_book_reservation:
+            problems.append(('already_reserved', labels['already_reserved']))
+        if self.has_book_loan:
+            problems.append(('already_borrowed', labels['already_borrowed']))
+        if self.overdue_loans:
+            problems.append(('overdue', labels['overdue'].format(count=self.overdue_loans)))
+        return problems
+
+    def can_borrow(self):
+        problems = self.borrow_problems()
+        return (False, problems[0][1]) if problems else (True, "Emprunt autorisé.")
+
+    def can_reserve(self, wording='service'):
+        problems = self.reserve_problems(wording)
+        return (False, problems[0][1]) if problems else (True, "Réservation autorisée.")
+
+    def as_dict(self):
+        """Forme sérialisable (JSON, badges des gabarits)"""
+        can_borrow, borrow_message = self.can_borrow()
+        can_reserve, reserve_message = self.can_reserve()
+        return {
+            'book_id': self.book.pk if self.book is not None else None,
+            'can_borrow': can_borrow,
+            'borrow_message': borrow_message,
+            'can_reserve': can_reserve,
+            'reserve_message': reserve_message,
+            'current_loans': self.current_loans,
+            'max_books': self.max_books,
+            'remaining_loans': max(self.max_books - self.current_loans, 0),
+            'overdue_loans': self.overdue_loans,
+            'active_reservations': self.active_reservations,
+            'outstanding_fees': str(self.outstanding_fees),
+        }
+
+
+class EligibilityService:
+    """
+    Une requête par lecteur : la ligne CustomUser annotée de sous-requêtes scalaires
+    (emprunts en cours, en retard, réservations, somme des frais impayés) et, pour un
+    livre donné, de deux EXISTS (emprunt ou réservation en cours sur ce livre).
+
+    for_request() mémorise les verdicts sur la requête HTTP (un calcul par lecteur et
+    par livre), pour les vues comme pour les badges des gabarits.
+    """
+
+    CURRENT_LOAN_STATUSES = ['borrowed', 'overdue']
+    OPEN_RESERVATION_STATUSES = ['active', 'ready']
+
+    @classmethod
+    def annotated_user(cls, user, book=None):
+        annotations = {
+            'current_loans': count_subquery(Loan.objects.filter(status__in=cls.CURRENT_LOAN_STATUSES)),
+            'overdue_loans': count_subquery(Loan.objects.filter(status='overdue')),
+            'active_reservations': count_subquery(Reservation.objects.filter(status__in=cls.OPEN_RESERVATION_STATUSES)),
+            'outstanding_fees': Coalesce(
+                Subquery(
+                    Payment.objects.filter(user=OuterRef('pk'), status='pending').order_by()
+                    .values('user').annotate(total=Sum('amount')).values('total'),
+                    output_field=DecimalField(max_digits=10, decimal_places=2),
+                ),
+                Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+        }
+        if book is not None:
+            annotations['has_book_loan'] = Exists(
+                Loan.objects.filter(user=OuterRef('pk'), book=book, status__in=cls.CURRENT_LOAN_STATUSES)
+            )
+            annotations['has_book_reservation'] = Exists(
+                Reservation.objects.filter(user=OuterRef('pk'), book=book, status__in=cls.OPEN_RESERVATION_STATUSES)
+            )
+        return CustomUser.objects.filter(pk=user.pk).annotate(**annotations).values(*annotations)
+
+    @classmethod
+    def check(cls, user, book=None):
+        """Verdict d'un lecteur (et d'un livre éventuel), calculé en une requête"""
+        return EligibilityVerdict(user, book, cls.annotated_user(user, book).get())
+
+    @classmethod
+    def for_request(cls, request, book=None):
+        """Verdict du lecteur connecté, mémorisé le temps de la requête (None si anonyme)"""
+        if not request.user.is_authenticated:
+            return None
+        verdicts = getattr(request, '_eligibility_verdicts', None)
+        if verdicts is None:
+            verdicts = request._eligibility_verdicts = {}
+        key = book.pk if book is not None else None
+        if key not in verdicts:
+            verdicts[key] = cls.check(request.user, book)
+        return verdicts[key]
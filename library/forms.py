@@ -2,9 +2,10 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.db.models import Q
 from .models import (
-    CustomUser, Genre, Author, Book, BookPurchase,
-    Payment, Deposit, Delivery
+    CustomUser, Genre, Author, Publisher, Book, BookPurchase,
+    Payment, Deposit, Delivery, normalize_isbn13
 )
+from .eligibility_services import EligibilityService
 
 
 class BookSearchForm(forms.Form):
@@ -42,11 +43,55 @@ class BookSearchForm(forms.Form):
         label='Langue'
     )
     
+    publisher = forms.ModelChoiceField(
+        queryset=Publisher.objects.all(),
+        required=False,
+        empty_label="Tous les éditeurs",
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Éditeur'
+    )
+    
     available_only = forms.BooleanField(
         required=False,
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         label='Disponibles uniquement'
     )
+    
+    def selected_facets(self):
+        """Valeurs de facettes sélectionnées, au format attendu par CatalogFacets"""
+        data = self.cleaned_data if self.is_valid() else {}
+        selected = {}
+        for facet in ('genre', 'language', 'publisher'):
+            if data.get(facet):
+                selected[facet] = data[facet]
+        if data.get('available_only'):
+            selected['available'] = True
+        return selected
+    
+    def set_facet_counts(self, facets):
+        """Affiche le nombre de résultats à côté de chaque valeur de facette"""
+        self.facets = facets
+        
+        genre_counts = facets.get('genre', {})
+        self.fields['genre'].choices = [('', self.fields['genre'].empty_label)] + [
+            (genre.pk, f"{genre.name} ({genre_counts.get(genre.pk, 0)})")
+            for genre in self.fields['genre'].queryset
+        ]
+        
+        publisher_counts = facets.get('publisher', {})
+        self.fields['publisher'].choices = [('', self.fields['publisher'].empty_label)] + [
+            (publisher.pk, f"{publisher.name} ({publisher_counts.get(publisher.pk, 0)})")
+            for publisher in self.fields['publisher'].queryset
+        ]
+        
+        language_counts = facets.get('language', {})
+        self.fields['language'].choices = [('', 'Toutes les langues')] + [
+            (code, f"{label} ({language_counts.get(code, 0)})")
+            for code, label in Book.LANGUAGES
+        ]
+        
+        available_count = facets.get('available', {}).get(True, 0)
+        self.fields['available_only'].label = f"Disponibles uniquement ({available_count})"
 
 
 class UserRegistrationForm(UserCreationForm):
@@ -326,8 +371,20 @@ class QuickLoanForm(forms.Form):
         label='Utilisateur'
     )
 
+    book_isbn = forms.CharField(
+        max_length=30,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Scanner ou saisir l\'ISBN',
+            'autofocus': True
+        }),
+        label='ISBN'
+    )
+
     book = forms.ModelChoiceField(
         queryset=Book.objects.filter(available_copies__gt=0),
+        required=False,
         widget=forms.Select(attrs={'class': 'form-control'}),
         label='Livre'
     )
@@ -338,18 +395,41 @@ class QuickLoanForm(forms.Form):
         label='Notes (optionnel)'
     )
 
+    def clean_book_isbn(self):
+        """Retrouve le livre par ISBN (recherche exacte sur l'ISBN-13 normalisé, puis sur la saisie)"""
+        value = self.cleaned_data.get('book_isbn', '').strip()
+        if not value:
+            return None
+
+        isbn13 = normalize_isbn13(value)
+        if not isbn13:
+            raise forms.ValidationError("Cet ISBN n'est pas valide.")
+
+        book = Book.objects.filter(isbn13=isbn13).first() or Book.objects.filter(isbn=value).first()
+        if book is None:
+            raise forms.ValidationError("Aucun livre ne correspond à cet ISBN.")
+        return book
+
     def clean(self):
         cleaned_data = super().clean()
         user = cleaned_data.get('user')
+        if not cleaned_data.get('book') and cleaned_data.get('book_isbn'):
+            cleaned_data['book'] = cleaned_data['book_isbn']
         book = cleaned_data.get('book')
 
+        if not book and not self.has_error('book_isbn'):
+            raise forms.ValidationError("Sélectionnez un livre ou scannez son ISBN.")
+
         if user and book:
+            # Au guichet, seuls la limite d'emprunts et le stock sont contrôlés (une requête)
+            problems = dict(EligibilityService.check(user, book).borrow_problems())
+
             # Vérifier si l'utilisateur peut emprunter plus de livres
-            if not user.can_borrow_more:
+            if 'loan_limit' in problems:
                 raise forms.ValidationError(f"L'utilisateur a atteint sa limite d'emprunts.")
 
             # Vérifier si le livre est disponible
-            if not book.is_available:
+            if 'unavailable' in problems:
                 raise forms.ValidationError("Ce livre n'est pas disponible.")
 
             # Plus de vérification de conditions spéciales
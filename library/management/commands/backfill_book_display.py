@@ -0,0 +1,28 @@
+"""
+Commande Django pour recalculer les colonnes d'affichage des livres (auteurs, genres)
+"""
+
+from django.core.management.base import BaseCommand
+from library.models import Book
+
+
+class Command(BaseCommand):
+    help = "Recalcule les colonnes dénormalisées authors_display et genres_display des livres"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Nombre de livres traités par lot (défaut: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        total = Book.objects.count()
+        self.stdout.write(f"Recalcul de l'affichage auteurs/genres pour {total} livre(s)...")
+
+        updated = Book.refresh_display_columns(batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {updated} livre(s) mis à jour, {total - updated} déjà à jour')
+        )
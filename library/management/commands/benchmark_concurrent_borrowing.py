@@ -0,0 +1,89 @@
+"""
+Commande Django pour mesurer des emprunts simultanés d'un même titre (décrément conditionnel du stock)
+"""
+
+import datetime
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from library.circulation_services import CirculationService
+from library.models import CustomUser, Book
+
+
+class Command(BaseCommand):
+    help = 'Mesure le débit de demandes d\'emprunt simultanées sur un titre (données synthétiques supprimées en fin de mesure)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--borrowers',
+            type=int,
+            default=200,
+            help='Nombre d\'emprunteurs simultanés, un fil chacun (défaut: 200)',
+        )
+        parser.add_argument(
+            '--copies',
+            type=int,
+            default=50,
+            help='Exemplaires disponibles du titre (défaut: 50)',
+        )
+
+    def handle(self, *args, **options):
+        borrowers, copies = options['borrowers'], options['copies']
+        self.stdout.write(self.style.SUCCESS('=== Benchmark des emprunts simultanés ==='))
+
+        # Données validées : les fils d'emprunt utilisent chacun leur propre connexion
+        book = Book.objects.create(
+            title='bench-borrow', isbn='bench-borrow', language='fr', pages=100,
+            publication_date=datetime.date(2000, 1, 1), total_copies=copies, available_copies=copies,
+        )
+        users = [
+            CustomUser.objects.create(username=f'bench-borrow-{index}', email=f'bench-borrow-{index}@example.com')
+            for index in range(borrowers)
+        ]
+        try:
+            outcomes, errors, elapsed = self.run_borrowers(book, users)
+            book.refresh_from_db()
+
+            self.stdout.write(f'{borrowers} demande(s) en {elapsed:.2f} s')
+            self.stdout.write(f'   • débit : {borrowers / elapsed if elapsed else 0:.0f} demandes/s')
+            self.stdout.write(f'   • prêts accordés : {outcomes.count(True)}, refus : {outcomes.count(False)}')
+            self.stdout.write(f'   • erreurs : {len(errors)}')
+            for error in errors[:5]:
+                self.stdout.write(f'     - {error!r}')
+            expected = min(copies, borrowers)
+            if outcomes.count(True) == expected and book.available_copies == copies - expected and not errors:
+                self.stdout.write(self.style.SUCCESS(f'✓ Résultat attendu ({expected} prêts, stock restant {book.available_copies})'))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'✗ {outcomes.count(True)} prêts, stock restant {book.available_copies} ({expected} prêts attendus)'
+                ))
+        finally:
+            # Les emprunts disparaissent en cascade avec le livre et les lecteurs
+            book.delete()
+            CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+            self.stdout.write('Données synthétiques supprimées')
+
+    def run_borrowers(self, book, users):
+        """Un fil par emprunteur, libérés ensemble ; retourne (résultats, erreurs, durée)"""
+        due_date = timezone.localdate() + datetime.timedelta(days=14)
+        barrier = threading.Barrier(len(users))
+        outcomes, errors = [], []
+
+        def borrow(user):
+            try:
+                barrier.wait()
+                outcomes.append(CirculationService.lend(user, book, due_date)[0])
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=borrow, args=(user,)) for user in users]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes, errors, time.perf_counter() - started
@@ -0,0 +1,130 @@
+"""
+Commande Django pour mesurer les performances de la recherche approximative
+"""
+
+import itertools
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+from library.search_services import TrigramIndex, FuzzySearchService
+
+
+class Command(BaseCommand):
+    help = 'Mesure la latence de la recherche approximative (trigrammes) sur un catalogue synthétique ou réel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--titles',
+            type=int,
+            default=200000,
+            help='Nombre de titres synthétiques à indexer (défaut: 200000)',
+        )
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=500,
+            help='Nombre de requêtes mal orthographiées à exécuter (défaut: 500)',
+        )
+        parser.add_argument(
+            '--use-database',
+            action='store_true',
+            help='Indexe le catalogue de la base de données au lieu de données synthétiques',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Graine du générateur aléatoire',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(self.style.SUCCESS('=== Benchmark de la recherche approximative ==='))
+
+        start = time.perf_counter()
+        if options['use_database']:
+            index = FuzzySearchService.build_index()
+        else:
+            index = TrigramIndex(self.generate_entries(rng, options['titles']))
+        build_time = time.perf_counter() - start
+
+        self.stdout.write(
+            f'Index construit : {len(index)} entrées, {len(index.terms)} mots, '
+            f'{len(index.gram_ids)} trigrammes en {build_time:.2f} s'
+        )
+
+        if not len(index):
+            self.stdout.write(self.style.WARNING('Aucune entrée à indexer'))
+            return
+
+        queries = [self.misspell(rng, rng.choice(index.labels)) for _ in range(options['queries'])]
+
+        # Préchauffage
+        for query, _ in queries[:10]:
+            index.search(query)
+
+        latencies = []
+        corrected = 0
+        for query, original_word in queries:
+            start = time.perf_counter()
+            result = index.search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if result['suggestion'] and original_word in result['suggestion'].split():
+                corrected += 1
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+        self.stdout.write(f'Requêtes : {len(latencies)}')
+        self.stdout.write(f'   • p50 : {p50:.2f} ms')
+        self.stdout.write(f'   • p95 : {p95:.2f} ms')
+        self.stdout.write(f'   • p99 : {p99:.2f} ms')
+        self.stdout.write(f'   • max : {latencies[-1]:.2f} ms')
+        self.stdout.write(f'   • corrections retrouvées : {corrected * 100 / len(queries):.1f} %')
+
+        if p95 <= 20:
+            self.stdout.write(self.style.SUCCESS('✓ Objectif atteint (p95 ≤ 20 ms)'))
+        else:
+            self.stdout.write(self.style.WARNING('⚠️  Objectif non atteint (p95 > 20 ms)'))
+
+    def generate_entries(self, rng, count):
+        """Génère un catalogue synthétique (titres et auteurs) à vocabulaire zipfien"""
+        def make_word():
+            return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+        vocabulary = list({make_word() for _ in range(40000)})
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        first_names = [make_word().capitalize() for _ in range(2000)]
+        last_names = [make_word().capitalize() for _ in range(8000)]
+
+        entries = []
+        for pk in range(1, count + 1):
+            words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(2, 6))
+            entries.append(('book', pk, ' '.join(words).capitalize()))
+
+        for pk in range(1, count // 20 + 1):
+            entries.append(('author', pk, f"{rng.choice(first_names)} {rng.choice(last_names)}"))
+
+        return entries
+
+    def misspell(self, rng, label):
+        """Introduit une faute de frappe dans le mot le plus long d'un libellé"""
+        words = label.lower().split()
+        target = max(words, key=len)
+        position = rng.randrange(len(target))
+        operation = rng.choice(['delete', 'replace', 'swap', 'insert'])
+
+        if operation == 'delete' and len(target) > 3:
+            typo = target[:position] + target[position + 1:]
+        elif operation == 'swap' and position < len(target) - 1:
+            typo = target[:position] + target[position + 1] + target[position] + target[position + 2:]
+        elif operation == 'insert':
+            typo = target[:position] + rng.choice(string.ascii_lowercase) + target[position:]
+        else:
+            typo = target[:position] + rng.choice(string.ascii_lowercase) + target[position + 1:]
+
+        return typo, target
@@ -0,0 +1,151 @@
+"""
+Commande Django pour mesurer la promotion des réservations (moteur ensembliste et ancienne boucle)
+"""
+
+import datetime
+import random
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from library.models import CustomUser, Book, Reservation
+from library.reservation_services import ReservationPromotionService
+
+
+class Command(BaseCommand):
+    help = 'Mesure la promotion des réservations sur un jeu synthétique (annulé en fin de mesure)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--books',
+            type=int,
+            default=100000,
+            help='Nombre de livres synthétiques (défaut: 100000)',
+        )
+        parser.add_argument(
+            '--reservations',
+            type=int,
+            default=1000000,
+            help='Nombre de réservations actives synthétiques (défaut: 1000000)',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=5000,
+            help='Nombre de lecteurs synthétiques (défaut: 5000)',
+        )
+        parser.add_argument(
+            '--available-ratio',
+            type=float,
+            default=0.3,
+            help='Part des livres ayant des exemplaires disponibles (défaut: 0.3)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ReservationPromotionService.BATCH_SIZE,
+            help=f'Livres par lot de promotion (défaut: {ReservationPromotionService.BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--legacy-sample',
+            type=int,
+            default=2000,
+            help='Livres disponibles mesurés avec l\'ancienne boucle (une requête par livre), extrapolée (0 pour ignorer)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Graine du générateur aléatoire',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(self.style.SUCCESS('=== Benchmark de la promotion des réservations ==='))
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            self.generate(rng, options)
+            self.stdout.write(f'Jeu de données créé en {time.perf_counter() - start:.1f} s')
+
+            available = Book.objects.filter(title__startswith='bench-', available_copies__gt=0)
+            available_count = available.count()
+            expected = self.expected_promotions(available)
+
+            if options['legacy_sample']:
+                self.measure_legacy(available, available_count, options['legacy_sample'])
+
+            start = time.perf_counter()
+            promoted = ReservationPromotionService.promote(batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(f'Moteur ensembliste : {len(promoted)} réservation(s) promue(s) en {elapsed:.2f} s')
+            self.stdout.write(f'   • livres disponibles : {available_count}')
+            self.stdout.write(f'   • débit : {len(promoted) / elapsed if elapsed else 0:.0f} promotions/s')
+            bench_promoted = Reservation.objects.filter(book__title__startswith='bench-', status='ready').count()
+            if bench_promoted == expected:
+                self.stdout.write(self.style.SUCCESS(f'✓ Résultat attendu ({expected} promotions)'))
+            else:
+                self.stdout.write(self.style.ERROR(f'✗ {bench_promoted} promotions, {expected} attendues'))
+
+            transaction.set_rollback(True)
+        self.stdout.write('Données synthétiques annulées')
+
+    def generate(self, rng, options):
+        """Livres, lecteurs et réservations actives synthétiques (bulk_create, sans signaux)"""
+        now = timezone.now()
+        users = CustomUser.objects.bulk_create(
+            [CustomUser(username=f'bench-{index}', email=f'bench-{index}@example.com') for index in range(options['users'])],
+            batch_size=5000,
+        )
+        user_ids = list(CustomUser.objects.filter(username__startswith='bench-').values_list('pk', flat=True))
+
+        books = []
+        for index in range(options['books']):
+            copies = rng.randint(1, 4)
+            books.append(Book(
+                title=f'bench-{index}', isbn=f'bench-{index}', language='fr', pages=100,
+                publication_date=datetime.date(2000, 1, 1), total_copies=copies,
+                available_copies=rng.randint(1, copies) if rng.random() < options['available_ratio'] else 0,
+            ))
+        Book.objects.bulk_create(books, batch_size=5000)
+        book_ids = list(Book.objects.filter(title__startswith='bench-').values_list('pk', flat=True))
+
+        # Réservations réparties uniformément, lecteurs distincts par livre (contrainte d'unicité)
+        per_book = max(options['reservations'] // max(len(book_ids), 1), 1)
+        per_book = min(per_book, len(user_ids))
+        self.per_book = per_book
+        expiry = now + timedelta(days=7)
+        batch = []
+        for book_id in book_ids:
+            for user_id in rng.sample(user_ids, per_book):
+                batch.append(Reservation(
+                    user_id=user_id, book_id=book_id, expiry_date=expiry,
+                    priority=rng.randint(0, 2), status='active',
+                ))
+            if len(batch) >= 20000:
+                Reservation.objects.bulk_create(batch, batch_size=5000)
+                batch = []
+        Reservation.objects.bulk_create(batch, batch_size=5000)
+        self.stdout.write(f'   • {len(users)} lecteurs, {len(book_ids)} livres, {len(book_ids) * per_book} réservations')
+
+    def expected_promotions(self, available):
+        """Sans réservation prête au départ : min(exemplaires disponibles, file) par livre"""
+        return sum(
+            min(copies, self.per_book)
+            for copies in available.values_list('available_copies', flat=True).iterator()
+        )
+
+    def measure_legacy(self, available, available_count, sample):
+        """Ancienne boucle : une requête « première réservation active » par livre disponible"""
+        book_ids = list(available.order_by('pk').values_list('pk', flat=True)[:sample])
+        start = time.perf_counter()
+        for book_id in book_ids:
+            Reservation.objects.filter(book_id=book_id, status='active').order_by('priority', 'reservation_date').first()
+        elapsed = time.perf_counter() - start
+        estimate = elapsed / max(len(book_ids), 1) * available_count
+        self.stdout.write(
+            f'Ancienne boucle : {len(book_ids)} livre(s) en {elapsed:.2f} s, '
+            f'soit ~{estimate:.1f} s pour {available_count} livres (requêtes seules, une promotion par livre)'
+        )
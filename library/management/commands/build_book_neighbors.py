@@ -0,0 +1,57 @@
+"""
+Commande Django pour précalculer les voisins de chaque livre (recommandations par co-emprunts)
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from library.recommendation_services import RecommendationService
+
+
+class Command(BaseCommand):
+    help = "Calcule les similarités item-item à partir des emprunts et favoris et remplace la table des voisins"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n',
+            type=int,
+            default=RecommendationService.TOP_NEIGHBORS,
+            help=f'Nombre de voisins conservés par livre (défaut: {RecommendationService.TOP_NEIGHBORS})',
+        )
+        parser.add_argument(
+            '--min-support',
+            type=int,
+            default=RecommendationService.MIN_SUPPORT,
+            help=f'Nombre minimal de lecteurs communs pour lier deux livres (défaut: {RecommendationService.MIN_SUPPORT})',
+        )
+        parser.add_argument(
+            '--favorite-weight',
+            type=float,
+            default=RecommendationService.FAVORITE_WEIGHT,
+            help=f"Poids ajouté par un favori, un emprunt valant 1 (défaut: {RecommendationService.FAVORITE_WEIGHT})",
+        )
+        parser.add_argument(
+            '--max-items-per-user',
+            type=int,
+            default=RecommendationService.MAX_ITEMS_PER_USER,
+            help=f'Livres les plus récents retenus par lecteur (défaut: {RecommendationService.MAX_ITEMS_PER_USER})',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Calcul des voisins par co-emprunts...')
+
+        start = time.perf_counter()
+        stats = RecommendationService.build_neighbors(
+            top_n=options['top_n'],
+            min_support=options['min_support'],
+            favorite_weight=options['favorite_weight'],
+            max_items_per_user=options['max_items_per_user'],
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"   • Lecteurs : {stats['users']}")
+        self.stdout.write(f"   • Livres empruntés : {stats['books']}")
+        self.stdout.write(f"   • Interactions : {stats['interactions']}")
+        self.stdout.write(f"   • Paires de livres retenues : {stats['pairs']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {stats['neighbors']} voisin(s) enregistré(s) en {elapsed:.2f} s")
+        )
@@ -0,0 +1,79 @@
+"""
+Commande Django pour calculer le rapport de rotation des collections
+"""
+
+import time
+from django.core.management.base import BaseCommand, CommandError
+from library.collection_services import CollectionReportService
+from library.models import CustomUser, Report
+
+
+class Command(BaseCommand):
+    help = "Recalcule la rotation par titre et par genre, le stock inactif et les files d'attente persistantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=CollectionReportService.PERIOD_MONTHS,
+            help=f'Période de calcul de la rotation, en mois (défaut: {CollectionReportService.PERIOD_MONTHS})',
+        )
+        parser.add_argument(
+            '--idle-months',
+            type=int,
+            default=CollectionReportService.IDLE_MONTHS,
+            help=f'Inactivité au-delà de laquelle un exemplaire est signalé, en mois (défaut: {CollectionReportService.IDLE_MONTHS})',
+        )
+        parser.add_argument(
+            '--queue-days',
+            type=int,
+            default=CollectionReportService.QUEUE_DAYS,
+            help=f'Ancienneté d\'une file d\'attente persistante, en jours (défaut: {CollectionReportService.QUEUE_DAYS})',
+        )
+        parser.add_argument(
+            '--export',
+            choices=[code for code, _ in Report.REPORT_FORMATS],
+            help='Génère aussi un Report de type « collection » dans ce format',
+        )
+        parser.add_argument(
+            '--user',
+            help='Auteur du Report généré (nom d\'utilisateur, requis avec --export)',
+        )
+
+    def handle(self, *args, **options):
+        if min(options['months'], options['idle_months']) < 1 or options['queue_days'] < 0:
+            raise CommandError('Les durées doivent être positives')
+
+        creator = None
+        if options['export']:
+            if not options['user']:
+                raise CommandError('--user est requis avec --export')
+            creator = CustomUser.objects.filter(username=options['user']).first()
+            if creator is None:
+                raise CommandError(f"Utilisateur introuvable : {options['user']}")
+
+        self.stdout.write('Calcul de la rotation des collections...')
+        started = time.monotonic()
+        titles, genres = CollectionReportService.rebuild(
+            period_months=options['months'],
+            idle_months=options['idle_months'],
+            queue_days=options['queue_days'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {titles} titre(s), {genres} genre(s) en {time.monotonic() - started:.1f}s'
+        ))
+
+        if creator:
+            report = Report.objects.create(
+                title='Rotation des collections',
+                report_type='collection',
+                format=options['export'],
+                created_by=creator,
+                description=(
+                    f"Rotation sur {options['months']} mois, inactivité au-delà de {options['idle_months']} mois, "
+                    f"files persistantes au-delà de {options['queue_days']} jours"
+                ),
+            )
+            success, message = CollectionReportService.generate(report)
+            style = self.style.SUCCESS if success else self.style.ERROR
+            self.stdout.write(style(f'{"✓" if success else "✗"} {message}'))
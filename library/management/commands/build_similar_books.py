@@ -0,0 +1,40 @@
+"""
+Commande Django pour calculer les livres similaires par le contenu (titre, description, genres)
+"""
+
+import time
+from django.core.management.base import BaseCommand
+from library.similarity_services import ContentSimilarityService
+
+
+class Command(BaseCommand):
+    help = "Calcule les livres similaires (TF-IDF haché) ; incrémental par défaut"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recalcule tout le catalogue au lieu des seuls livres modifiés',
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=ContentSimilarityService.TOP_K,
+            help=f'Nombre de livres similaires conservés par livre (défaut: {ContentSimilarityService.TOP_K})',
+        )
+
+    def handle(self, *args, **options):
+        mode = 'complet' if options['full'] else 'incrémental'
+        self.stdout.write(f'Calcul des livres similaires (mode {mode})...')
+
+        start = time.perf_counter()
+        stats = ContentSimilarityService.rebuild(full=options['full'], top_k=options['top_k'])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"   • Livres du catalogue : {stats['books']}")
+        self.stdout.write(f"   • Livres modifiés : {stats['changed']}")
+        if not options['full']:
+            self.stdout.write(f"   • Listes voisines mises à jour : {stats['affected']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"✓ {stats['neighbors']} lien(s) enregistré(s) en {elapsed:.2f} s")
+        )
@@ -0,0 +1,37 @@
+"""
+Commande Django pour contrôler les compteurs de statut
+"""
+
+from django.core.management.base import BaseCommand
+from library.counter_services import StatusCounterService
+
+
+class Command(BaseCommand):
+    help = "Compare les compteurs de statut aux tables (un GROUP BY par table) et corrige les écarts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Réécrit les compteurs en écart avec les valeurs réelles',
+        )
+
+    def handle(self, *args, **options):
+        fix = options['fix']
+        report = StatusCounterService.check_drift(fix=fix)
+
+        if not report:
+            self.stdout.write(self.style.SUCCESS('✓ Tous les compteurs sont exacts'))
+            return
+
+        for model, drift in report.items():
+            for label, (stored, actual) in sorted(drift.items()):
+                self.stdout.write(f'   • {model}.{label} : {stored} enregistré, {actual} réel')
+
+        total = sum(len(drift) for drift in report.values())
+        if fix:
+            self.stdout.write(self.style.SUCCESS(f'✓ {total} compteur(s) corrigé(s)'))
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'{total} compteur(s) en écart (relancer avec --fix pour corriger)')
+            )
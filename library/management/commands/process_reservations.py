@@ -5,7 +5,11 @@ Commande Django pour traiter les réservations
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from library.models import Reservation, Book
-from library.reservation_services import ReservationService, NotificationService
+from library.reservation_services import (
+    ReservationService, NotificationService, ReservationExpiryService, ReservationPromotionService,
+    ReservationQueueService,
+)
+from library.counter_services import StatusCounterService
 
 
 class Command(BaseCommand):
@@ -48,21 +52,8 @@ class Command(BaseCommand):
         if not dry_run:
             expired_count, ready_count = ReservationService.cleanup_expired_reservations()
         else:
-            # Simulation pour dry-run
-            now = timezone.now()
-            expired_active = Reservation.objects.filter(
-                status='active',
-                expiry_date__lt=now
-            ).count()
-            
-            from datetime import timedelta
-            from library.models import LibraryConfig
-            expired_ready = Reservation.objects.filter(
-                status='ready',
-                ready_date__lt=now - timedelta(days=LibraryConfig.RESERVATION_HOLD_DURATION)
-            ).count()
-            
-            expired_count = expired_active + expired_ready
+            # Simulation pour dry-run : mêmes prédicats que l'expiration groupée
+            expired_count = sum(ReservationExpiryService.preview().values())
             ready_count = 0
 
         self.stdout.write(
@@ -75,16 +66,8 @@ class Command(BaseCommand):
         if not dry_run:
             new_ready_count = Reservation.process_ready_reservations()
         else:
-            # Simulation pour dry-run
-            available_books = Book.objects.filter(available_copies__gt=0)
-            new_ready_count = 0
-            for book in available_books:
-                next_reservation = Reservation.objects.filter(
-                    book=book,
-                    status='active'
-                ).order_by('priority', 'reservation_date').first()
-                if next_reservation:
-                    new_ready_count += 1
+            # Simulation pour dry-run : mêmes requêtes que la promotion, sans UPDATE
+            new_ready_count = len(ReservationPromotionService.preview())
 
         self.stdout.write(
             self.style.SUCCESS(f'   ✓ {new_ready_count} nouvelle(s) réservation(s) prête(s)')
@@ -115,12 +98,10 @@ class Command(BaseCommand):
         # 4. Afficher les statistiques
         self.stdout.write('\n4. Statistiques actuelles...')
         
+        counters = StatusCounterService.snapshot()
         stats = {
-            'active': Reservation.objects.filter(status='active').count(),
-            'ready': Reservation.objects.filter(status='ready').count(),
-            'fulfilled': Reservation.objects.filter(status='fulfilled').count(),
-            'expired': Reservation.objects.filter(status='expired').count(),
-            'cancelled': Reservation.objects.filter(status='cancelled').count(),
+            status: counters.get('reservation', status)
+            for status in ('active', 'ready', 'fulfilled', 'expired', 'cancelled')
         }
         
         self.stdout.write(f'   • Réservations actives: {stats["active"]}')
@@ -151,8 +132,10 @@ class Command(BaseCommand):
             ).distinct()
             
             if books_with_queue.exists():
+                books_with_queue = list(books_with_queue)
+                snapshots = ReservationQueueService.snapshots(books_with_queue)
                 for book in books_with_queue:
-                    queue_info = ReservationService.get_queue_info(book)
+                    queue_info = snapshots[book.pk]
                     self.stdout.write(
                         f'   • "{book.title}" - {queue_info["active_count"]} en attente, '
                         f'{queue_info["ready_count"]} prête(s), {book.available_copies} disponible(s)'
@@ -0,0 +1,64 @@
+"""
+Commande Django pour reconstruire les agrégats d'activité quotidienne
+"""
+
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from library.activity_services import DailyActivityService
+
+
+class Command(BaseCommand):
+    help = "Recalcule la table DailyActivity depuis les emprunts, réservations, achats et paiements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Rattrapage des N derniers jours, aujourd\'hui inclus (défaut: 2)',
+        )
+        parser.add_argument(
+            '--from',
+            dest='date_from',
+            help='Premier jour à recalculer (AAAA-MM-JJ)',
+        )
+        parser.add_argument(
+            '--to',
+            dest='date_to',
+            help='Dernier jour à recalculer (AAAA-MM-JJ, défaut: aujourd\'hui)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Reconstruit tout l\'historique (depuis la première activité)',
+        )
+
+    def parse_date(self, value):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Date invalide : {value} (format attendu AAAA-MM-JJ)")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        end = self.parse_date(options['date_to']) if options['date_to'] else today
+
+        if options['all']:
+            start = DailyActivityService.first_activity_date()
+            if start is None:
+                self.stdout.write(self.style.WARNING('Aucune activité enregistrée'))
+                return
+        elif options['date_from']:
+            start = self.parse_date(options['date_from'])
+        else:
+            start = end - timedelta(days=max(options['days'], 1) - 1)
+
+        if start > end:
+            raise CommandError('La date de début est postérieure à la date de fin')
+
+        self.stdout.write(f'Reconstruction de l\'activité quotidienne du {start} au {end}...')
+
+        rows = DailyActivityService.rebuild(start, end)
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {rows} ligne(s) d\'agrégats enregistrée(s)'))
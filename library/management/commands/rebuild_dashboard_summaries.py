@@ -0,0 +1,26 @@
+"""
+Commande Django pour reconstruire les résumés des tableaux de bord utilisateurs
+"""
+
+from django.core.management.base import BaseCommand
+from library.dashboard_services import DashboardSummaryService
+
+
+class Command(BaseCommand):
+    help = "Recalcule les résumés matérialisés des tableaux de bord (UserDashboardSummary)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help="Identifiant d'un utilisateur à recalculer (option répétable ; défaut : tous)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconstruction des résumés de tableau de bord...')
+
+        count = DashboardSummaryService.rebuild(options['user_ids'])
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {count} résumé(s) recalculé(s)'))
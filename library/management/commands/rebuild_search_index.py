@@ -0,0 +1,30 @@
+"""
+Commande Django pour reconstruire l'index de recherche du catalogue
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from library.search_services import CatalogSearchIndex
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte du catalogue"
+
+    def handle(self, *args, **options):
+        if not CatalogSearchIndex.is_available():
+            self.stdout.write(
+                self.style.WARNING(
+                    "Index de recherche indisponible pour cette base de données "
+                    "(appliquez les migrations ou vérifiez le support FTS5/PostgreSQL)."
+                )
+            )
+            return
+
+        self.stdout.write("Reconstruction de l'index de recherche...")
+
+        with transaction.atomic():
+            count = CatalogSearchIndex.rebuild()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ {count} livre(s) indexé(s)')
+        )
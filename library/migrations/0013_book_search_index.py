@@ -0,0 +1,94 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:04
+
+from django.db import migrations, OperationalError
+
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS library_book_fts USING fts5(
+        title, authors, publisher, isbn, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # Pondération BM25 : titre > auteurs > ISBN > éditeur > description
+    "INSERT INTO library_book_fts(library_book_fts, rank) VALUES('rank', 'bm25(10.0, 8.0, 2.0, 4.0, 1.0)')",
+    """
+    INSERT INTO library_book_fts (rowid, title, authors, publisher, isbn, description)
+    SELECT b.id,
+           b.title,
+           COALESCE((SELECT group_concat(a.first_name || ' ' || a.last_name, ' ')
+                     FROM library_book_authors ba
+                     JOIN library_author a ON a.id = ba.author_id
+                     WHERE ba.book_id = b.id), ''),
+           COALESCE(p.name, ''),
+           b.isbn || ' ' || replace(replace(b.isbn, '-', ''), ' ', ''),
+           b.description
+    FROM library_book b
+    LEFT JOIN library_publisher p ON p.id = b.publisher_id
+    """,
+]
+
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE IF NOT EXISTS library_book_search (
+        book_id bigint PRIMARY KEY REFERENCES library_book (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS library_book_search_document_gin ON library_book_search USING GIN (document)",
+    """
+    INSERT INTO library_book_search (book_id, document)
+    SELECT b.id,
+           setweight(to_tsvector('simple', b.title), 'A') ||
+           setweight(to_tsvector('simple', COALESCE((SELECT string_agg(a.first_name || ' ' || a.last_name, ' ')
+                                                     FROM library_book_authors ba
+                                                     JOIN library_author a ON a.id = ba.author_id
+                                                     WHERE ba.book_id = b.id), '')), 'A') ||
+           setweight(to_tsvector('simple', b.isbn || ' ' || replace(b.isbn, '-', '')), 'B') ||
+           setweight(to_tsvector('simple', COALESCE(p.name, '')), 'C') ||
+           setweight(to_tsvector('simple', b.description), 'D')
+    FROM library_book b
+    LEFT JOIN library_publisher p ON p.id = b.publisher_id
+    ON CONFLICT (book_id) DO NOTHING
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        statements = SQLITE_CREATE
+    elif connection.vendor == 'postgresql':
+        statements = POSTGRES_CREATE
+    else:
+        # Autres moteurs : la recherche retombe sur les filtres LIKE
+        return
+
+    try:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+    except OperationalError:
+        # SQLite compilé sans FTS5 : la recherche retombe sur les filtres LIKE
+        if connection.vendor != 'sqlite':
+            raise
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute("DROP TABLE IF EXISTS library_book_fts")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP TABLE IF EXISTS library_book_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_bookpurchase_delivery_cost_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'id'], name='library_book_title_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookpurchase',
+            index=models.Index(fields=['-purchase_date', '-id'], name='library_purchase_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['-created_date', '-id'], name='library_delivery_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['-loan_date', '-id'], name='library_loan_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-payment_date', '-id'], name='library_payment_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['-reservation_date', '-id'], name='library_reservation_date_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:20
+
+from django.db import migrations, models
+
+
+def backfill_display_columns(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    BookAuthors = Book.authors.through
+    BookGenres = Book.genres.through
+
+    authors = {}
+    author_rows = BookAuthors.objects.order_by(
+        'author__last_name', 'author__first_name', 'author_id'
+    ).values_list('book_id', 'author__first_name', 'author__last_name').iterator(chunk_size=2000)
+    for book_id, first_name, last_name in author_rows:
+        authors.setdefault(book_id, []).append(f"{first_name} {last_name}")
+
+    genres = {}
+    genre_rows = BookGenres.objects.order_by('genre__name').values_list('book_id', 'genre__name').iterator(chunk_size=2000)
+    for book_id, name in genre_rows:
+        genres.setdefault(book_id, []).append(name)
+
+    books = [
+        Book(pk=book_id, authors_display=", ".join(authors.get(book_id, [])), genres_display=", ".join(genres.get(book_id, [])))
+        for book_id in set(authors) | set(genres)
+    ]
+    Book.objects.bulk_update(books, ['authors_display', 'genres_display'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='authors_display',
+            field=models.TextField(blank=True, editable=False, verbose_name='Auteurs'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='genres_display',
+            field=models.TextField(blank=True, editable=False, verbose_name='Genres'),
+        ),
+        migrations.RunPython(backfill_display_columns, migrations.RunPython.noop),
+    ]
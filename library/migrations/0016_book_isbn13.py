@@ -0,0 +1,52 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:25
+
+import re
+from django.db import migrations, models
+
+
+def normalize_isbn13(value):
+    compact = re.sub(r'[\s-]', '', value or '').upper()
+    compact = re.sub(r'^ISBN(?:1[03])?:?', '', compact)
+    if re.fullmatch(r'\d{13}', compact):
+        return compact
+    if re.fullmatch(r'\d{9}[\dX]', compact):
+        digits = '978' + compact[:9]
+        total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(digits))
+        return digits + str((10 - total % 10) % 10)
+    return None
+
+
+def backfill_isbn13(apps, schema_editor):
+    Book = apps.get_model('library', 'Book')
+    seen = set()
+    books = []
+    for pk, isbn in Book.objects.order_by('pk').values_list('pk', 'isbn').iterator(chunk_size=2000):
+        isbn13 = normalize_isbn13(isbn)
+        if isbn13 in seen:
+            # Doublon sous deux écritures différentes : seul le premier livre est indexé
+            isbn13 = None
+        if isbn13:
+            seen.add(isbn13)
+            books.append(Book(pk=pk, isbn13=isbn13))
+    Book.objects.bulk_update(books, ['isbn13'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_book_display_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='isbn13',
+            field=models.CharField(blank=True, editable=False, max_length=13, null=True, verbose_name='ISBN-13 normalisé'),
+        ),
+        migrations.RunPython(backfill_isbn13, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='book',
+            name='isbn13',
+            field=models.CharField(blank=True, editable=False, max_length=13, null=True, unique=True, verbose_name='ISBN-13 normalisé'),
+        ),
+    ]
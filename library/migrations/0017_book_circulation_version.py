@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0016_book_isbn13'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='circulation_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Version de circulation'),
+        ),
+    ]
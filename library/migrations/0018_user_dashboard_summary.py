@@ -0,0 +1,38 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:29
+
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_book_circulation_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDashboardSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_loans_count', models.PositiveIntegerField(default=0, verbose_name='Emprunts en cours')),
+                ('overdue_loans_count', models.PositiveIntegerField(default=0, verbose_name='Emprunts en retard')),
+                ('total_loans_count', models.PositiveIntegerField(default=0, verbose_name='Emprunts (total)')),
+                ('total_purchases_count', models.PositiveIntegerField(default=0, verbose_name='Achats (total)')),
+                ('pending_purchases_count', models.PositiveIntegerField(default=0, verbose_name='Achats en attente')),
+                ('total_spent', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Total dépensé (€)')),
+                ('total_savings', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Économies réalisées (€)')),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=10, verbose_name='Frais impayés (€)')),
+                ('top_genres', models.JSONField(blank=True, default=list, verbose_name='Genres préférés')),
+                ('top_books', models.JSONField(blank=True, default=list, verbose_name='Livres les plus empruntés')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Dernière mise à jour')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_summary', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Résumé du tableau de bord',
+                'verbose_name_plural': 'Résumés des tableaux de bord',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0018_user_dashboard_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Similarité')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rang')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='library.book', verbose_name='Livre')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library.book', verbose_name='Livre voisin')),
+            ],
+            options={
+                'verbose_name': 'Voisin de livre',
+                'verbose_name_plural': 'Voisins de livres',
+                'ordering': ['book', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='bookneighbor',
+            constraint=models.UniqueConstraint(fields=('book', 'rank'), name='library_bookneighbor_rank_uniq'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0019_book_neighbors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookContentSignature',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content_signature', serialize=False, to='library.book', verbose_name='Livre')),
+                ('fingerprint', models.CharField(max_length=40, verbose_name='Empreinte')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculé le')),
+            ],
+            options={
+                'verbose_name': 'Empreinte de contenu',
+                'verbose_name_plural': 'Empreintes de contenu',
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Similarité')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rang')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_books', to='library.book', verbose_name='Livre')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library.book', verbose_name='Livre similaire')),
+            ],
+            options={
+                'verbose_name': 'Livre similaire',
+                'verbose_name_plural': 'Livres similaires',
+                'ordering': ['book', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similarbook',
+            constraint=models.UniqueConstraint(fields=('book', 'rank'), name='library_similarbook_rank_uniq'),
+        ),
+    ]
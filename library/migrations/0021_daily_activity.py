@@ -0,0 +1,43 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:40
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0020_similar_books'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('user_category', models.CharField(max_length=10, verbose_name="Catégorie d'utilisateur")),
+                ('loans_started', models.IntegerField(default=0, verbose_name='Emprunts')),
+                ('returns', models.IntegerField(default=0, verbose_name='Retours')),
+                ('reservations', models.IntegerField(default=0, verbose_name='Réservations')),
+                ('purchases', models.IntegerField(default=0, verbose_name='Achats')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Recettes des ventes (€)')),
+                ('late_fees', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Frais de retard et amendes (€)')),
+                ('genre', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='library.genre', verbose_name='Genre')),
+            ],
+            options={
+                'verbose_name': 'Activité quotidienne',
+                'verbose_name_plural': 'Activité quotidienne',
+                'ordering': ['-day', 'user_category', 'genre'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivity',
+            constraint=models.UniqueConstraint(fields=('day', 'user_category', 'genre'), name='library_dailyactivity_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivity',
+            constraint=models.UniqueConstraint(condition=models.Q(('genre__isnull', True)), fields=('day', 'user_category'), name='library_dailyactivity_nogenre_uniq'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0021_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=30, verbose_name='Modèle')),
+                ('label', models.CharField(max_length=50, verbose_name='Statut')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Nombre')),
+            ],
+            options={
+                'verbose_name': 'Compteur de statut',
+                'verbose_name_plural': 'Compteurs de statut',
+                'ordering': ['model', 'label'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='statuscounter',
+            constraint=models.UniqueConstraint(fields=('model', 'label'), name='library_statuscounter_uniq'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0022_status_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='report_type',
+            field=models.CharField(choices=[('loans', 'Rapport des emprunts'), ('reservations', 'Rapport des réservations'), ('purchases', 'Rapport des achats'), ('payments', 'Rapport des paiements'), ('users', 'Rapport des utilisateurs'), ('books', 'Rapport des livres'), ('overdue', 'Rapport des retards'), ('statistics', 'Rapport statistiques'), ('financial', 'Rapport financier'), ('inventory', "Rapport d'inventaire"), ('collection', 'Rapport de rotation des collections')], max_length=20, verbose_name='Type de rapport'),
+        ),
+        migrations.CreateModel(
+            name='GenreTurnover',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('titles', models.PositiveIntegerField(default=0, verbose_name='Titres')),
+                ('copies', models.PositiveIntegerField(default=0, verbose_name='Exemplaires')),
+                ('loans', models.PositiveIntegerField(default=0, verbose_name='Emprunts sur la période')),
+                ('turnover', models.FloatField(default=0, verbose_name='Rotation (emprunts par exemplaire et par an)')),
+                ('idle_titles', models.PositiveIntegerField(default=0, verbose_name='Titres inactifs')),
+                ('idle_copies', models.PositiveIntegerField(default=0, verbose_name='Exemplaires inactifs')),
+                ('queued_titles', models.PositiveIntegerField(default=0, verbose_name='Titres avec file persistante')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculé le')),
+                ('genre', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='turnover', to='library.genre', verbose_name='Genre')),
+            ],
+            options={
+                'verbose_name': "Rotation d'un genre",
+                'verbose_name_plural': 'Rotation des genres',
+                'ordering': ['turnover'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TitleTurnover',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='turnover', serialize=False, to='library.book', verbose_name='Livre')),
+                ('copies', models.PositiveIntegerField(default=0, verbose_name='Exemplaires')),
+                ('loans', models.PositiveIntegerField(default=0, verbose_name='Emprunts sur la période')),
+                ('turnover', models.FloatField(default=0, verbose_name='Rotation (emprunts par exemplaire et par an)')),
+                ('last_loan_date', models.DateTimeField(blank=True, null=True, verbose_name='Dernier emprunt')),
+                ('idle_copies', models.PositiveIntegerField(default=0, verbose_name='Exemplaires inactifs')),
+                ('queue_length', models.PositiveIntegerField(default=0, verbose_name='Réservations en attente')),
+                ('oldest_reservation_date', models.DateTimeField(blank=True, null=True, verbose_name='Plus ancienne réservation en attente')),
+                ('has_persistent_queue', models.BooleanField(default=False, verbose_name="File d'attente persistante")),
+                ('computed_at', models.DateTimeField(verbose_name='Calculé le')),
+                ('genre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='library.genre', verbose_name='Genre principal')),
+            ],
+            options={
+                'verbose_name': "Rotation d'un titre",
+                'verbose_name_plural': 'Rotation des titres',
+                'ordering': ['turnover', 'book'],
+                'indexes': [models.Index(fields=['turnover'], name='library_titleturnover_rate')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-17 21:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0023_collection_turnover'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'expiry_date'], name='library_reservation_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['status', 'ready_date'], name='library_reservation_ready_idx'),
+        ),
+    ]
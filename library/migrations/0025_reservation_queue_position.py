@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-17 22:00
+
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def backfill_queue_positions(apps, schema_editor):
+    Reservation = apps.get_model('library', 'Reservation')
+    ranked = Reservation.objects.filter(status='active').annotate(
+        rank=Window(
+            RowNumber(),
+            partition_by=[F('book_id')],
+            order_by=[F('priority').asc(), F('reservation_date').asc(), F('pk').asc()],
+        ),
+    ).order_by().values_list('pk', 'rank')
+    reservations = [Reservation(pk=pk, queue_position=rank) for pk, rank in ranked.iterator(chunk_size=2000)]
+    Reservation.objects.bulk_update(reservations, ['queue_position'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0024_reservation_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='queue_position',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Maintenue par ReservationQueueService (réservations actives uniquement)', null=True, verbose_name='Position dans la file'),
+        ),
+        migrations.RunPython(backfill_queue_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:10
+
+import re
+from django.db import migrations
+
+
+def isbn13_check_digit(digits):
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+def normalize_isbn13(value):
+    compact = re.sub(r'[\s-]', '', value or '').upper()
+    compact = re.sub(r'^ISBN(?:1[03])?:?', '', compact)
+    if re.fullmatch(r'\d{13}', compact):
+        return compact if isbn13_check_digit(compact[:12]) == compact[12] else None
+    if re.fullmatch(r'\d{9}[\dX]', compact):
+        check = 10 if compact[9] == 'X' else int(compact[9])
+        if (sum(int(digit) * (10 - index) for index, digit in enumerate(compact[:9])) + check) % 11:
+            return None
+        digits = '978' + compact[:9]
+        return digits + isbn13_check_digit(digits)
+    return None
+
+
+def reindex_isbn13(apps, schema_editor):
+    """Recalcule l'index avec contrôle des clés : les ISBN à clé fausse en sortent"""
+    Book = apps.get_model('library', 'Book')
+    rows = list(Book.objects.order_by('pk').values_list('pk', 'isbn', 'isbn13'))
+    seen = set()
+    wanted = {}
+    for pk, isbn, current in rows:
+        isbn13 = normalize_isbn13(isbn)
+        if isbn13 in seen:
+            # Doublon sous deux écritures différentes : seul le premier livre est indexé
+            isbn13 = None
+        if isbn13:
+            seen.add(isbn13)
+        if isbn13 != current:
+            wanted[pk] = isbn13
+    # Deux passes : libérer les valeurs avant de les réattribuer (contrainte d'unicité)
+    pks = list(wanted)
+    for start in range(0, len(pks), 1000):
+        Book.objects.filter(pk__in=pks[start:start + 1000]).update(isbn13=None)
+    books = [Book(pk=pk, isbn13=isbn13) for pk, isbn13 in wanted.items() if isbn13]
+    Book.objects.bulk_update(books, ['isbn13'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0025_reservation_queue_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_isbn13, migrations.RunPython.noop),
+    ]
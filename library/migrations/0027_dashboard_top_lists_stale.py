@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-17 22:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0026_book_isbn13_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userdashboardsummary',
+            name='top_lists_stale',
+            field=models.BooleanField(default=False, verbose_name='Classements à recalculer'),
+        ),
+    ]
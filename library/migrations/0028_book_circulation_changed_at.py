@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-17 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0027_dashboard_top_lists_stale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='circulation_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Dernier mouvement de circulation'),
+        ),
+    ]
@@ -1,12 +1,63 @@
-from django.db import models
+import re
+from django.db import connections, models, transaction
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 
 
-class CustomUser(AbstractUser):
+def lock_rows(queryset):
+    """
+    Lignes verrouillées jusqu'à la fin de la transaction courante, avant leur lecture.
+    Sans verrou de ligne (SQLite), une écriture neutre prend d'abord le verrou d'écriture
+    de la base : la transaction ne passe jamais d'un verrou de lecture à l'écriture.
+    """
+    if connections[queryset.db].features.has_select_for_update:
+        return queryset.select_for_update()
+    pk_name = queryset.model._meta.pk.attname
+    queryset.update(**{pk_name: models.F(pk_name)})
+    return queryset
+
+
+class StatusCountedMixin:
+    """
+    Compteurs de statut (counter_services) ajustés dans la transaction de l'enregistrement :
+    étiquettes précédentes lues sous verrou, écriture de la ligne, puis UPDATE des compteurs.
+    Deux transitions concurrentes de la même ligne ne lisent donc jamais le même état initial.
+    """
+
+    def save(self, *args, **kwargs):
+        from .counter_services import StatusCounterService
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not StatusCounterService.tracks(type(self), update_fields):
+            # Enregistrement partiel sans champ suivi : aucun compteur ne peut changer
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic(savepoint=False):
+            previous = StatusCounterService.previous_labels(self, lock=True)
+            super().save(*args, **kwargs)
+            StatusCounterService.record_change(self, previous)
+
+
+class DashboardSummaryMixin:
+    """
+    Résumé du tableau de bord (dashboard_services) ajusté dans la transaction de
+    l'enregistrement : ligne précédente lue sous verrou, écriture, puis UPDATE par deltas.
+    """
+
+    def save(self, *args, **kwargs):
+        from .dashboard_services import DashboardSummaryService
+
+        with transaction.atomic(savepoint=False):
+            previous = DashboardSummaryService.previous_row(self)
+            super().save(*args, **kwargs)
+            DashboardSummaryService.record_change(self, previous)
+
+
+class CustomUser(StatusCountedMixin, AbstractUser):
     """Modèle utilisateur étendu pour la bibliothèque"""
     USER_CATEGORIES = [
         ('student', 'Étudiant'),
@@ -127,7 +178,33 @@ class Publisher(models.Model):
         return self.name
 
 
-class Book(models.Model):
+def normalize_isbn13(value):
+    """
+    ISBN-13 sous forme de 13 chiffres à partir d'une saisie libre (tirets, espaces,
+    préfixe « ISBN »), les ISBN-10 étant convertis. None si la saisie n'a pas la forme
+    d'un ISBN ou si sa clé de contrôle est fausse.
+    """
+    compact = re.sub(r'[\s-]', '', value or '').upper()
+    compact = re.sub(r'^ISBN(?:1[03])?:?', '', compact)
+    if re.fullmatch(r'\d{13}', compact):
+        return compact if isbn13_check_digit(compact[:12]) == compact[12] else None
+    if re.fullmatch(r'\d{9}[\dX]', compact):
+        # Clé ISBN-10 : somme pondérée 10..1 multiple de 11, X (= 10) en dernière position seulement
+        check = 10 if compact[9] == 'X' else int(compact[9])
+        if (sum(int(digit) * (10 - index) for index, digit in enumerate(compact[:9])) + check) % 11:
+            return None
+        digits = '978' + compact[:9]
+        return digits + isbn13_check_digit(digits)
+    return None
+
+
+def isbn13_check_digit(digits):
+    """Clé de contrôle d'un ISBN-13 à partir de ses 12 premiers chiffres"""
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(digits))
+    return str((10 - total % 10) % 10)
+
+
+class Book(StatusCountedMixin, models.Model):
     """Modèle pour les livres"""
     BOOK_STATUS = [
         ('available', 'Disponible'),
@@ -150,6 +227,7 @@ class Book(models.Model):
     authors = models.ManyToManyField(Author, verbose_name="Auteurs")
     publisher = models.ForeignKey(Publisher, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Éditeur")
     isbn = models.CharField(max_length=17, unique=True, verbose_name="ISBN")
+    isbn13 = models.CharField(max_length=13, unique=True, null=True, blank=True, editable=False, verbose_name="ISBN-13 normalisé")
     genres = models.ManyToManyField(Genre, verbose_name="Genres")
     publication_date = models.DateField(verbose_name="Date de publication")
     language = models.CharField(max_length=10, choices=LANGUAGES, default='fr', verbose_name="Langue")
@@ -166,13 +244,26 @@ class Book(models.Model):
     added_date = models.DateTimeField(auto_now_add=True, verbose_name="Date d'ajout")
     updated_date = models.DateTimeField(auto_now=True, verbose_name="Dernière modification")
 
+    # Copies dénormalisées des auteurs et genres pour l'affichage (maintenues par signaux)
+    authors_display = models.TextField(blank=True, editable=False, verbose_name="Auteurs")
+    genres_display = models.TextField(blank=True, editable=False, verbose_name="Genres")
+
+    # Incrémenté à chaque emprunt, réservation ou favori touchant le livre (validation HTTP conditionnelle) ;
+    # updated_date ne suit que les modifications du contenu
+    circulation_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Version de circulation")
+    circulation_changed_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Dernier mouvement de circulation")
+
     class Meta:
         verbose_name = "Livre"
         verbose_name_plural = "Livres"
         ordering = ['title']
+        indexes = [
+            # Pagination par curseur sur le tri par défaut
+            models.Index(fields=['title', 'id'], name='library_book_title_id_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.title} - {', '.join([str(author) for author in self.authors.all()])}"
+        return f"{self.title} - {self.authors_display}"
 
     @property
     def is_available(self):
@@ -182,21 +273,92 @@ class Book(models.Model):
     @property
     def authors_list(self):
         """Retourne la liste des auteurs sous forme de chaîne"""
-        return ", ".join([author.full_name for author in self.authors.all()])
+        return self.authors_display
 
     @property
     def genres_list(self):
         """Retourne la liste des genres sous forme de chaîne"""
-        return ", ".join([genre.name for genre in self.genres.all()])
+        return self.genres_display
+
+    @classmethod
+    def bump_circulation_version(cls, *book_ids):
+        """Signale un changement d'emprunts/réservations (updated_date reste celle du contenu)"""
+        cls.objects.filter(pk__in=book_ids).update(
+            circulation_version=models.F('circulation_version') + 1,
+            circulation_changed_at=timezone.now(),
+        )
+
+    @classmethod
+    def refresh_display_columns(cls, book_ids=None, batch_size=1000):
+        """
+        Recalcule authors_display et genres_display (tout le catalogue si book_ids est None).
+        Retourne le nombre de livres modifiés.
+        """
+        if book_ids is None:
+            book_ids = cls.objects.order_by('pk').values_list('pk', flat=True)
+        book_ids = list(book_ids)
+
+        updated = 0
+        for start in range(0, len(book_ids), batch_size):
+            batch = book_ids[start:start + batch_size]
+
+            authors = {}
+            author_rows = cls.authors.through.objects.filter(book_id__in=batch).order_by(
+                'author__last_name', 'author__first_name', 'author_id'
+            ).values_list('book_id', 'author__first_name', 'author__last_name')
+            for book_id, first_name, last_name in author_rows:
+                authors.setdefault(book_id, []).append(f"{first_name} {last_name}")
+
+            genres = {}
+            genre_rows = cls.genres.through.objects.filter(book_id__in=batch).order_by(
+                'genre__name'
+            ).values_list('book_id', 'genre__name')
+            for book_id, name in genre_rows:
+                genres.setdefault(book_id, []).append(name)
+
+            changed = []
+            now = timezone.now()
+            current = cls.objects.filter(pk__in=batch).values_list('pk', 'authors_display', 'genres_display')
+            for book_id, authors_display, genres_display in current:
+                new_authors = ", ".join(authors.get(book_id, []))
+                new_genres = ", ".join(genres.get(book_id, []))
+                if (new_authors, new_genres) != (authors_display, genres_display):
+                    # bulk_update ne gère pas auto_now : updated_date est avancée explicitement
+                    changed.append(cls(pk=book_id, authors_display=new_authors, genres_display=new_genres, updated_date=now))
+
+            cls.objects.bulk_update(changed, ['authors_display', 'genres_display', 'updated_date'])
+            updated += len(changed)
+        return updated
+
+    def clean(self):
+        super().clean()
+        # Nouvel ISBN (création ou modification) déjà porté par un autre livre, quelle que soit son écriture
+        isbn13 = normalize_isbn13(self.isbn)
+        if not isbn13:
+            return
+        previous_isbn = Book.objects.filter(pk=self.pk).values_list('isbn', flat=True).first() if self.pk else None
+        if self.isbn != previous_isbn and Book.objects.filter(isbn13=isbn13).exclude(pk=self.pk).exists():
+            raise ValidationError({'isbn': "Un autre livre porte déjà cet ISBN (sous une autre écriture)."})
 
     def save(self, *args, **kwargs):
         # S'assurer que available_copies ne dépasse pas total_copies
         if self.available_copies > self.total_copies:
             self.available_copies = self.total_copies
+        # Forme normalisée de l'ISBN pour la recherche exacte. Une autre écriture d'un ISBN
+        # déjà indexé (doublons historiques écartés par la reprise, création hors formulaire)
+        # reste hors de l'index : clean() signale le conflit aux formulaires.
+        isbn13 = normalize_isbn13(self.isbn)
+        if isbn13 != self.isbn13:
+            if isbn13 and Book.objects.filter(isbn13=isbn13).exclude(pk=self.pk).exists():
+                isbn13 = None
+            self.isbn13 = isbn13
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'isbn' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'isbn13'}
         super().save(*args, **kwargs)
 
 
-class Loan(models.Model):
+class Loan(DashboardSummaryMixin, StatusCountedMixin, models.Model):
     """Modèle pour les emprunts"""
     LOAN_STATUS = [
         ('borrowed', 'Emprunté'),
@@ -219,6 +381,9 @@ class Loan(models.Model):
         verbose_name = "Emprunt"
         verbose_name_plural = "Emprunts"
         ordering = ['-loan_date']
+        indexes = [
+            models.Index(fields=['-loan_date', '-id'], name='library_loan_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title} ({self.status})"
@@ -255,12 +420,10 @@ class Loan(models.Model):
         return False
 
     def return_book(self):
-        """Marque le livre comme rendu"""
-        self.return_date = timezone.now()
-        self.status = 'returned'
-        self.book.available_copies += 1
-        self.book.save()
-        self.save()
+        """Marque le livre comme rendu (transaction verrouillée, avec promotion des réservations)"""
+        from .circulation_services import CirculationService
+
+        return CirculationService.return_loan(self)
 
     def save(self, *args, **kwargs):
         # Définir la date de retour selon les paramètres si pas définie
@@ -276,7 +439,7 @@ class Loan(models.Model):
 
 
 
-class Reservation(models.Model):
+class Reservation(StatusCountedMixin, models.Model):
     """Modèle pour les réservations"""
     RESERVATION_STATUS = [
         ('active', 'En attente'),
@@ -294,6 +457,10 @@ class Reservation(models.Model):
     status = models.CharField(max_length=10, choices=RESERVATION_STATUS, default='active', verbose_name="Statut")
     notification_sent = models.BooleanField(default=False, verbose_name="Notification envoyée")
     priority = models.IntegerField(default=0, verbose_name="Priorité")
+    queue_position = models.PositiveIntegerField(
+        null=True, blank=True, editable=False, verbose_name="Position dans la file",
+        help_text="Maintenue par ReservationQueueService (réservations actives uniquement)"
+    )
     notes = models.TextField(blank=True, verbose_name="Notes")
 
     class Meta:
@@ -307,6 +474,12 @@ class Reservation(models.Model):
                 name='unique_active_reservation_per_user_book'
             )
         ]
+        indexes = [
+            models.Index(fields=['-reservation_date', '-id'], name='library_reservation_date_idx'),
+            # Expiration groupée (ReservationExpiryService)
+            models.Index(fields=['status', 'expiry_date'], name='library_reservation_expiry_idx'),
+            models.Index(fields=['status', 'ready_date'], name='library_reservation_ready_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title} ({self.get_status_display()})"
@@ -331,15 +504,25 @@ class Reservation(models.Model):
         return self.status == 'active'
 
     def get_position_in_queue(self):
-        """Obtient la position dans la file d'attente"""
+        """
+        Obtient la position dans la file d'attente (colonne maintenue, sans requête). Une
+        ligne jamais numérotée (loaddata, bulk_create) est placée par un comptage, dans
+        l'ordre de ReservationQueueService : priorité, date de réservation, identifiant.
+        """
         if self.status != 'active':
             return 0
-
-        return Reservation.objects.filter(
-            book=self.book,
-            status='active',
-            reservation_date__lt=self.reservation_date
-        ).count() + 1
+        if self.queue_position is not None:
+            return self.queue_position
+        if self.pk is None or self.reservation_date is None:
+            # Pas encore enregistrée : derrière toutes les réservations de même priorité
+            ahead = models.Q(priority__lte=self.priority)
+        else:
+            ahead = (
+                models.Q(priority__lt=self.priority)
+                | models.Q(priority=self.priority, reservation_date__lt=self.reservation_date)
+                | models.Q(priority=self.priority, reservation_date=self.reservation_date, pk__lt=self.pk)
+            )
+        return Reservation.objects.filter(ahead, book_id=self.book_id, status='active').exclude(pk=self.pk).count() + 1
 
     def estimate_wait_time(self):
         """Estime le temps d'attente en jours"""
@@ -397,51 +580,18 @@ class Reservation(models.Model):
 
     @classmethod
     def cleanup_expired_reservations(cls):
-        """Nettoie les réservations expirées"""
-        now = timezone.now()
-        count = 0
-
-        # Réservations actives expirées
-        expired_active = cls.objects.filter(
-            status='active',
-            expiry_date__lt=now
-        )
-
-        for reservation in expired_active:
-            if reservation.mark_as_expired():
-                count += 1
-
-        # Réservations prêtes expirées
-        expired_ready = cls.objects.filter(
-            status='ready',
-            ready_date__lt=now - timedelta(days=LibraryConfig.RESERVATION_HOLD_DURATION)
-        )
-
-        for reservation in expired_ready:
-            if reservation.mark_as_expired():
-                count += 1
+        """Nettoie les réservations expirées (un UPDATE par statut)"""
+        from .reservation_services import ReservationExpiryService
 
+        count, _ = ReservationExpiryService.expire()
         return count
 
     @classmethod
     def process_ready_reservations(cls):
-        """Traite les réservations qui peuvent devenir prêtes"""
-        ready_count = 0
-
-        # Trouver les livres avec des exemplaires disponibles
-        available_books = Book.objects.filter(available_copies__gt=0)
-
-        for book in available_books:
-            # Trouver la première réservation active pour ce livre
-            next_reservation = cls.objects.filter(
-                book=book,
-                status='active'
-            ).order_by('priority', 'reservation_date').first()
-
-            if next_reservation and next_reservation.mark_as_ready():
-                ready_count += 1
+        """Traite les réservations qui peuvent devenir prêtes (autant que d'exemplaires libres par livre)"""
+        from .reservation_services import ReservationPromotionService
 
-        return ready_count
+        return len(ReservationPromotionService.promote())
 
     def save(self, *args, **kwargs):
         # Définir la date d'expiration si pas définie (7 jours par défaut)
@@ -474,6 +624,65 @@ class Favorite(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.book.title}"
 
+
+class BookNeighbor(models.Model):
+    """
+    Voisins d'un livre selon les co-emprunts (similarité cosinus item-item).
+    Table précalculée par la commande build_book_neighbors, lue par RecommendationService.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbors', verbose_name="Livre")
+    neighbor = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name="Livre voisin")
+    score = models.FloatField(verbose_name="Similarité")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rang")
+
+    class Meta:
+        verbose_name = "Voisin de livre"
+        verbose_name_plural = "Voisins de livres"
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='library_bookneighbor_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} → {self.neighbor_id} ({self.score:.3f})"
+
+
+class SimilarBook(models.Model):
+    """
+    Livres au contenu proche (TF-IDF du titre, de la description et des genres).
+    Table précalculée par la commande build_similar_books, lue par la page du livre.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='similar_books', verbose_name="Livre")
+    similar = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+', verbose_name="Livre similaire")
+    score = models.FloatField(verbose_name="Similarité")
+    rank = models.PositiveSmallIntegerField(verbose_name="Rang")
+
+    class Meta:
+        verbose_name = "Livre similaire"
+        verbose_name_plural = "Livres similaires"
+        ordering = ['book', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'rank'], name='library_similarbook_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} ≈ {self.similar_id} ({self.score:.3f})"
+
+
+class BookContentSignature(models.Model):
+    """Empreinte du contenu vectorisé d'un livre lors du dernier calcul des livres similaires"""
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='content_signature', verbose_name="Livre")
+    fingerprint = models.CharField(max_length=40, verbose_name="Empreinte")
+    computed_at = models.DateTimeField(verbose_name="Calculé le")
+
+    class Meta:
+        verbose_name = "Empreinte de contenu"
+        verbose_name_plural = "Empreintes de contenu"
+
+    def __str__(self):
+        return f"{self.book_id} : {self.fingerprint[:8]}"
+
+
 class Report(models.Model):
     """Modèle pour les rapports de la bibliothèque"""
     REPORT_TYPES = [
@@ -487,6 +696,7 @@ class Report(models.Model):
         ('statistics', 'Rapport statistiques'),
         ('financial', 'Rapport financier'),
         ('inventory', 'Rapport d\'inventaire'),
+        ('collection', 'Rapport de rotation des collections'),
     ]
 
     REPORT_FORMATS = [
@@ -704,7 +914,7 @@ class LibraryConfig:
         return cls.DEPOSIT_AMOUNTS.get(user_category, 0.0)
 
 
-class BookPurchase(models.Model):
+class BookPurchase(DashboardSummaryMixin, StatusCountedMixin, models.Model):
     """Modèle pour les achats de livres"""
     PURCHASE_STATUS = [
         ('pending', 'En attente'),
@@ -744,6 +954,9 @@ class BookPurchase(models.Model):
         verbose_name = "Achat de livre"
         verbose_name_plural = "Achats de livres"
         ordering = ['-purchase_date']
+        indexes = [
+            models.Index(fields=['-purchase_date', '-id'], name='library_purchase_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.book.title} ({self.quantity}x)"
@@ -763,7 +976,7 @@ class BookPurchase(models.Model):
         return (self.unit_price * discount_percentage_decimal / Decimal('100')) * self.quantity
 
 
-class Payment(models.Model):
+class Payment(DashboardSummaryMixin, models.Model):
     """Modèle pour les paiements"""
     PAYMENT_TYPES = [
         ('purchase', 'Achat de livre'),
@@ -815,6 +1028,9 @@ class Payment(models.Model):
         verbose_name = "Paiement"
         verbose_name_plural = "Paiements"
         ordering = ['-payment_date']
+        indexes = [
+            models.Index(fields=['-payment_date', '-id'], name='library_payment_date_id_idx'),
+        ]
 
     def __str__(self):
         related_item = ""
@@ -910,7 +1126,7 @@ class Deposit(models.Model):
         self.save()
 
 
-class Delivery(models.Model):
+class Delivery(StatusCountedMixin, models.Model):
     """Modèle pour les livraisons d'achats"""
     DELIVERY_STATUS = [
         ('pending', 'En attente'),
@@ -968,6 +1184,9 @@ class Delivery(models.Model):
         verbose_name = "Livraison"
         verbose_name_plural = "Livraisons"
         ordering = ['-created_date']
+        indexes = [
+            models.Index(fields=['-created_date', '-id'], name='library_delivery_created_idx'),
+        ]
 
     def __str__(self):
         return f"Livraison #{self.id} - {self.purchase.book.title} pour {self.recipient_name}"
@@ -1057,3 +1276,143 @@ class Delivery(models.Model):
             'cancelled': 'fas fa-times-circle',
         }
         return icons.get(self.status, 'fas fa-question')
+
+
+class UserDashboardSummary(models.Model):
+    """
+    Résumé matérialisé du tableau de bord d'un utilisateur.
+    Ajusté par deltas dans la transaction de chaque modification d'emprunt, d'achat ou de
+    paiement, les classements étant recalculés à la lecture (voir DashboardSummaryService) ;
+    la commande rebuild_dashboard_summaries le reconstruit.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='dashboard_summary', verbose_name="Utilisateur")
+
+    current_loans_count = models.PositiveIntegerField(default=0, verbose_name="Emprunts en cours")
+    overdue_loans_count = models.PositiveIntegerField(default=0, verbose_name="Emprunts en retard")
+    total_loans_count = models.PositiveIntegerField(default=0, verbose_name="Emprunts (total)")
+    total_purchases_count = models.PositiveIntegerField(default=0, verbose_name="Achats (total)")
+    pending_purchases_count = models.PositiveIntegerField(default=0, verbose_name="Achats en attente")
+    total_spent = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name="Total dépensé (€)")
+    total_savings = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name="Économies réalisées (€)")
+    outstanding_amount = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), verbose_name="Frais impayés (€)")
+
+    # [{'id', 'name', 'loan_count'}] et [{'id', 'title', 'loan_count'}], 3 au plus
+    top_genres = models.JSONField(default=list, blank=True, verbose_name="Genres préférés")
+    top_books = models.JSONField(default=list, blank=True, verbose_name="Livres les plus empruntés")
+    top_lists_stale = models.BooleanField(default=False, verbose_name="Classements à recalculer")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Dernière mise à jour")
+
+    class Meta:
+        verbose_name = "Résumé du tableau de bord"
+        verbose_name_plural = "Résumés des tableaux de bord"
+
+    def __str__(self):
+        return f"Résumé de {self.user.username}"
+
+
+class DailyActivity(models.Model):
+    """
+    Activité quotidienne agrégée par jour × catégorie d'utilisateur × genre du livre.
+    Maintenue par signaux (DailyActivityService) et reconstruite par rebuild_daily_activity.
+    Un livre est compté dans son genre principal (premier par ordre alphabétique).
+    """
+    day = models.DateField(verbose_name="Jour")
+    user_category = models.CharField(max_length=10, verbose_name="Catégorie d'utilisateur")
+    # Sans contrainte : l'historique d'un genre supprimé est conservé
+    genre = models.ForeignKey(Genre, null=True, blank=True, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+', verbose_name="Genre")
+
+    loans_started = models.IntegerField(default=0, verbose_name="Emprunts")
+    returns = models.IntegerField(default=0, verbose_name="Retours")
+    reservations = models.IntegerField(default=0, verbose_name="Réservations")
+    purchases = models.IntegerField(default=0, verbose_name="Achats")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), verbose_name="Recettes des ventes (€)")
+    late_fees = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), verbose_name="Frais de retard et amendes (€)")
+
+    class Meta:
+        verbose_name = "Activité quotidienne"
+        verbose_name_plural = "Activité quotidienne"
+        ordering = ['-day', 'user_category', 'genre']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'user_category', 'genre'], name='library_dailyactivity_uniq'),
+            models.UniqueConstraint(
+                fields=['day', 'user_category'],
+                condition=models.Q(genre__isnull=True),
+                name='library_dailyactivity_nogenre_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} / {self.user_category} / {self.genre_id or '-'}"
+
+
+class StatusCounter(models.Model):
+    """
+    Compteur maintenu d'un modèle par statut (ou étiquette : « available », « staff »...).
+    Ajusté par F() dans la transaction de chaque changement (StatusCounterService) ;
+    la commande check_status_counters détecte et corrige les écarts.
+    """
+    model = models.CharField(max_length=30, verbose_name="Modèle")
+    label = models.CharField(max_length=50, verbose_name="Statut")
+    count = models.BigIntegerField(default=0, verbose_name="Nombre")
+
+    class Meta:
+        verbose_name = "Compteur de statut"
+        verbose_name_plural = "Compteurs de statut"
+        ordering = ['model', 'label']
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'label'], name='library_statuscounter_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}.{self.label} = {self.count}"
+
+
+class TitleTurnover(models.Model):
+    """
+    Rotation d'un titre : table de rapport recalculée par build_collection_report
+    (CollectionReportService), jamais modifiée entre deux calculs.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='turnover', verbose_name="Livre")
+    genre = models.ForeignKey(Genre, null=True, blank=True, on_delete=models.SET_NULL, related_name='+', verbose_name="Genre principal")
+    copies = models.PositiveIntegerField(default=0, verbose_name="Exemplaires")
+    loans = models.PositiveIntegerField(default=0, verbose_name="Emprunts sur la période")
+    turnover = models.FloatField(default=0, verbose_name="Rotation (emprunts par exemplaire et par an)")
+    last_loan_date = models.DateTimeField(null=True, blank=True, verbose_name="Dernier emprunt")
+    idle_copies = models.PositiveIntegerField(default=0, verbose_name="Exemplaires inactifs")
+    queue_length = models.PositiveIntegerField(default=0, verbose_name="Réservations en attente")
+    oldest_reservation_date = models.DateTimeField(null=True, blank=True, verbose_name="Plus ancienne réservation en attente")
+    has_persistent_queue = models.BooleanField(default=False, verbose_name="File d'attente persistante")
+    computed_at = models.DateTimeField(verbose_name="Calculé le")
+
+    class Meta:
+        verbose_name = "Rotation d'un titre"
+        verbose_name_plural = "Rotation des titres"
+        ordering = ['turnover', 'book']
+        indexes = [
+            models.Index(fields=['turnover'], name='library_titleturnover_rate'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} : {self.turnover:.2f}"
+
+
+class GenreTurnover(models.Model):
+    """Rotation d'un genre (titres comptés dans leur genre principal), calculée avec TitleTurnover"""
+    genre = models.OneToOneField(Genre, null=True, blank=True, on_delete=models.CASCADE, related_name='turnover', verbose_name="Genre")
+    titles = models.PositiveIntegerField(default=0, verbose_name="Titres")
+    copies = models.PositiveIntegerField(default=0, verbose_name="Exemplaires")
+    loans = models.PositiveIntegerField(default=0, verbose_name="Emprunts sur la période")
+    turnover = models.FloatField(default=0, verbose_name="Rotation (emprunts par exemplaire et par an)")
+    idle_titles = models.PositiveIntegerField(default=0, verbose_name="Titres inactifs")
+    idle_copies = models.PositiveIntegerField(default=0, verbose_name="Exemplaires inactifs")
+    queued_titles = models.PositiveIntegerField(default=0, verbose_name="Titres avec file persistante")
+    computed_at = models.DateTimeField(verbose_name="Calculé le")
+
+    class Meta:
+        verbose_name = "Rotation d'un genre"
+        verbose_name_plural = "Rotation des genres"
+        ordering = ['turnover']
+
+    def __str__(self):
+        return f"{self.genre_id or '-'} : {self.turnover:.2f}"
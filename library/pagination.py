@@ -0,0 +1,226 @@
+"""
+Pagination par curseur (keyset) pour les grandes listes
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connections
+from django.db.models import Q
+
+
+def encode_cursor(direction, values):
+    """Encode une position (sens + valeurs des colonnes de tri) en jeton opaque"""
+    serialized = []
+    for value in values:
+        if isinstance(value, (datetime.date, datetime.datetime, datetime.time)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        serialized.append(value)
+    payload = json.dumps({'d': direction, 'v': serialized}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Décode un jeton de curseur ; retourne (sens, valeurs) ou None s'il est invalide"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['v']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if direction not in ('next', 'previous') or not isinstance(values, list):
+        return None
+    return direction, values
+
+
+class KeysetPage:
+    """Page de résultats d'un KeysetPaginator"""
+
+    def __init__(self, object_list, paginator, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f"<KeysetPage ({len(self.object_list)} éléments)>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginateur par curseur : chaque page est obtenue en se positionnant après (ou avant)
+    les valeurs de tri du dernier élément affiché, sans OFFSET ni COUNT(*) complet.
+
+    Le tri du queryset (ou à défaut celui du modèle) est complété par la clé primaire
+    pour être total. Les colonnes de tri doivent être non nulles.
+    """
+
+    # Au-delà de ce nombre de lignes, le total affiché est une estimation
+    EXACT_COUNT_LIMIT = 1000
+
+    def __init__(self, queryset, per_page, exact_count_limit=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.exact_count_limit = exact_count_limit or self.EXACT_COUNT_LIMIT
+        self.ordering = self.get_ordering(queryset)
+        self._count = None
+        self.count_is_exact = True
+        self.count_is_estimate = False
+
+    @staticmethod
+    def get_ordering(queryset):
+        """Colonnes de tri [(nom, décroissant)], terminées par la clé primaire"""
+        model = queryset.model
+        order_by = list(queryset.query.order_by or model._meta.ordering)
+        ordering = []
+        for item in order_by:
+            if not isinstance(item, str) or '__' in item or item.lstrip('-') == '?':
+                raise ValueError(f"Tri non pris en charge par la pagination par curseur : {item!r}")
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name == 'pk':
+                name = model._meta.pk.name
+            ordering.append((name, descending))
+
+        pk_name = model._meta.pk.name
+        if pk_name not in [name for name, _ in ordering]:
+            ordering.append((pk_name, ordering[-1][1] if ordering else False))
+        return ordering
+
+    def field_value(self, obj, name):
+        """Valeur d'une colonne de tri pour un objet (champ ou annotation)"""
+        try:
+            field = self.queryset.model._meta.get_field(name)
+            return getattr(obj, field.attname)
+        except FieldDoesNotExist:
+            return getattr(obj, name)
+
+    def parse_values(self, values):
+        """Reconvertit les valeurs d'un curseur dans le type des colonnes de tri"""
+        if len(values) != len(self.ordering):
+            return None
+        parsed = []
+        for (name, _), value in zip(self.ordering, values):
+            try:
+                field = self.queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                parsed.append(value)
+                continue
+            try:
+                parsed.append(field.to_python(value))
+            except ValidationError:
+                return None
+        return parsed
+
+    def seek_filter(self, values, forward):
+        """
+        Condition « strictement après » (ou avant) une position, dans l'ordre lexicographique
+        des colonnes de tri : (a > x) OU (a = x ET b > y) OU ...
+        """
+        condition = Q()
+        for index, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending == forward else 'gt'
+            clause = Q(**{f'{name}__{lookup}': values[index]})
+            for previous_index in range(index):
+                clause &= Q(**{self.ordering[previous_index][0]: values[previous_index]})
+            condition |= clause
+        return condition
+
+    def order_by(self, forward):
+        """Tri du queryset dans le sens de lecture (inversé pour la page précédente)"""
+        return [
+            f"{'-' if descending == forward else ''}{name}"
+            for name, descending in self.ordering
+        ]
+
+    def cursor_for(self, direction, obj):
+        return encode_cursor(direction, [self.field_value(obj, name) for name, _ in self.ordering])
+
+    def get_page(self, cursor=None):
+        """Page située après (ou avant) le curseur ; première page si le curseur est absent ou invalide"""
+        position = decode_cursor(cursor) if cursor else None
+        values = self.parse_values(position[1]) if position else None
+        if values is None:
+            position = None
+
+        forward = position is None or position[0] == 'next'
+        queryset = self.queryset.order_by(*self.order_by(forward))
+        if position:
+            queryset = queryset.filter(self.seek_filter(values, forward))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        if forward:
+            has_next, has_previous = has_more, position is not None
+        else:
+            has_next, has_previous = True, has_more
+
+        next_cursor = self.cursor_for('next', rows[-1]) if has_next and rows else None
+        previous_cursor = self.cursor_for('previous', rows[0]) if has_previous and rows else None
+        return KeysetPage(rows, self, has_next, has_previous, next_cursor, previous_cursor)
+
+    @property
+    def count(self):
+        """
+        Nombre de résultats : exact jusqu'à EXACT_COUNT_LIMIT (COUNT borné par LIMIT),
+        au-delà estimé par le planificateur (PostgreSQL) ou affiché comme minimum.
+        """
+        if self._count is None:
+            queryset = self.queryset.order_by()
+            bounded = queryset[:self.exact_count_limit + 1].count()
+            if bounded <= self.exact_count_limit:
+                self._count = bounded
+            else:
+                self.count_is_exact = False
+                estimate = self.estimate_count(queryset)
+                self.count_is_estimate = estimate is not None and estimate > self.exact_count_limit
+                self._count = estimate if self.count_is_estimate else self.exact_count_limit
+        return self._count
+
+    @property
+    def count_label(self):
+        """Total à afficher : exact, estimé (« ≈ ») ou minimum (« plus de »)"""
+        count = self.count
+        if self.count_is_exact:
+            return str(count)
+        if self.count_is_estimate:
+            return f"≈ {count}"
+        return f"plus de {count}"
+
+    @staticmethod
+    def estimate_count(queryset):
+        """Estimation du nombre de lignes par les statistiques du planificateur (PostgreSQL)"""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
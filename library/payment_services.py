@@ -3,6 +3,7 @@ Services de gestion des paiements pour la bibliothèque
 """
 
 from decimal import Decimal
+from django.db.models import Sum
 from django.utils import timezone
 from datetime import timedelta
 from .models import Payment, BookPurchase, Loan, LibraryConfig
@@ -128,7 +129,8 @@ class PaymentService:
             status='pending'
         )
         
-        total = sum(payment.amount for payment in pending_payments)
+        # Somme calculée par la base ; les paiements restent une requête paresseuse
+        total = Decimal(pending_payments.aggregate(total=Sum('amount'))['total'] or 0).quantize(Decimal('0.01'))
         return total, pending_payments
 
     @staticmethod
@@ -0,0 +1,274 @@
+"""
+Recommandations de livres par co-emprunts (filtrage collaboratif item-item)
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from .models import Book, Loan, Favorite, BookNeighbor
+
+
+class RecommendationService:
+    """
+    Les voisins de chaque livre sont précalculés hors ligne (build_neighbors) à partir
+    de la matrice creuse utilisateurs × livres des emprunts et favoris. Les recommandations
+    d'un lecteur fusionnent les voisins de ses lectures récentes et sont mises en cache.
+    """
+
+    CACHE_PREFIX = 'recommendations'
+    CACHE_TIMEOUT = 3600
+
+    TOP_NEIGHBORS = 20
+    MIN_SUPPORT = 2
+    FAVORITE_WEIGHT = 1.0
+    MAX_ITEMS_PER_USER = 200
+    RECENT_BOOKS = 10
+    CANDIDATES = 40
+    # Nombre de paires accumulées avant réduction (borne la mémoire)
+    PAIR_BUFFER = 2_000_000
+
+    # ----- Construction de la table des voisins -----
+
+    @staticmethod
+    def fetch_interactions(queryset, date_field):
+        """(utilisateur, livre, horodatage) de chaque ligne, une ligne par (utilisateur, livre)"""
+        rows = np.array(
+            [(user_id, book_id, date.timestamp())
+             for user_id, book_id, date in queryset.order_by().values_list('user_id', 'book_id', date_field).iterator()],
+            dtype=float,
+        ).reshape(-1, 3)
+        if not len(rows):
+            return rows
+        pairs, inverse = np.unique(rows[:, :2], axis=0, return_inverse=True)
+        latest = np.full(len(pairs), -np.inf)
+        np.maximum.at(latest, inverse.ravel(), rows[:, 2])
+        return np.column_stack([pairs, latest])
+
+    @classmethod
+    def interactions(cls, favorite_weight, max_items_per_user):
+        """
+        Matrice creuse des interactions au format coordonnées : (utilisateurs, livres, poids),
+        triée par utilisateur puis par récence. Un emprunt vaut 1 (quel que soit le nombre
+        d'emprunts du même livre), un favori ajoute favorite_weight.
+        """
+        loans = cls.fetch_interactions(Loan.objects.all(), 'loan_date')
+        favorites = cls.fetch_interactions(Favorite.objects.all(), 'added_date')
+        loans = np.column_stack([loans, np.ones(len(loans))])
+        favorites = np.column_stack([favorites, np.full(len(favorites), float(favorite_weight))])
+
+        entries = np.concatenate([loans, favorites])
+        if not len(entries):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+
+        pairs, inverse = np.unique(entries[:, :2], axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        weights = np.bincount(inverse, weights=entries[:, 3])
+        recency = np.zeros(len(pairs))
+        np.maximum.at(recency, inverse, entries[:, 2])
+
+        _, user_index = np.unique(pairs[:, 0].astype(np.int64), return_inverse=True)
+        book_ids, book_index = np.unique(pairs[:, 1].astype(np.int64), return_inverse=True)
+
+        # Par utilisateur, des plus récentes aux plus anciennes ; au plus max_items_per_user
+        order = np.lexsort((-recency, user_index))
+        user_index, book_index, weights = user_index[order], book_index[order], weights[order]
+        starts = np.flatnonzero(np.r_[True, user_index[1:] != user_index[:-1]])
+        position = np.arange(len(user_index)) - np.repeat(starts, np.diff(np.r_[starts, len(user_index)]))
+        keep = position < max_items_per_user
+
+        return user_index[keep], book_index[keep], weights[keep], book_ids
+
+    @staticmethod
+    def reduce_pairs(codes, products, supports):
+        """Additionne produits et supports des paires identiques"""
+        codes, inverse = np.unique(codes, return_inverse=True)
+        return (
+            codes,
+            np.bincount(inverse, weights=products),
+            np.bincount(inverse, weights=supports).astype(np.int64),
+        )
+
+    @classmethod
+    def cooccurrences(cls, user_index, book_index, weights, book_count):
+        """
+        Produits scalaires X[:, i]·X[:, j] et nombre de lecteurs communs pour chaque paire i < j,
+        paires encodées i * book_count + j.
+        """
+        codes = np.empty(0, dtype=np.int64)
+        products = np.empty(0)
+        supports = np.empty(0, dtype=np.int64)
+        buffer_codes, buffer_products, buffered = [], [], 0
+
+        starts = np.flatnonzero(np.r_[True, user_index[1:] != user_index[:-1]]) if len(user_index) else []
+        bounds = np.r_[starts, len(user_index)]
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if end - start < 2:
+                continue
+            books, values = book_index[start:end], weights[start:end]
+            left, right = np.triu_indices(end - start, 1)
+            low = np.minimum(books[left], books[right])
+            high = np.maximum(books[left], books[right])
+            buffer_codes.append(low * book_count + high)
+            buffer_products.append(values[left] * values[right])
+            buffered += len(left)
+
+            if buffered >= cls.PAIR_BUFFER:
+                codes, products, supports = cls.reduce_pairs(
+                    np.concatenate([codes, *buffer_codes]),
+                    np.concatenate([products, *buffer_products]),
+                    np.concatenate([supports, np.ones(buffered, dtype=np.int64)]),
+                )
+                buffer_codes, buffer_products, buffered = [], [], 0
+
+        if buffered:
+            codes, products, supports = cls.reduce_pairs(
+                np.concatenate([codes, *buffer_codes]),
+                np.concatenate([products, *buffer_products]),
+                np.concatenate([supports, np.ones(buffered, dtype=np.int64)]),
+            )
+        return codes, products, supports
+
+    @classmethod
+    def compute_neighbors(cls, top_n=None, min_support=None, favorite_weight=None, max_items_per_user=None):
+        """
+        Similarité cosinus entre livres et top-N voisins de chacun.
+        Retourne (livres, voisins, scores, rangs) en identifiants de livres, et des statistiques.
+        """
+        top_n = top_n or cls.TOP_NEIGHBORS
+        min_support = cls.MIN_SUPPORT if min_support is None else min_support
+        favorite_weight = cls.FAVORITE_WEIGHT if favorite_weight is None else favorite_weight
+        max_items_per_user = max_items_per_user or cls.MAX_ITEMS_PER_USER
+
+        user_index, book_index, weights, book_ids = cls.interactions(favorite_weight, max_items_per_user)
+        book_count = len(book_ids)
+        stats = {
+            'users': len(np.unique(user_index)),
+            'books': book_count,
+            'interactions': len(user_index),
+            'pairs': 0,
+        }
+        empty = (np.empty(0, dtype=np.int64),) * 2 + (np.empty(0), np.empty(0, dtype=np.int64))
+        if book_count < 2:
+            return empty, stats
+
+        norms = np.sqrt(np.bincount(book_index, weights=weights ** 2, minlength=book_count))
+        codes, products, supports = cls.cooccurrences(user_index, book_index, weights, book_count)
+        keep = supports >= max(min_support, 1)
+        codes, products = codes[keep], products[keep]
+        stats['pairs'] = len(codes)
+        if not len(codes):
+            return empty, stats
+
+        low, high = np.divmod(codes, book_count)
+        scores = products / (norms[low] * norms[high])
+
+        # Chaque paire dans les deux sens, puis les top_n meilleurs voisins par livre
+        sources = np.concatenate([low, high])
+        targets = np.concatenate([high, low])
+        scores = np.concatenate([scores, scores])
+        order = np.lexsort((targets, -scores, sources))
+        sources, targets, scores = sources[order], targets[order], scores[order]
+        starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+        ranks = np.arange(len(sources)) - np.repeat(starts, np.diff(np.r_[starts, len(sources)]))
+        keep = ranks < top_n
+
+        return (book_ids[sources[keep]], book_ids[targets[keep]], scores[keep], ranks[keep] + 1), stats
+
+    @classmethod
+    def build_neighbors(cls, batch_size=5000, **options):
+        """Recalcule et remplace la table des voisins ; retourne les statistiques du calcul"""
+        (books, neighbors, scores, ranks), stats = cls.compute_neighbors(**options)
+
+        with transaction.atomic():
+            BookNeighbor.objects.all().delete()
+            BookNeighbor.objects.bulk_create(
+                (
+                    BookNeighbor(book_id=int(book), neighbor_id=int(neighbor), score=float(score), rank=int(rank))
+                    for book, neighbor, score, rank in zip(books, neighbors, scores, ranks)
+                ),
+                batch_size=batch_size,
+            )
+        cls.invalidate_all()
+
+        stats['neighbors'] = len(books)
+        return stats
+
+    # ----- Recommandations -----
+
+    @classmethod
+    def version(cls):
+        return cache.get(f'{cls.CACHE_PREFIX}:version', 0)
+
+    @classmethod
+    def user_key(cls, user_id):
+        return f'{cls.CACHE_PREFIX}:v{cls.version()}:user:{user_id}'
+
+    @classmethod
+    def invalidate_user(cls, user_id):
+        cache.delete(cls.user_key(user_id))
+
+    @classmethod
+    def invalidate_all(cls):
+        """Rend obsolètes toutes les recommandations en cache (nouvelle table de voisins)"""
+        key = f'{cls.CACHE_PREFIX}:version'
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    @classmethod
+    def candidate_ids(cls, user_id):
+        """
+        Livres candidats, du plus au moins recommandé : somme des similarités avec les
+        lectures récentes et favoris du lecteur, hors livres déjà empruntés.
+        """
+        recent = list(
+            Loan.objects.filter(user_id=user_id).order_by('-loan_date').values_list('book_id', flat=True)[:cls.RECENT_BOOKS * 3]
+        )
+        seen = cls.borrowed_ids(user_id)
+        sources = list(dict.fromkeys(recent))[:cls.RECENT_BOOKS]
+        sources += list(Favorite.objects.filter(user_id=user_id).values_list('book_id', flat=True)[:cls.RECENT_BOOKS])
+        if not sources:
+            return []
+
+        scores = {}
+        for neighbor_id, score in BookNeighbor.objects.filter(book_id__in=set(sources)).values_list('neighbor_id', 'score'):
+            if neighbor_id not in seen:
+                scores[neighbor_id] = scores.get(neighbor_id, 0) + score
+        return sorted(scores, key=lambda book_id: (-scores[book_id], book_id))[:cls.CANDIDATES]
+
+    @staticmethod
+    def borrowed_ids(user_id):
+        """Livres déjà empruntés par le lecteur (exclus des recommandations)"""
+        return set(Loan.objects.filter(user_id=user_id).order_by().values_list('book_id', flat=True).distinct())
+
+    @classmethod
+    def popular_ids(cls):
+        """Livres les plus empruntés (repli sans historique ni voisins)"""
+        key = f'{cls.CACHE_PREFIX}:v{cls.version()}:popular'
+        book_ids = cache.get(key)
+        if book_ids is None:
+            book_ids = list(
+                Book.objects.annotate(loan_count=Count('loans')).order_by('-loan_count', 'pk').values_list('pk', flat=True)[:cls.CANDIDATES]
+            )
+            cache.set(key, book_ids, cls.CACHE_TIMEOUT)
+        return book_ids
+
+    @classmethod
+    def recommended_books(cls, user, limit=4):
+        """Livres disponibles recommandés au lecteur (candidats en cache, disponibilité vérifiée)"""
+        key = cls.user_key(user.pk)
+        book_ids = cache.get(key)
+        if book_ids is None:
+            book_ids = cls.candidate_ids(user.pk)
+            if not book_ids:
+                # Repli : livres populaires, hors livres déjà empruntés
+                seen = cls.borrowed_ids(user.pk)
+                book_ids = [book_id for book_id in cls.popular_ids() if book_id not in seen]
+            cache.set(key, book_ids, cls.CACHE_TIMEOUT)
+
+        books = Book.objects.in_bulk(book_ids)
+        available = [books[book_id] for book_id in book_ids if book_id in books and books[book_id].is_available]
+        return available[:limit]
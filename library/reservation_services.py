@@ -3,32 +3,30 @@ Services de gestion des réservations pour la bibliothèque
 """
 
 from django.utils import timezone
+from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, IntegerField, Min, Q, Sum, Value, When, Window
+from django.db.models.functions import RowNumber
 from datetime import timedelta
 from .models import Reservation, Book, Loan, LibraryConfig
+from .analytics_services import CirculationAnalytics
+from .cache_services import PageCacheService
+from .counter_services import StatusCounterService
+from .eligibility_services import EligibilityService
 
 
 class ReservationService:
     """Service pour gérer les réservations"""
 
     @staticmethod
-    def create_reservation(user, book):
-        """Créer une nouvelle réservation"""
-        # Vérifications préalables
-        if book.is_available:
-            return False, "Ce livre est actuellement disponible. Vous pouvez l'emprunter directement."
-        
-        if Reservation.objects.filter(user=user, book=book, status__in=['active', 'ready']).exists():
-            return False, "Vous avez déjà une réservation active pour ce livre."
-        
-        if Loan.objects.filter(user=user, book=book, status__in=['borrowed', 'overdue']).exists():
-            return False, "Vous avez déjà emprunté ce livre."
-        
-        # Vérifier les emprunts en retard
-        overdue_loans = Loan.objects.filter(user=user, status='overdue').count()
-        if overdue_loans > 0:
-            return False, f"Vous avez {overdue_loans} livre(s) en retard. Veuillez les retourner avant de faire de nouvelles réservations."
+    def create_reservation(user, book, verdict=None):
+        """Créer une nouvelle réservation (verdict : éligibilité déjà calculée pour ce lecteur et ce livre)"""
+        # Vérifications préalables (une requête)
+        can_reserve, message = (verdict or EligibilityService.check(user, book)).can_reserve()
+        if not can_reserve:
+            return False, message
         
         # Créer la réservation
         expiry_date = timezone.now() + timedelta(days=LibraryConfig.RESERVATION_DURATION)
@@ -51,56 +49,39 @@ class ReservationService:
 
     @staticmethod
     def process_next_reservation(book):
-        """Traiter la prochaine réservation pour un livre"""
-        if book.available_copies > 0:
-            next_reservation = Reservation.objects.filter(
-                book=book,
-                status='active'
-            ).order_by('priority', 'reservation_date').first()
-            
-            if next_reservation:
-                if next_reservation.mark_as_ready():
-                    # Envoyer notification
-                    NotificationService.send_book_ready_notification(next_reservation)
-                    return next_reservation
-        return None
+        """Traiter la prochaine réservation pour un livre (moteur de promotion : livre verrouillé, mises de côté comptées)"""
+        promoted = ReservationPromotionService.promote(book_ids=[book.pk])
+        if not promoted:
+            return None
+
+        ready = list(Reservation.objects.select_related('user', 'book').filter(pk__in=promoted).order_by('pk'))
+        for reservation in ready:
+            NotificationService.send_book_ready_notification(reservation)
+        return ready[0]
 
     @staticmethod
     def fulfill_reservation(reservation, processed_by=None):
         """Satisfaire une réservation en créant un emprunt"""
+        from .circulation_services import CirculationService
+
         if reservation.status != 'ready':
             return False, "Cette réservation n'est pas prête à être satisfaite."
         
-        if reservation.book.available_copies <= 0:
-            return False, "Ce livre n'est plus disponible."
-        
-        # Créer l'emprunt
+        # Créer l'emprunt : décrément conditionnel du stock et réservation satisfaite, en une transaction
         loan_duration = LibraryConfig.get_loan_duration(reservation.user.category)
         due_date = timezone.now().date() + timedelta(days=loan_duration)
         
-        loan = Loan.objects.create(
-            user=reservation.user,
-            book=reservation.book,
-            due_date=due_date,
-            status='borrowed'
+        return CirculationService.lend(
+            reservation.user, reservation.book, due_date, reservation=reservation, status='borrowed'
         )
-        
-        # Marquer la réservation comme satisfaite
-        reservation.mark_as_fulfilled()
-        
-        # Mettre à jour le stock
-        reservation.book.available_copies -= 1
-        reservation.book.save()
-        
-        return True, loan
 
     @staticmethod
     def cleanup_expired_reservations():
         """Nettoyer les réservations expirées"""
-        count = Reservation.cleanup_expired_reservations()
+        count, book_ids = ReservationExpiryService.expire()
         
-        # Traiter les nouvelles réservations qui peuvent devenir prêtes
-        ready_count = Reservation.process_ready_reservations()
+        # Traiter les réservations qui peuvent devenir prêtes sur les livres concernés
+        ready_count = len(ReservationPromotionService.promote(book_ids=book_ids)) if book_ids else 0
         
         return count, ready_count
 
@@ -114,24 +95,8 @@ class ReservationService:
 
     @staticmethod
     def get_queue_info(book):
-        """Obtenir les informations de la file d'attente pour un livre"""
-        active_reservations = Reservation.objects.filter(
-            book=book,
-            status='active'
-        ).order_by('priority', 'reservation_date')
-        
-        ready_reservations = Reservation.objects.filter(
-            book=book,
-            status='ready'
-        ).order_by('ready_date')
-        
-        return {
-            'active_count': active_reservations.count(),
-            'ready_count': ready_reservations.count(),
-            'total_count': active_reservations.count() + ready_reservations.count(),
-            'next_in_queue': active_reservations.first(),
-            'ready_reservations': ready_reservations
-        }
+        """Obtenir les informations de la file d'attente pour un livre (instantané sérialisable, en cache)"""
+        return ReservationQueueService.snapshot(book)
 
     @staticmethod
     def handle_book_return(book):
@@ -143,6 +108,271 @@ class ReservationService:
         return "Livre remis en stock"
 
 
+def reservations_changed(book_ids):
+    """
+    Équivalent de book_circulation_changed pour les UPDATE groupés (qui ne passent pas
+    par save()) : nouvelle version des livres et purge de leurs pages.
+    """
+    book_ids = sorted(set(book_ids))
+    if book_ids:
+        Book.bump_circulation_version(*book_ids)
+        PageCacheService.invalidate(*[PageCacheService.book_tag(book_id) for book_id in book_ids])
+
+
+class ReservationQueueService:
+    """
+    Positions de file d'attente maintenues (Reservation.queue_position).
+
+    La file d'un livre regroupe ses réservations actives dans l'ordre de promotion
+    (priorité, date, identifiant). Elle est renumérotée par un seul UPDATE alimenté par
+    ROW_NUMBER() OVER (PARTITION BY livre, statut ...) à chaque création, annulation,
+    expiration ou promotion ; les réservations sorties de la file repassent à NULL.
+    """
+
+    ORDER = [F('priority').asc(), F('reservation_date').asc(), F('pk').asc()]
+    CACHE_PREFIX = 'queue'
+    CACHE_TIMEOUT = 300
+    BATCH_SIZE = 1000
+
+    @classmethod
+    def ranked(cls, book_ids):
+        """(id, statut, rang) des réservations en file ou encore numérotées des livres donnés"""
+        return Reservation.objects.filter(
+            Q(status='active') | Q(queue_position__isnull=False),
+            book_id__in=book_ids,
+        ).annotate(
+            queue_rank=Window(RowNumber(), partition_by=[F('book_id'), F('status')], order_by=cls.ORDER),
+        ).order_by().values_list('pk', 'status', 'queue_rank')
+
+    @classmethod
+    def resequence(cls, *book_ids):
+        """Renumérote la file des livres donnés ; retourne le nombre de lignes réécrites"""
+        book_ids = sorted(set(book_ids))
+        if not book_ids:
+            return 0
+        connection = connections[Reservation.objects.db]
+        quote = connection.ops.quote_name
+        table = quote(Reservation._meta.db_table)
+        sql, params = cls.ranked(book_ids).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH ranked (reservation_id, queue_status, queue_rank) AS ({sql}) '
+                f'UPDATE {table} SET {quote("queue_position")} = '
+                f"CASE WHEN ranked.queue_status = 'active' THEN ranked.queue_rank END "
+                f'FROM ranked WHERE {table}.{quote("id")} = ranked.reservation_id',
+                params,
+            )
+            return cursor.rowcount
+
+    # ----- Instantanés (get_queue_info) -----
+
+    @classmethod
+    def snapshot_key(cls, book_id, version):
+        """Clé versionnée par Book.circulation_version (avancée à chaque changement de réservation)"""
+        return f'{cls.CACHE_PREFIX}:{book_id}:v{version}'
+
+    @staticmethod
+    def empty_snapshot(book_id):
+        return {
+            'book_id': book_id,
+            'active_count': 0,
+            'ready_count': 0,
+            'total_count': 0,
+            'next_in_queue_id': None,
+            'next_hold_expiry': None,
+        }
+
+    @classmethod
+    def compute_snapshots(cls, book_ids):
+        """Instantanés {livre: dict} calculés en une requête groupée (sans cache)"""
+        snapshots = {book_id: cls.empty_snapshot(book_id) for book_id in book_ids}
+        rows = Reservation.objects.filter(
+            book_id__in=book_ids, status__in=['active', 'ready'],
+        ).order_by().values('book_id').annotate(
+            active_count=Count('pk', filter=Q(status='active')),
+            ready_count=Count('pk', filter=Q(status='ready')),
+            next_in_queue_id=Min('pk', filter=Q(status='active', queue_position=1)),
+            first_ready_date=Min('ready_date', filter=Q(status='ready')),
+        )
+        hold = timedelta(days=LibraryConfig.RESERVATION_HOLD_DURATION)
+        for row in rows:
+            first_ready_date = row['first_ready_date']
+            snapshots[row['book_id']].update(
+                active_count=row['active_count'],
+                ready_count=row['ready_count'],
+                total_count=row['active_count'] + row['ready_count'],
+                next_in_queue_id=row['next_in_queue_id'],
+                # Première réservation prête à échoir : un exemplaire peut alors se libérer
+                next_hold_expiry=(first_ready_date + hold).isoformat() if first_ready_date else None,
+            )
+        return snapshots
+
+    @classmethod
+    def snapshots(cls, books):
+        """
+        Instantanés {livre: dict} de plusieurs livres (instances Book) : une lecture
+        groupée du cache, puis une requête groupée par lot pour les absents.
+        """
+        keys = {cls.snapshot_key(book.pk, book.circulation_version): book.pk for book in books}
+        cached = cache.get_many(list(keys))
+        result = {keys[key]: snapshot for key, snapshot in cached.items()}
+        missing = sorted(book_id for key, book_id in keys.items() if key not in cached)
+        if missing:
+            computed = {}
+            for start in range(0, len(missing), cls.BATCH_SIZE):
+                computed.update(cls.compute_snapshots(missing[start:start + cls.BATCH_SIZE]))
+            cache.set_many(
+                {key: computed[book_id] for key, book_id in keys.items() if book_id in computed},
+                cls.CACHE_TIMEOUT,
+            )
+            result.update(computed)
+        return result
+
+    @classmethod
+    def snapshot(cls, book):
+        """Instantané de la file d'un livre : compteurs, prochain en file, échéance des mises de côté"""
+        return cls.snapshots([book])[book.pk]
+
+
+class ReservationExpiryService:
+    """
+    Expiration groupée des réservations : un UPDATE conditionnel par statut, sur les
+    mêmes prédicats que l'aperçu (--dry-run), servis par les index (statut, date).
+    """
+
+    @staticmethod
+    def expired_predicates(now=None):
+        """{statut: Q} des réservations expirées à la date now"""
+        now = now or timezone.now()
+        return {
+            'active': Q(status='active', expiry_date__lt=now),
+            'ready': Q(status='ready', ready_date__lt=now - timedelta(days=LibraryConfig.RESERVATION_HOLD_DURATION)),
+        }
+
+    @classmethod
+    def preview(cls, now=None):
+        """Nombre de réservations à expirer, par statut, sans rien modifier"""
+        return {
+            status: Reservation.objects.filter(predicate).count()
+            for status, predicate in cls.expired_predicates(now).items()
+        }
+
+    @classmethod
+    def expire(cls, now=None):
+        """Expire les réservations dépassées ; retourne (nombre, livres concernés)"""
+        total, book_ids = 0, set()
+        for status, predicate in cls.expired_predicates(now).items():
+            with transaction.atomic():
+                # Lignes verrouillées : l'UPDATE porte exactement sur les livres relevés
+                books = set(
+                    Reservation.objects.select_for_update().filter(predicate).order_by().values_list('book_id', flat=True)
+                )
+                if not books:
+                    continue
+                updated = Reservation.objects.filter(predicate).update(status='expired')
+                StatusCounterService.adjust('reservation', {status: -updated, 'expired': updated})
+                if status == 'active':
+                    ReservationQueueService.resequence(*books)
+            total += updated
+            book_ids |= books
+        reservations_changed(book_ids)
+        return total, sorted(book_ids)
+
+
+class ReservationPromotionService:
+    """
+    Passage ensembliste des réservations actives à l'état « prête ».
+
+    Par livre, les réservations en cours (prêtes d'abord, puis actives par priorité et
+    date) sont numérotées par ROW_NUMBER() OVER (PARTITION BY livre ...) : une réservation
+    active est promue si son rang ne dépasse pas le nombre d'exemplaires disponibles.
+    Les réservations déjà prêtes occupent ainsi les premiers exemplaires. Un seul UPDATE
+    par lot de livres, les livres du lot étant verrouillés pendant la promotion.
+    """
+
+    BATCH_SIZE = 1000
+
+    @classmethod
+    def candidate_book_ids(cls, book_ids=None):
+        """Livres ayant des exemplaires disponibles et au moins une réservation active, triés"""
+        candidates = Reservation.objects.filter(
+            status='active', book__available_copies__gt=0
+        ).order_by('book_id').values_list('book_id', flat=True).distinct()
+        if book_ids is None:
+            return list(candidates)
+        book_ids = sorted(set(book_ids))
+        return [
+            book_id
+            for start in range(0, len(book_ids), cls.BATCH_SIZE)
+            for book_id in candidates.filter(book_id__in=book_ids[start:start + cls.BATCH_SIZE])
+        ]
+
+    @staticmethod
+    def promotable(book_ids, now):
+        """Réservations à promouvoir parmi celles des livres donnés (sous-requête à fenêtre)"""
+        ready_first = Case(When(status='ready', then=Value(0)), default=Value(1), output_field=IntegerField())
+        partition = [F('book_id')]
+        return Reservation.objects.filter(
+            Q(status='ready') | Q(status='active', expiry_date__gte=now),
+            book_id__in=book_ids,
+        ).annotate(
+            queue_rank=Window(
+                RowNumber(),
+                partition_by=partition,
+                order_by=[ready_first.asc(), F('priority').asc(), F('reservation_date').asc(), F('pk').asc()],
+            ),
+            ready_total=Window(
+                Sum(Case(When(status='ready', then=Value(1)), default=Value(0), output_field=IntegerField())),
+                partition_by=partition,
+            ),
+        ).filter(
+            # Rangs 1..ready_total : réservations déjà prêtes ; au-delà : actives
+            queue_rank__gt=F('ready_total'),
+            queue_rank__lte=F('book__available_copies'),
+        ).order_by().values('pk')
+
+    @classmethod
+    def promote_batch(cls, book_ids, now):
+        """Promeut les réservations d'un lot de livres ; retourne les identifiants promus"""
+        with transaction.atomic():
+            list(Book.objects.select_for_update().filter(pk__in=book_ids).order_by('pk').values_list('pk', flat=True))
+            updated = Reservation.objects.filter(pk__in=cls.promotable(book_ids, now)).update(
+                status='ready', ready_date=now, notification_sent=False,
+            )
+            if not updated:
+                return []
+            promoted = list(
+                Reservation.objects.filter(book_id__in=book_ids, status='ready', ready_date=now).values_list('pk', 'book_id')
+            )
+            # L'UPDATE ne passe pas par save() : compteurs et files mis à jour ici
+            StatusCounterService.adjust('reservation', {'active': -len(promoted), 'ready': len(promoted)})
+            ReservationQueueService.resequence(*(book_id for _, book_id in promoted))
+        reservations_changed(book_id for _, book_id in promoted)
+        return [pk for pk, _ in promoted]
+
+    @classmethod
+    def preview(cls, book_ids=None, batch_size=None):
+        """Identifiants des réservations que promote() promouvrait, sans rien modifier"""
+        batch_size = batch_size or cls.BATCH_SIZE
+        now = timezone.now()
+        pending = []
+        candidates = cls.candidate_book_ids(book_ids)
+        for start in range(0, len(candidates), batch_size):
+            pending += [row['pk'] for row in cls.promotable(candidates[start:start + batch_size], now)]
+        return pending
+
+    @classmethod
+    def promote(cls, book_ids=None, batch_size=None):
+        """Promeut, par lots de livres, toutes les réservations servables ; retourne leurs identifiants"""
+        batch_size = batch_size or cls.BATCH_SIZE
+        now = timezone.now()
+        promoted = []
+        candidates = cls.candidate_book_ids(book_ids)
+        for start in range(0, len(candidates), batch_size):
+            promoted += cls.promote_batch(candidates[start:start + batch_size], now)
+        return promoted
+
+
 class NotificationService:
     """Service pour les notifications de réservation"""
 
@@ -254,24 +484,8 @@ class ReservationAnalytics:
 
     @staticmethod
     def get_average_wait_time():
-        """Calculer le temps d'attente moyen"""
-        fulfilled_reservations = Reservation.objects.filter(
-            status='fulfilled',
-            ready_date__isnull=False
-        )
-        
-        if not fulfilled_reservations.exists():
-            return 0
-        
-        total_wait_time = 0
-        count = 0
-        
-        for reservation in fulfilled_reservations:
-            wait_time = (reservation.ready_date - reservation.reservation_date).days
-            total_wait_time += wait_time
-            count += 1
-        
-        return total_wait_time / count if count > 0 else 0
+        """Calculer le temps d'attente moyen (jours entre réservation et mise à disposition)"""
+        return CirculationAnalytics.wait_time_stats()['mean_days'] or 0
 
 
 class ReservationValidator:
@@ -279,25 +493,8 @@ class ReservationValidator:
 
     @staticmethod
     def can_user_reserve(user, book):
-        """Vérifier si un utilisateur peut réserver un livre"""
-        # Livre disponible
-        if book.is_available:
-            return False, "Ce livre est disponible, vous pouvez l'emprunter directement."
-        
-        # Réservation existante
-        if Reservation.objects.filter(user=user, book=book, status__in=['active', 'ready']).exists():
-            return False, "Vous avez déjà une réservation pour ce livre."
-        
-        # Emprunt existant
-        if Loan.objects.filter(user=user, book=book, status__in=['borrowed', 'overdue']).exists():
-            return False, "Vous avez déjà emprunté ce livre."
-        
-        # Emprunts en retard
-        overdue_count = Loan.objects.filter(user=user, status='overdue').count()
-        if overdue_count > 0:
-            return False, f"Vous avez {overdue_count} livre(s) en retard."
-        
-        return True, "Réservation autorisée."
+        """Vérifier si un utilisateur peut réserver un livre (EligibilityService, une requête)"""
+        return EligibilityService.check(user, book).can_reserve('validator')
 
     @staticmethod
     def validate_reservation_limits(user):
@@ -0,0 +1,744 @@
+"""
+Services de recherche pour le catalogue de la bibliothèque
+"""
+
+import bisect
+import re
+import threading
+import time
+import unicodedata
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q, Count, Max, Value, Case, When, BooleanField, FloatField, OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+from .models import Book, Author, Genre, Loan
+
+
+class CatalogSearchIndex:
+    """Index plein texte du catalogue (FTS5 sous SQLite, tsvector/GIN sous PostgreSQL)"""
+
+    SQLITE_TABLE = 'library_book_fts'
+    POSTGRES_TABLE = 'library_book_search'
+
+    # Champs de Book dont la modification impose une réindexation
+    INDEXED_FIELDS = {'title', 'isbn', 'description', 'publisher'}
+
+    # Disponibilité de l'index par base de données (évite une introspection à chaque requête)
+    _available = {}
+
+    @staticmethod
+    def tokenize(query):
+        """Découpe une saisie utilisateur en termes de recherche"""
+        return re.findall(r'\w+', (query or '').lower())
+
+    @classmethod
+    def table_name(cls):
+        """Retourne la table d'index correspondant au moteur de base de données"""
+        if connection.vendor == 'sqlite':
+            return cls.SQLITE_TABLE
+        if connection.vendor == 'postgresql':
+            return cls.POSTGRES_TABLE
+        return None
+
+    @classmethod
+    def is_available(cls):
+        """Vérifie si l'index existe pour la base de données courante"""
+        table = cls.table_name()
+        if table is None:
+            return False
+
+        key = (connection.alias, str(connection.settings_dict['NAME']))
+        if key not in cls._available:
+            cls._available[key] = table in connection.introspection.table_names()
+        return cls._available[key]
+
+    @staticmethod
+    def build_document(book):
+        """Construit le document indexé pour un livre"""
+        isbn_digits = re.sub(r'[^0-9Xx]', '', book.isbn or '')
+        return {
+            'title': book.title or '',
+            'authors': ' '.join(author.full_name for author in book.authors.all()),
+            'publisher': book.publisher.name if book.publisher_id else '',
+            'isbn': f"{book.isbn} {isbn_digits}",
+            'description': book.description or '',
+        }
+
+    @classmethod
+    def index_book(cls, book):
+        """Ajoute ou met à jour un livre dans l'index"""
+        if not cls.is_available():
+            return False
+
+        document = cls.build_document(book)
+        table = cls.table_name()
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [book.pk])
+                cursor.execute(
+                    f"INSERT INTO {table} (rowid, title, authors, publisher, isbn, description) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    [book.pk, document['title'], document['authors'], document['publisher'],
+                     document['isbn'], document['description']]
+                )
+            else:
+                cursor.execute(
+                    f"INSERT INTO {table} (book_id, document) VALUES (%s, "
+                    "setweight(to_tsvector('simple', %s), 'A') || "
+                    "setweight(to_tsvector('simple', %s), 'A') || "
+                    "setweight(to_tsvector('simple', %s), 'B') || "
+                    "setweight(to_tsvector('simple', %s), 'C') || "
+                    "setweight(to_tsvector('simple', %s), 'D')) "
+                    "ON CONFLICT (book_id) DO UPDATE SET document = EXCLUDED.document",
+                    [book.pk, document['title'], document['authors'], document['isbn'],
+                     document['publisher'], document['description']]
+                )
+        return True
+
+    @classmethod
+    def index_books(cls, books):
+        """Réindexe un ensemble de livres (queryset ou liste d'identifiants)"""
+        if not cls.is_available():
+            return 0
+
+        if not hasattr(books, 'model'):
+            books = Book.objects.filter(pk__in=list(books))
+
+        count = 0
+        for book in books.select_related('publisher').prefetch_related('authors').iterator(chunk_size=500):
+            cls.index_book(book)
+            count += 1
+        return count
+
+    @classmethod
+    def remove_book(cls, book_id):
+        """Retire un livre de l'index"""
+        if not cls.is_available():
+            return False
+
+        table = cls.table_name()
+        key_column = 'rowid' if connection.vendor == 'sqlite' else 'book_id'
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE {key_column} = %s", [book_id])
+        return True
+
+    @classmethod
+    def rebuild(cls):
+        """Reconstruit entièrement l'index"""
+        if not cls.is_available():
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {cls.table_name()}")
+
+        return cls.index_books(Book.objects.all())
+
+    @classmethod
+    def build_match_expression(cls, query):
+        """Transforme la saisie en expression de recherche sûre (préfixes combinés en ET)"""
+        tokens = cls.tokenize(query)
+        if not tokens:
+            return None
+        if connection.vendor == 'sqlite':
+            return ' '.join(f'"{token}"*' for token in tokens)
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    @classmethod
+    def search(cls, queryset, query):
+        """Filtre un queryset de livres par l'index et le trie par pertinence"""
+        expression = cls.build_match_expression(query)
+        if expression is None:
+            return queryset
+
+        if not cls.is_available():
+            return cls.fallback_search(queryset, query)
+
+        table = cls.table_name()
+        book_table = Book._meta.db_table
+
+        # Le score est une annotation (et non un select extra) pour pouvoir être filtré
+        # par la pagination par curseur
+        if connection.vendor == 'sqlite':
+            return queryset.extra(
+                tables=[table],
+                where=[f'{table}.rowid = {book_table}.id', f'{table} MATCH %s'],
+                params=[expression],
+            ).annotate(
+                search_rank=RawSQL(f'{table}.rank', (), output_field=FloatField()),
+            ).order_by('search_rank', 'title')
+
+        return queryset.extra(
+            tables=[table],
+            where=[f'{table}.book_id = {book_table}.id', f"{table}.document @@ to_tsquery('simple', %s)"],
+            params=[expression],
+        ).annotate(
+            search_rank=RawSQL(
+                f"-ts_rank({table}.document, to_tsquery('simple', %s))", (expression,), output_field=FloatField()
+            ),
+        ).order_by('search_rank', 'title')
+
+    @staticmethod
+    def fallback_search(queryset, query):
+        """Recherche LIKE utilisée lorsque l'index n'est pas disponible"""
+        # Sous-requête sur les auteurs plutôt qu'une jointure + distinct() : une ligne par livre
+        author_matches = Book.objects.filter(
+            Q(authors__first_name__icontains=query) |
+            Q(authors__last_name__icontains=query)
+        ).values('pk')
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(pk__in=author_matches) |
+            Q(isbn__icontains=query)
+        )
+
+
+def normalize_words(value):
+    """Normalise un texte (minuscules, sans accents) et le découpe en mots"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return re.findall(r'[^\W_]+', value.lower())
+
+
+def word_trigrams(word):
+    """Trigrammes d'un mot, complété par des espaces comme pg_trgm"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Index de trigrammes pré-calculé pour la recherche approximative
+
+    Les entrées (titres, noms d'auteurs) sont découpées en mots ; chaque mot
+    distinct du vocabulaire est indexé par ses trigrammes. Une requête ne
+    compare donc que les mots partageant au moins un trigramme avec elle,
+    sans calculer de similarité sur toutes les lignes.
+    """
+
+    def __init__(self, entries):
+        """entries : itérable de tuples (type, identifiant, libellé)"""
+        self.kinds = []
+        self.pks = []
+        self.labels = []
+
+        term_ids = {}
+        term_entries = []
+        for kind, pk, label in entries:
+            entry_id = len(self.pks)
+            self.kinds.append(kind)
+            self.pks.append(pk)
+            self.labels.append(label)
+            for word in set(normalize_words(label)):
+                term_id = term_ids.get(word)
+                if term_id is None:
+                    term_id = term_ids[word] = len(term_entries)
+                    term_entries.append([])
+                term_entries[term_id].append(entry_id)
+
+        self.term_ids = term_ids
+        self.terms = [None] * len(term_ids)
+        for word, term_id in term_ids.items():
+            self.terms[term_id] = word
+
+        # Listes de postings mot -> entrées (format CSR)
+        self.term_df = np.array([len(ids) for ids in term_entries], dtype=np.int32)
+        self.term_offsets = np.concatenate(([0], np.cumsum(self.term_df))).astype(np.int64)
+        self.term_entries = np.fromiter(
+            (entry_id for ids in term_entries for entry_id in ids),
+            dtype=np.int32, count=int(self.term_offsets[-1])
+        )
+
+        # Listes de postings trigramme -> mots (format CSR)
+        gram_ids = {}
+        pair_grams = []
+        pair_terms = []
+        self.term_gram_count = np.zeros(len(self.terms), dtype=np.int32)
+        for term_id, word in enumerate(self.terms):
+            grams = word_trigrams(word)
+            self.term_gram_count[term_id] = len(grams)
+            for gram in grams:
+                pair_grams.append(gram_ids.setdefault(gram, len(gram_ids)))
+                pair_terms.append(term_id)
+
+        pair_grams = np.array(pair_grams, dtype=np.int32)
+        order = np.argsort(pair_grams, kind='stable')
+        self.gram_ids = gram_ids
+        self.gram_terms = np.array(pair_terms, dtype=np.int32)[order]
+        counts = np.bincount(pair_grams, minlength=len(gram_ids))
+        self.gram_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.pks)
+
+    def similar_terms(self, word, limit=5, threshold=0.3):
+        """Mots du vocabulaire les plus proches d'un mot (similarité de Jaccard des trigrammes)"""
+        if word in self.term_ids:
+            return [(self.term_ids[word], 1.0)]
+
+        grams = word_trigrams(word)
+        gram_ids = [self.gram_ids[gram] for gram in grams if gram in self.gram_ids]
+        if not gram_ids:
+            return []
+
+        postings = np.concatenate([
+            self.gram_terms[self.gram_offsets[gram_id]:self.gram_offsets[gram_id + 1]]
+            for gram_id in gram_ids
+        ])
+        candidates, shared = np.unique(postings, return_counts=True)
+        similarity = shared / (len(grams) + self.term_gram_count[candidates] - shared)
+
+        keep = similarity >= threshold
+        candidates, similarity = candidates[keep], similarity[keep]
+        if not len(candidates):
+            return []
+
+        # Tri par similarité décroissante puis par fréquence du mot
+        order = np.lexsort((-self.term_df[candidates], -similarity))[:limit]
+        return [(int(candidates[i]), float(similarity[i])) for i in order]
+
+    def search(self, query, limit=10, threshold=0.3):
+        """Retourne les meilleures entrées pour une requête et une suggestion corrigée"""
+        words = normalize_words(query)
+        if not words or not len(self.pks):
+            return {'matches': [], 'suggestion': None}
+
+        scores = np.zeros(len(self.pks), dtype=np.float32)
+        corrected = []
+        for word in words:
+            similar = self.similar_terms(word, threshold=threshold)
+            if not similar:
+                corrected.append(word)
+                continue
+
+            corrected.append(self.terms[similar[0][0]])
+            word_scores = np.zeros(len(self.pks), dtype=np.float32)
+            for term_id, similarity in similar:
+                entry_ids = self.term_entries[self.term_offsets[term_id]:self.term_offsets[term_id + 1]]
+                word_scores[entry_ids] = np.maximum(word_scores[entry_ids], similarity)
+            scores += word_scores
+
+        scores /= len(words)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        suggestion = ' '.join(corrected)
+        return {
+            'matches': [
+                {
+                    'type': self.kinds[i],
+                    'id': self.pks[i],
+                    'label': self.labels[i],
+                    'score': round(float(scores[i]), 3),
+                }
+                for i in candidates
+            ],
+            'suggestion': suggestion if corrected != words else None,
+        }
+
+
+class FuzzySearchService:
+    """
+    Recherche tolérante aux fautes de frappe sur les titres et les auteurs.
+
+    L'index de trigrammes est construit une fois par processus. Une modification de titre
+    ou d'auteur avance une génération partagée par le cache ; un processus qui la voit
+    changer (ou dont l'index a dépassé REFRESH_INTERVAL) reconstruit son index dans un fil
+    d'arrière-plan et sert l'index précédent en attendant. Seule la première construction
+    du processus a lieu pendant une requête.
+    """
+
+    # Durée de vie maximale de l'index en mémoire (secondes)
+    REFRESH_INTERVAL = 900
+    GENERATION_KEY = 'fuzzy:generation'
+
+    _index = None
+    _built_at = None
+    _generation = None
+    _rebuilding = False
+    _lock = threading.Lock()
+    _build_lock = threading.Lock()
+
+    @staticmethod
+    def build_index():
+        """Construit l'index de trigrammes à partir du catalogue"""
+        books = Book.objects.values_list('pk', 'title').order_by().iterator(chunk_size=2000)
+        authors = Author.objects.values_list('pk', 'first_name', 'last_name').order_by().iterator(chunk_size=2000)
+
+        entries = [('book', pk, title) for pk, title in books]
+        entries += [('author', pk, f"{first_name} {last_name}") for pk, first_name, last_name in authors]
+        return TrigramIndex(entries)
+
+    @classmethod
+    def current_generation(cls):
+        return cache.get(cls.GENERATION_KEY, 0)
+
+    @classmethod
+    def rebuild(cls):
+        """Construit un nouvel index puis le substitue à celui du processus"""
+        with cls._build_lock:
+            generation = cls.current_generation()
+            index = cls.build_index()
+            cls._index, cls._generation, cls._built_at = index, generation, time.monotonic()
+        return index
+
+    @classmethod
+    def rebuild_in_background(cls):
+        """Lance rebuild() dans un fil d'arrière-plan (un seul à la fois par processus)"""
+        with cls._lock:
+            if cls._rebuilding:
+                return
+            cls._rebuilding = True
+
+        def run():
+            try:
+                cls.rebuild()
+            finally:
+                cls._rebuilding = False
+                connection.close()
+
+        threading.Thread(target=run, name='fuzzy-index-rebuild', daemon=True).start()
+
+    @classmethod
+    def get_index(cls):
+        """Index du processus : construit au premier appel, reconstruit hors requête ensuite"""
+        if cls._index is None:
+            with cls._lock:
+                if cls._index is None:
+                    cls.rebuild()
+            return cls._index
+        if cls._generation != cls.current_generation() or time.monotonic() - cls._built_at > cls.REFRESH_INTERVAL:
+            cls.rebuild_in_background()
+        return cls._index
+
+    @classmethod
+    def invalidate(cls):
+        """Signale à tous les processus une modification des titres ou des auteurs"""
+        cache.add(cls.GENERATION_KEY, 0, None)
+        try:
+            cache.incr(cls.GENERATION_KEY)
+        except ValueError:
+            # Clé évincée entre-temps
+            cache.set(cls.GENERATION_KEY, 1, None)
+
+    @classmethod
+    def search(cls, query, limit=10):
+        """Recherche approximative : meilleures correspondances et suggestion « vouliez-vous dire »"""
+        return cls.get_index().search(query, limit=limit)
+
+
+def normalize_isbn(value):
+    """ISBN réduit à ses chiffres (et X final)"""
+    return re.sub(r'[^0-9X]', '', (value or '').upper())
+
+
+class PrefixIndex:
+    """Index de préfixes en tableaux triés pour l'autocomplétion
+
+    Chaque entrée est indexée par toutes ses fins de libellé commençant à un
+    mot (« harry potter », « potter ») et, pour les livres, par son ISBN
+    normalisé. Une saisie correspond à une plage contiguë des clés triées,
+    trouvée par dichotomie ; les entrées de la plage sont classées par
+    popularité.
+    """
+
+    # Longueur maximale des clés (les saisies plus longues sont tronquées)
+    KEY_LENGTH = 40
+
+    def __init__(self, entries):
+        """entries : itérable de tuples (type, identifiant, libellé, détail, popularité, clés supplémentaires)"""
+        self.entries = []
+        pairs = []
+        for kind, pk, label, detail, popularity, extra_keys in entries:
+            entry_id = len(self.entries)
+            self.entries.append((kind, pk, label, detail, popularity))
+            words = normalize_words(label)
+            keys = {' '.join(words[i:])[:self.KEY_LENGTH] for i in range(len(words))}
+            keys.update(key[:self.KEY_LENGTH] for key in extra_keys if key)
+            pairs.extend((key, entry_id) for key in keys)
+
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.key_entries = np.array([entry_id for _, entry_id in pairs], dtype=np.int32)
+        popularity = np.array([entry[4] for entry in self.entries], dtype=np.float64)
+        self.key_popularity = popularity[self.key_entries] if len(pairs) else popularity
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def normalize_prefix(cls, query):
+        return ' '.join(normalize_words(query))[:cls.KEY_LENGTH]
+
+    def lookup(self, prefix, limit, exclude=None):
+        """Entrées dont une clé commence par prefix, par popularité décroissante"""
+        low = bisect.bisect_left(self.keys, prefix)
+        high = bisect.bisect_left(self.keys, prefix + '\uffff', low)
+        if low == high:
+            return []
+
+        range_entries = self.key_entries[low:high]
+        range_popularity = self.key_popularity[low:high]
+
+        # Une entrée peut correspondre par plusieurs clés (ou être masquée) : on ne trie
+        # qu'une fenêtre des plus populaires, élargie si elle ne suffit pas
+        window = limit * 4
+        while True:
+            if len(range_entries) > window:
+                best = np.argpartition(-range_popularity, window)[:window]
+                entry_ids, popularity = range_entries[best], range_popularity[best]
+            else:
+                entry_ids, popularity = range_entries, range_popularity
+            order = np.argsort(-popularity, kind='stable')
+
+            results = []
+            seen = set()
+            for entry_id in entry_ids[order]:
+                entry = self.entries[entry_id]
+                key = (entry[0], entry[1])
+                if key in seen or (exclude and key in exclude):
+                    continue
+                seen.add(key)
+                results.append(entry)
+                if len(results) == limit:
+                    return results
+            if len(entry_ids) == len(range_entries):
+                return results
+            window *= 4
+
+
+class AutocompleteService:
+    """Suggestions à la frappe (titres, auteurs, ISBN) depuis un index de préfixes en mémoire"""
+
+    # Intervalle de rafraîchissement incrémental (livres modifiés depuis updated_date)
+    REFRESH_INTERVAL = 60
+    # Reconstruction complète (compactage des modifications, auteurs renommés)
+    REBUILD_INTERVAL = 3600
+    # Au-delà de ce nombre de livres modifiés, reconstruire plutôt que d'empiler
+    MAX_DELTA = 5000
+
+    _index = None
+    _delta = None
+    _delta_entries = {}
+    _hidden = set()
+    _last_updated = None
+    _built_at = None
+    _checked_at = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def book_entries(books, popularity):
+        for pk, title, isbn, authors_display in books:
+            yield ('book', pk, title, authors_display, popularity.get(pk, 0), (normalize_isbn(isbn).lower(),))
+
+    @classmethod
+    def build(cls):
+        """Construit l'index complet à partir du catalogue (popularité = nombre d'emprunts)"""
+        book_popularity = dict(
+            Loan.objects.order_by().values('book_id').annotate(count=Count('pk')).values_list('book_id', 'count')
+        )
+        author_popularity = dict(
+            Loan.objects.order_by().values('book__authors').annotate(count=Count('pk'))
+            .values_list('book__authors', 'count')
+        )
+
+        books = Book.objects.order_by().values_list('pk', 'title', 'isbn', 'authors_display').iterator(chunk_size=2000)
+        authors = Author.objects.order_by().values_list('pk', 'first_name', 'last_name').iterator(chunk_size=2000)
+
+        entries = list(cls.book_entries(books, book_popularity))
+        entries += [
+            ('author', pk, f"{first_name} {last_name}", '', author_popularity.get(pk, 0), ())
+            for pk, first_name, last_name in authors
+        ]
+
+        cls._index = PrefixIndex(entries)
+        cls._delta = None
+        cls._delta_entries = {}
+        cls._hidden = set()
+        cls._last_updated = Book.objects.aggregate(last=Max('updated_date'))['last']
+        cls._built_at = cls._checked_at = time.monotonic()
+
+    @classmethod
+    def refresh(cls):
+        """Intègre les livres modifiés depuis le dernier passage (updated_date)"""
+        books = Book.objects.order_by()
+        if cls._last_updated is not None:
+            books = books.filter(updated_date__gte=cls._last_updated)
+        rows = list(books.values_list('pk', 'title', 'isbn', 'authors_display', 'updated_date'))
+        cls._checked_at = time.monotonic()
+        if not rows:
+            return
+
+        if len(cls._delta_entries) + len(rows) > cls.MAX_DELTA:
+            cls.build()
+            return
+
+        popularity = dict(
+            Loan.objects.filter(book_id__in=[row[0] for row in rows]).order_by()
+            .values('book_id').annotate(count=Count('pk')).values_list('book_id', 'count')
+        )
+        for entry in cls.book_entries((row[:4] for row in rows), popularity):
+            cls._delta_entries[entry[1]] = entry
+            cls._hidden.add(('book', entry[1]))
+        cls._delta = PrefixIndex(cls._delta_entries.values())
+        cls._last_updated = max(row[4] for row in rows)
+
+    @classmethod
+    def ensure_ready(cls):
+        """Charge l'index au premier appel puis le maintient à jour"""
+        now = time.monotonic()
+        if cls._index is not None and now - cls._checked_at < cls.REFRESH_INTERVAL:
+            return
+        with cls._lock:
+            now = time.monotonic()
+            if cls._index is None or now - cls._built_at > cls.REBUILD_INTERVAL:
+                cls.build()
+            elif now - cls._checked_at >= cls.REFRESH_INTERVAL:
+                cls.refresh()
+
+    @classmethod
+    def remove_book(cls, book_id):
+        """Masque un livre supprimé (la suppression n'apparaît pas dans updated_date)"""
+        if cls._index is None:
+            return
+        with cls._lock:
+            cls._hidden.add(('book', book_id))
+            if cls._delta_entries.pop(book_id, None) is not None:
+                cls._delta = PrefixIndex(cls._delta_entries.values())
+
+    @classmethod
+    def invalidate(cls):
+        """Force une reconstruction complète à la prochaine suggestion"""
+        cls._index = None
+
+    @classmethod
+    def suggest(cls, query, limit=10):
+        """Meilleures suggestions pour une saisie partielle, par popularité décroissante"""
+        prefix = PrefixIndex.normalize_prefix(query)
+        if not prefix:
+            return []
+
+        cls.ensure_ready()
+        index, delta, hidden = cls._index, cls._delta, cls._hidden
+
+        entries = index.lookup(prefix, limit, exclude=hidden)
+        if delta is not None:
+            entries += delta.lookup(prefix, limit)
+            entries.sort(key=lambda entry: -entry[4])
+
+        return [
+            {'type': kind, 'id': pk, 'label': label, 'detail': detail}
+            for kind, pk, label, detail, _ in entries[:limit]
+        ]
+
+
+class CatalogFacets:
+    """Comptages par facette (genre, langue, éditeur, disponibilité) d'une recherche du catalogue"""
+
+    FACETS = ('genre', 'language', 'publisher', 'available')
+
+    # Comptage global des livres par genre (accueil, galerie)
+    GENRE_COUNTS_CACHE_KEY = 'catalog:genre_counts'
+    GENRE_COUNTS_TIMEOUT = 600
+
+    @staticmethod
+    def filter_for(facet, value):
+        """Condition de filtrage correspondant à une valeur de facette"""
+        if facet == 'genre':
+            return Q(genres=value)
+        if facet == 'language':
+            return Q(language=value)
+        if facet == 'publisher':
+            return Q(publisher=value)
+        if facet == 'available':
+            return Q(available_copies__gt=0) if value else Q(available_copies__lte=0)
+        raise ValueError(f"Facette inconnue : {facet}")
+
+    @classmethod
+    def apply(cls, queryset, selected):
+        """Applique les valeurs de facettes sélectionnées ({facette: valeur}) à un queryset"""
+        for facet, value in selected.items():
+            queryset = queryset.filter(cls.filter_for(facet, value))
+        return queryset
+
+    @staticmethod
+    def facet_rows(queryset):
+        """
+        Parcours groupé unique : (genre, langue, éditeur, disponibilité, ligne principale, nombre)
+        sur la jointure livres × genres. La ligne principale d'un livre est celle de son plus
+        petit genre (ou sa seule ligne s'il n'a pas de genre).
+        """
+        first_genre = Subquery(
+            Book.genres.through.objects.filter(book_id=OuterRef('pk')).order_by('genre_id').values('genre_id')[:1]
+        )
+        # Le queryset est groupé tel quel (sans sous-requête englobante) : la jointure
+        # plein texte de CatalogSearchIndex.search reste valide
+        return queryset.order_by().values(
+            'genres',
+            'language',
+            'publisher',
+            available=Case(When(available_copies__gt=0, then=Value(True)), default=Value(False), output_field=BooleanField()),
+            primary=Case(
+                When(genres__isnull=True, then=Value(True)),
+                When(genres=first_genre, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        ).annotate(count=Count('pk')).values_list('genres', 'language', 'publisher', 'available', 'primary', 'count')
+
+    @classmethod
+    def counts(cls, queryset, selected=None):
+        """
+        Calcule toutes les facettes d'un queryset de livres en un seul parcours groupé.
+
+        Chaque facette est comptée avec les autres filtres sélectionnés mais sans le sien,
+        afin que les comptages restent justes lorsque les filtres se combinent ; les filtres
+        sont évalués en Python sur les lignes groupées. Un livre à plusieurs genres compte
+        une fois par genre dans la facette genre, et une seule fois ailleurs : par sa ligne
+        du genre sélectionné, sinon par sa ligne principale.
+        """
+        selected = {facet: getattr(value, 'pk', value) for facet, value in (selected or {}).items()}
+        facets = {facet: {} for facet in cls.FACETS}
+        for genre, language, publisher, available, primary, count in cls.facet_rows(queryset):
+            row = {'genre': genre, 'language': language, 'publisher': publisher, 'available': bool(available)}
+            failed = {facet for facet, value in selected.items() if row[facet] != value}
+            for facet in cls.FACETS:
+                if failed - {facet}:
+                    continue
+                if facet != 'genre' and 'genre' not in selected and not primary:
+                    continue
+                value = row[facet]
+                if value is None:
+                    # Livres sans genre ou sans éditeur
+                    continue
+                facets[facet][value] = facets[facet].get(value, 0) + count
+        return facets
+
+    @classmethod
+    def genre_counts(cls):
+        """Nombre de livres par genre pour tout le catalogue (mis en cache)"""
+        counts = cache.get(cls.GENRE_COUNTS_CACHE_KEY)
+        if counts is None:
+            counts = dict(
+                Book.genres.through.objects.order_by().values('genre_id')
+                .annotate(count=Count('pk')).values_list('genre_id', 'count')
+            )
+            cache.set(cls.GENRE_COUNTS_CACHE_KEY, counts, cls.GENRE_COUNTS_TIMEOUT)
+        return counts
+
+    @classmethod
+    def genres_with_counts(cls, limit=None):
+        """Genres ayant au moins un livre, annotés de book_count, du plus fourni au moins fourni"""
+        counts = cls.genre_counts()
+        genres = list(Genre.objects.filter(pk__in=list(counts)))
+        for genre in genres:
+            genre.book_count = counts[genre.pk]
+        genres.sort(key=lambda genre: (-genre.book_count, genre.name))
+        return genres[:limit] if limit else genres
+
+    @classmethod
+    def invalidate_genre_counts(cls):
+        """Invalide le comptage global par genre"""
+        cache.delete(cls.GENRE_COUNTS_CACHE_KEY)
@@ -0,0 +1,357 @@
+"""
+Signaux de la bibliothèque : maintien des données dérivées (index de recherche, colonnes d'affichage, cache de pages, ...)
+"""
+
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import Book, Author, Genre, Publisher, Loan, Reservation, Favorite, BookPurchase, Payment, Delivery, CustomUser
+from .cache_services import PageCacheService
+from .activity_services import DailyActivityService
+from .counter_services import StatusCounterService
+from .dashboard_services import DashboardSummaryService
+from .recommendation_services import RecommendationService
+from .reservation_services import ReservationQueueService
+from .stats_services import AdminStatsService
+from .search_services import CatalogSearchIndex, FuzzySearchService, AutocompleteService, CatalogFacets
+
+
+# Champs qui décident de la présence ou du rang d'un livre dans les listes : champs
+# indexés (recherche plein texte, tri par titre) et facettes portées par le livre
+LISTED_FIELDS = CatalogSearchIndex.INDEXED_FIELDS | {'language'}
+
+
+def listed_values(book):
+    """Valeurs des champs indexés ou filtrables d'un livre (LISTED_FIELDS)"""
+    return {name: getattr(book, Book._meta.get_field(name).attname) for name in LISTED_FIELDS}
+
+
+@receiver(pre_save, sender=Book)
+def remember_listed_values_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mémoriser les champs indexés et filtrables en base (stock, couverture, ... n'y touchent pas)"""
+    instance._listed_before = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & LISTED_FIELDS:
+        return
+    previous = Book.objects.only(*LISTED_FIELDS).filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._listed_before = listed_values(previous)
+
+
+@receiver(post_save, sender=Book)
+def index_book_on_save(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    """
+    Réindexer un livre après modification effective de ses champs indexés ; les champs
+    modifiés sont laissés à purge_pages_on_book_save (purge des listes).
+    """
+    if raw:
+        return
+    before = instance.__dict__.pop('_listed_before', None)
+    if update_fields is not None and not set(update_fields) & LISTED_FIELDS:
+        changed = set()
+    elif created or before is None:
+        changed = set(LISTED_FIELDS)
+    else:
+        changed = {name for name, value in listed_values(instance).items() if before[name] != value}
+    instance._listed_changed = changed
+    if not changed & CatalogSearchIndex.INDEXED_FIELDS:
+        return
+    CatalogSearchIndex.index_book(instance)
+    if 'title' in changed:
+        FuzzySearchService.invalidate()
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book_on_delete(sender, instance, **kwargs):
+    """Retirer un livre supprimé de l'index"""
+    CatalogSearchIndex.remove_book(instance.pk)
+    FuzzySearchService.invalidate()
+    AutocompleteService.remove_book(instance.pk)
+    CatalogFacets.invalidate_genre_counts()
+
+
+def changed_book_ids(instance, action, reverse, pk_set):
+    """
+    Livres concernés par une modification m2m (None si l'action n'est pas terminale).
+    En sens inverse (depuis l'auteur ou le genre), les livres d'un clear sont mémorisés au pre_clear.
+    """
+    if not reverse:
+        return [instance.pk] if action in ('post_add', 'post_remove', 'post_clear') else None
+    if action == 'pre_clear':
+        instance._cleared_book_ids = list(instance.book_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        return getattr(instance, '_cleared_book_ids', [])
+    elif action in ('post_add', 'post_remove'):
+        return list(pk_set or [])
+    return None
+
+
+def purge_book_pages(book_ids, lists=False):
+    """Purger du cache les pages des livres (et, si demandé, les pages de liste)"""
+    tags = [PageCacheService.book_tag(book_id) for book_id in book_ids]
+    if lists:
+        tags.append(PageCacheService.BOOK_LIST_TAG)
+    PageCacheService.invalidate(*tags)
+
+
+def refresh_books_display(book_ids, instance=None):
+    """Recalculer les colonnes d'affichage, y compris sur l'instance en mémoire"""
+    Book.refresh_display_columns(book_ids)
+    if isinstance(instance, Book):
+        instance.authors_display, instance.genres_display = Book.objects.filter(
+            pk=instance.pk
+        ).values_list('authors_display', 'genres_display').get()
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def book_authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Réindexer et mettre à jour l'affichage des livres dont la liste d'auteurs a changé"""
+    book_ids = changed_book_ids(instance, action, reverse, pk_set)
+    if book_ids is None:
+        return
+    refresh_books_display(book_ids, instance)
+    # La recherche porte aussi sur les auteurs : les listes peuvent gagner ou perdre le livre
+    purge_book_pages(book_ids, lists=True)
+    if reverse:
+        CatalogSearchIndex.index_books(book_ids)
+    else:
+        CatalogSearchIndex.index_book(instance)
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def book_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mettre à jour l'affichage et le comptage par genre lorsque les genres d'un livre changent"""
+    book_ids = changed_book_ids(instance, action, reverse, pk_set)
+    if book_ids is None:
+        return
+    refresh_books_display(book_ids, instance)
+    purge_book_pages(book_ids)
+    CatalogFacets.invalidate_genre_counts()
+    PageCacheService.invalidate(PageCacheService.GENRES_TAG)
+
+
+@receiver(post_save, sender=Author)
+def index_books_on_author_save(sender, instance, raw=False, created=False, **kwargs):
+    """Réindexer les livres d'un auteur renommé"""
+    if raw:
+        return
+    FuzzySearchService.invalidate()
+    AutocompleteService.invalidate()
+    if not created:
+        book_ids = list(instance.book_set.values_list('pk', flat=True))
+        Book.refresh_display_columns(book_ids)
+        CatalogSearchIndex.index_books(book_ids)
+        purge_book_pages(book_ids, lists=True)
+
+
+@receiver(post_save, sender=Genre)
+def refresh_books_on_genre_save(sender, instance, raw=False, created=False, **kwargs):
+    """Mettre à jour l'affichage des livres d'un genre renommé"""
+    if raw:
+        return
+    PageCacheService.invalidate(PageCacheService.GENRES_TAG)
+    if not created:
+        book_ids = list(instance.book_set.values_list('pk', flat=True))
+        Book.refresh_display_columns(book_ids)
+        purge_book_pages(book_ids)
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Genre)
+def remember_books_before_delete(sender, instance, **kwargs):
+    """Mémoriser les livres liés : la suppression en cascade des liens n'émet pas m2m_changed"""
+    instance._deleted_book_ids = list(instance.book_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Author)
+def refresh_books_on_author_delete(sender, instance, **kwargs):
+    """Mettre à jour les livres d'un auteur supprimé"""
+    book_ids = getattr(instance, '_deleted_book_ids', [])
+    Book.refresh_display_columns(book_ids)
+    CatalogSearchIndex.index_books(book_ids)
+    purge_book_pages(book_ids, lists=True)
+    FuzzySearchService.invalidate()
+    AutocompleteService.invalidate()
+
+
+@receiver(post_delete, sender=Genre)
+def refresh_books_on_genre_delete(sender, instance, **kwargs):
+    """Mettre à jour les livres d'un genre supprimé"""
+    book_ids = getattr(instance, '_deleted_book_ids', [])
+    Book.refresh_display_columns(book_ids)
+    purge_book_pages(book_ids)
+    CatalogFacets.invalidate_genre_counts()
+    PageCacheService.invalidate(PageCacheService.GENRES_TAG)
+
+
+@receiver(pre_save, sender=Publisher)
+def remember_publisher_name_before_save(sender, instance, raw=False, **kwargs):
+    """Mémoriser le nom en base : seul un renommage réindexe les livres de l'éditeur"""
+    instance._name_before = None
+    if raw or instance.pk is None:
+        return
+    instance._name_before = Publisher.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Publisher)
+def index_books_on_publisher_save(sender, instance, raw=False, created=False, **kwargs):
+    """Réindexer les livres d'un éditeur renommé et purger leurs pages (listes comprises)"""
+    name_before = instance.__dict__.pop('_name_before', None)
+    if raw or created or name_before is None or name_before == instance.name:
+        return
+    book_ids = list(instance.book_set.values_list('pk', flat=True))
+    CatalogSearchIndex.index_books(book_ids)
+    purge_book_pages(book_ids, lists=True)
+
+
+@receiver(post_save, sender=Book)
+def purge_pages_on_book_save(sender, instance, raw=False, created=False, **kwargs):
+    """
+    Purger les pages du livre modifié. Les listes ne sont étiquetées que par les livres
+    qu'elles affichent : elles sont aussi purgées à la création, lorsqu'un champ indexé
+    ou filtrable a changé (le livre peut y entrer) et lorsque la disponibilité a pu basculer.
+    """
+    if raw:
+        return
+    listed_changed = instance.__dict__.pop('_listed_changed', set())
+    purge_book_pages([instance.pk], lists=created or bool(listed_changed) or instance.available_copies <= 1)
+
+
+@receiver(post_delete, sender=Book)
+def purge_pages_on_book_delete(sender, instance, **kwargs):
+    """Purger les pages d'un livre supprimé et les listes qui le contenaient"""
+    purge_book_pages([instance.pk], lists=True)
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def book_circulation_changed(sender, instance, raw=False, **kwargs):
+    """Emprunt ou réservation modifié : nouvelle version du livre et purge de sa page"""
+    if raw:
+        return
+    Book.bump_circulation_version(instance.book_id)
+    purge_book_pages([instance.book_id])
+
+
+@receiver(post_save, sender=Reservation)
+def resequence_queue_on_save(sender, instance, raw=False, **kwargs):
+    """Renuméroter la file du livre quand une réservation y entre, en sort ou y change de rang"""
+    if raw:
+        return
+    if instance.status != 'active' and instance.queue_position is None:
+        return
+    ReservationQueueService.resequence(instance.book_id)
+    if instance.status == 'active':
+        instance.refresh_from_db(fields=['queue_position'])
+    else:
+        instance.queue_position = None
+
+
+@receiver(post_delete, sender=Reservation)
+def resequence_queue_on_delete(sender, instance, **kwargs):
+    """Une réservation en file supprimée libère son rang"""
+    if instance.queue_position is not None:
+        ReservationQueueService.resequence(instance.book_id)
+
+
+@receiver(post_delete, sender=Loan)
+@receiver(post_delete, sender=BookPurchase)
+@receiver(post_delete, sender=Payment)
+def update_dashboard_summary_on_delete(sender, instance, **kwargs):
+    """
+    Retirer du résumé de l'utilisateur la contribution de la ligne supprimée (les
+    enregistrements l'ajustent eux-mêmes : models.DashboardSummaryMixin)
+    """
+    origin = kwargs.get('origin')
+    if isinstance(origin, CustomUser) or getattr(origin, 'model', None) is CustomUser:
+        # Suppression en cascade de l'utilisateur : son résumé disparaît avec lui
+        return
+    DashboardSummaryService.record_delete(instance)
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_user_recommendations(sender, instance, raw=False, **kwargs):
+    """Les recommandations dépendent des lectures récentes et des favoris du lecteur"""
+    if raw:
+        return
+    RecommendationService.invalidate_user(instance.user_id)
+
+
+@receiver(pre_save, sender=Loan)
+@receiver(pre_save, sender=Reservation)
+@receiver(pre_save, sender=BookPurchase)
+@receiver(pre_save, sender=Payment)
+def remember_activity_before_save(sender, instance, raw=False, **kwargs):
+    """Mémoriser la contribution de la ligne avant modification (agrégats quotidiens)"""
+    if raw:
+        return
+    instance._activity_lookups = {}
+    instance._activity_before = DailyActivityService.previous_contributions(instance, instance._activity_lookups)
+
+
+@receiver(post_save, sender=Loan)
+@receiver(post_save, sender=Reservation)
+@receiver(post_save, sender=BookPurchase)
+@receiver(post_save, sender=Payment)
+def update_daily_activity_on_save(sender, instance, raw=False, **kwargs):
+    """Appliquer aux agrégats quotidiens la différence de contribution"""
+    if raw:
+        return
+    DailyActivityService.record_change(
+        instance, getattr(instance, '_activity_before', {}), getattr(instance, '_activity_lookups', None)
+    )
+    instance._activity_before, instance._activity_lookups = {}, None
+
+
+@receiver(post_delete, sender=Loan)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=BookPurchase)
+@receiver(post_delete, sender=Payment)
+def update_daily_activity_on_delete(sender, instance, **kwargs):
+    """Retirer des agrégats quotidiens la contribution d'une ligne supprimée"""
+    DailyActivityService.record_delete(instance)
+
+
+# Les enregistrements ajustent les compteurs de statut dans leur propre transaction
+# (models.StatusCountedMixin) ; les signaux de suppression sont émis dans celle de la suppression.
+
+
+@receiver(pre_delete, sender=Loan)
+@receiver(pre_delete, sender=Reservation)
+@receiver(pre_delete, sender=BookPurchase)
+@receiver(pre_delete, sender=Delivery)
+@receiver(pre_delete, sender=Book)
+@receiver(pre_delete, sender=CustomUser)
+def remember_counter_labels_before_delete(sender, instance, **kwargs):
+    """L'instance peut être périmée (mise à jour groupée) : étiquettes relues en base"""
+    instance._counter_labels = StatusCounterService.previous_labels(instance)
+
+
+@receiver(post_delete, sender=Loan)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_delete, sender=BookPurchase)
+@receiver(post_delete, sender=Delivery)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=CustomUser)
+def update_status_counters_on_delete(sender, instance, **kwargs):
+    """Retirer des compteurs une ligne supprimée"""
+    StatusCounterService.record_delete(instance, getattr(instance, '_counter_labels', set()))
+
+
+@receiver(post_save, sender=BookPurchase)
+@receiver(post_delete, sender=BookPurchase)
+def invalidate_purchase_stats(sender, instance, raw=False, **kwargs):
+    """Statistiques de la page de gestion des achats"""
+    AdminStatsService.invalidate('purchases')
+
+
+@receiver(post_save, sender=Delivery)
+@receiver(post_delete, sender=Delivery)
+def invalidate_delivery_stats(sender, instance, raw=False, **kwargs):
+    """Statistiques de la page de gestion des livraisons"""
+    AdminStatsService.invalidate('deliveries')
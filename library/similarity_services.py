@@ -0,0 +1,364 @@
+"""
+Livres similaires par le contenu : TF-IDF haché du titre, de la description et des genres
+"""
+
+import hashlib
+import zlib
+from collections import Counter
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from .models import Book, SimilarBook, BookContentSignature
+from .cache_services import PageCacheService
+from .search_services import normalize_words
+
+
+class ContentMatrix:
+    """
+    Matrice TF-IDF creuse (une ligne par livre, normalisée L2) stockée en CSR,
+    avec sa transposée (listes inversées par attribut) pour les produits scalaires.
+    """
+
+    def __init__(self, book_ids, indptr, indices, data, n_features):
+        self.book_ids = np.asarray(book_ids, dtype=np.int64)
+        self.indptr, self.indices, self.data = indptr, indices, data
+
+        order = np.argsort(indices, kind='stable')
+        rows = np.repeat(np.arange(len(self.book_ids)), np.diff(indptr))
+        self.posting_rows = rows[order]
+        self.posting_data = data[order]
+        self.posting_ptr = np.zeros(n_features + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=n_features), out=self.posting_ptr[1:])
+
+    def __len__(self):
+        return len(self.book_ids)
+
+    def row_costs(self, rows):
+        """Nombre de produits à calculer pour chaque ligne (somme des longueurs de listes)"""
+        lengths = np.diff(self.posting_ptr)[self.indices]
+        cumulative = np.r_[0, np.cumsum(lengths)]
+        return (cumulative[self.indptr[1:]] - cumulative[self.indptr[:-1]])[rows]
+
+    def similarities(self, rows):
+        """
+        Similarités cosinus entre les lignes demandées et toutes les lignes :
+        matrice dense len(rows) × len(self), accumulée depuis les listes inversées.
+        """
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        counts = ends - starts
+        entry = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts) + np.arange(counts.sum())
+        query = np.repeat(np.arange(len(rows)), counts)
+        features, values = self.indices[entry], self.data[entry]
+
+        posting_start = self.posting_ptr[features]
+        lengths = self.posting_ptr[features + 1] - posting_start
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        postings = np.repeat(posting_start, lengths) + offsets
+
+        codes = np.repeat(query, lengths) * len(self) + self.posting_rows[postings]
+        products = np.repeat(values, lengths) * self.posting_data[postings]
+        scores = np.bincount(codes, weights=products, minlength=len(rows) * len(self))
+        return scores.reshape(len(rows), len(self))
+
+
+class ContentSimilarityService:
+    """
+    Calcul hors ligne des livres similaires (commande build_similar_books).
+
+    Les attributs sont hachés dans un espace de taille fixe (mémoire bornée quel que soit
+    le vocabulaire). La recherche est approchée : seuls les MAX_TERMS attributs les plus
+    discriminants de chaque livre sont conservés et les mots présents dans plus de MAX_DF
+    des livres sont ignorés, ce qui garde les listes inversées courtes.
+    """
+
+    N_FEATURES = 2 ** 18
+    TITLE_WEIGHT = 2
+    GENRE_WEIGHT = 3
+    MIN_WORD_LENGTH = 3
+    MIN_DF = 2
+    MAX_DF = 0.1
+    MAX_TERMS = 64
+
+    TOP_K = 10
+    MIN_SCORE = 0.05
+    # Bornes d'un paquet de recherche : scores denses et produits calculés (mémoire)
+    BLOCK_SIZE = 4_000_000
+    PRODUCT_BUDGET = 10_000_000
+
+    STOP_WORDS = frozenset('''
+        les des une dans par pour sur avec son ses sont est qui que aux plus mais ont cette
+        ces leur leurs elle ils entre sans sous tout tous comme fait etre avoir deux apres
+        the and for with from that this are was his her their into its
+    '''.split())
+
+    # ----- Vectorisation -----
+
+    @classmethod
+    def feature(cls, token):
+        return zlib.crc32(token.encode()) & (cls.N_FEATURES - 1)
+
+    @classmethod
+    def tokens(cls, title, description, genre_ids):
+        """Termes pondérés d'un livre : mots du titre (poids renforcé), de la description, genres"""
+        counts = Counter()
+        for source, weight in ((title, cls.TITLE_WEIGHT), (description, 1)):
+            for word in normalize_words(source):
+                if len(word) >= cls.MIN_WORD_LENGTH and not word.isdigit() and word not in cls.STOP_WORDS:
+                    counts[cls.feature(word)] += weight
+        for genre_id in genre_ids:
+            counts[cls.feature(f'genre:{genre_id}')] += cls.GENRE_WEIGHT
+        return counts
+
+    @staticmethod
+    def fingerprint(title, description, genre_ids):
+        raw = f"{title}\x1f{description}\x1f{','.join(map(str, sorted(genre_ids)))}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    @staticmethod
+    def load_catalog():
+        """[(id, titre, description, updated_date, genres)] de tout le catalogue"""
+        genres = {}
+        for book_id, genre_id in Book.genres.through.objects.values_list('book_id', 'genre_id').iterator():
+            genres.setdefault(book_id, []).append(genre_id)
+        return [
+            (book_id, title, description, updated_date, genres.get(book_id, []))
+            for book_id, title, description, updated_date in Book.objects.order_by('pk').values_list(
+                'pk', 'title', 'description', 'updated_date'
+            ).iterator()
+        ]
+
+    @classmethod
+    def build_matrix(cls, catalog):
+        """Matrice TF-IDF hachée du catalogue (tf sous-linéaire, idf lissé, normalisation L2)"""
+        documents = [cls.tokens(title, description, genres) for _, title, description, _, genres in catalog]
+        document_count = len(documents)
+
+        lengths = np.array([len(document) for document in documents], dtype=np.int64)
+        features = np.fromiter((f for document in documents for f in document), dtype=np.int64, count=lengths.sum())
+        counts = np.fromiter((c for document in documents for c in document.values()), dtype=float, count=lengths.sum())
+        rows = np.repeat(np.arange(document_count), lengths)
+
+        # Les mots trop fréquents sont ignorés ; les genres sont toujours conservés
+        df = np.bincount(features, minlength=cls.N_FEATURES)
+        max_df = max(cls.MAX_DF * document_count, cls.MIN_DF)
+        genre_features = np.array(
+            sorted({cls.feature(f'genre:{genre_id}') for *_, genres in catalog for genre_id in genres}),
+            dtype=np.int64,
+        )
+        keep = (df[features] >= cls.MIN_DF) & ((df[features] <= max_df) | np.isin(features, genre_features))
+        rows, features, counts = rows[keep], features[keep], counts[keep]
+
+        idf = np.log((1 + document_count) / (1 + df[features])) + 1
+        weights = (1 + np.log(counts)) * idf
+
+        # MAX_TERMS attributs les plus lourds par livre
+        order = np.lexsort((-weights, rows))
+        rows, features, weights = rows[order], features[order], weights[order]
+        row_counts = np.bincount(rows, minlength=document_count)
+        starts = np.r_[0, np.cumsum(row_counts)[:-1]]
+        keep = np.arange(len(rows)) - np.repeat(starts, row_counts) < cls.MAX_TERMS
+        rows, features, weights = rows[keep], features[keep], weights[keep]
+
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=document_count))
+        weights = weights / norms[rows]
+
+        indptr = np.zeros(document_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=document_count), out=indptr[1:])
+        return ContentMatrix([entry[0] for entry in catalog], indptr, features, weights, cls.N_FEATURES)
+
+    # ----- Recherche des plus proches voisins -----
+
+    @classmethod
+    def batches(cls, matrix, rows):
+        """
+        Paquets de lignes : au plus BLOCK_SIZE scores denses par paquet,
+        et PRODUCT_BUDGET produits (listes inversées parcourues).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        batch_size = max(1, cls.BLOCK_SIZE // max(len(matrix), 1))
+        costs = matrix.row_costs(rows)
+        start, spent = 0, 0
+        for position, cost in enumerate(costs.tolist()):
+            if position > start and (spent + cost > cls.PRODUCT_BUDGET or position - start >= batch_size):
+                yield rows[start:position]
+                start, spent = position, 0
+            spent += cost
+        if start < len(rows):
+            yield rows[start:]
+
+    @classmethod
+    def nearest(cls, matrix, rows, top_k, collect=None):
+        """
+        top_k voisins de chaque ligne : {ligne: [(autre ligne, score)]}.
+        Si collect est une liste, toutes les similarités ≥ MIN_SCORE y sont ajoutées.
+        """
+        neighbors = {}
+        for batch in cls.batches(matrix, rows):
+            scores = matrix.similarities(batch)
+            scores[np.arange(len(batch)), batch] = 0
+            if collect is not None:
+                local, others = np.nonzero(scores >= cls.MIN_SCORE)
+                collect.append((batch[local], others, scores[local, others]))
+
+            k = min(top_k, scores.shape[1] - 1)
+            if k <= 0:
+                continue
+            best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for local, row in enumerate(batch.tolist()):
+                candidates = best[local]
+                values = scores[local, candidates]
+                order = np.lexsort((candidates, -values))
+                neighbors[row] = [
+                    (other, score)
+                    for other, score in zip(candidates[order].tolist(), values[order].tolist())
+                    if score >= cls.MIN_SCORE
+                ]
+        return neighbors
+
+    # ----- Mise à jour de la table -----
+
+    @staticmethod
+    def chunks(values, size=500):
+        values = list(values)
+        for start in range(0, len(values), size):
+            yield values[start:start + size]
+
+    @classmethod
+    def changed_books(cls, catalog):
+        """Livres modifiés depuis leur dernier calcul (updated_date plus récente et contenu différent)"""
+        signatures = {
+            book_id: (fingerprint, computed_at)
+            for book_id, fingerprint, computed_at in BookContentSignature.objects.values_list(
+                'book_id', 'fingerprint', 'computed_at'
+            ).iterator()
+        }
+        changed = []
+        for book_id, title, description, updated_date, genres in catalog:
+            signature = signatures.get(book_id)
+            if signature is None:
+                changed.append(book_id)
+            elif updated_date > signature[1] and cls.fingerprint(title, description, genres) != signature[0]:
+                changed.append(book_id)
+        return changed
+
+    @classmethod
+    def affected_books(cls, matrix, changed_rows, similarities, top_k):
+        """
+        Livres non modifiés dont la liste doit être recalculée : elle contenait un livre
+        modifié, ou un livre modifié y entre désormais (score supérieur au k-ième).
+        """
+        changed_ids = set(matrix.book_ids[changed_rows].tolist())
+        affected = set()
+        for chunk in cls.chunks(changed_ids):
+            affected.update(SimilarBook.objects.filter(similar_id__in=chunk).values_list('book_id', flat=True))
+
+        best = {}
+        for _, others, scores in similarities:
+            for other, score in zip(matrix.book_ids[others].tolist(), scores.tolist()):
+                if other not in changed_ids and score > best.get(other, 0):
+                    best[other] = score
+
+        candidates = set(best) - affected
+        for chunk in cls.chunks(candidates):
+            current = {
+                row['book_id']: row
+                for row in SimilarBook.objects.filter(book_id__in=chunk).values('book_id').annotate(
+                    kth=Min('score'), size=Count('pk')
+                )
+            }
+            for book_id in chunk:
+                row = current.get(book_id)
+                if row is None or row['size'] < top_k or best[book_id] > row['kth']:
+                    affected.add(book_id)
+        return affected - changed_ids
+
+    @classmethod
+    def save_neighbors(cls, matrix, neighbors, rows, full):
+        """Remplace les listes des lignes recalculées"""
+        book_ids = matrix.book_ids
+        objects = [
+            SimilarBook(book_id=int(book_ids[row]), similar_id=int(book_ids[other]), score=score, rank=rank)
+            for row in rows
+            for rank, (other, score) in enumerate(neighbors.get(row, []), start=1)
+        ]
+        if full:
+            SimilarBook.objects.all().delete()
+        else:
+            for chunk in cls.chunks(book_ids[rows].tolist()):
+                SimilarBook.objects.filter(book_id__in=chunk).delete()
+        SimilarBook.objects.bulk_create(objects, batch_size=5000)
+        return len(objects)
+
+    @classmethod
+    def save_signatures(cls, catalog, book_ids, full):
+        wanted = set(book_ids)
+        now = timezone.now()
+        signatures = [
+            BookContentSignature(book_id=book_id, fingerprint=cls.fingerprint(title, description, genres), computed_at=now)
+            for book_id, title, description, _, genres in catalog
+            if book_id in wanted
+        ]
+        if full:
+            BookContentSignature.objects.all().delete()
+        else:
+            for chunk in cls.chunks(wanted):
+                BookContentSignature.objects.filter(book_id__in=chunk).delete()
+        BookContentSignature.objects.bulk_create(signatures, batch_size=5000)
+
+    @classmethod
+    def rebuild(cls, full=False, top_k=None):
+        """
+        Recalcule les livres similaires. En mode incrémental, seuls les livres modifiés
+        et ceux dont la liste en dépend sont recalculés (l'idf reste celui du catalogue
+        courant ; un recalcul complet le réaligne pour tous).
+        Retourne des statistiques.
+        """
+        top_k = top_k or cls.TOP_K
+        catalog = cls.load_catalog()
+        stats = {'books': len(catalog), 'changed': 0, 'affected': 0, 'neighbors': 0}
+        if not catalog:
+            return stats
+
+        matrix = cls.build_matrix(catalog)
+        row_of = {book_id: row for row, book_id in enumerate(matrix.book_ids.tolist())}
+
+        changed_ids = [entry[0] for entry in catalog] if full else cls.changed_books(catalog)
+        changed_rows = np.array([row_of[book_id] for book_id in changed_ids], dtype=np.int64)
+        stats['changed'] = len(changed_rows)
+        if not len(changed_rows):
+            return stats
+
+        similarities = None if full else []
+        neighbors = cls.nearest(matrix, changed_rows, top_k, collect=similarities)
+        rows = changed_rows.tolist()
+
+        if not full:
+            affected = cls.affected_books(matrix, changed_rows, similarities, top_k)
+            affected_rows = np.array(sorted(row_of[book_id] for book_id in affected), dtype=np.int64)
+            stats['affected'] = len(affected_rows)
+            if len(affected_rows):
+                neighbors.update(cls.nearest(matrix, affected_rows, top_k))
+                rows += affected_rows.tolist()
+
+        with transaction.atomic():
+            stats['neighbors'] = cls.save_neighbors(matrix, neighbors, rows, full)
+            cls.save_signatures(catalog, changed_ids, full)
+        cls.pages_changed(matrix.book_ids[rows].tolist())
+        return stats
+
+    @classmethod
+    def pages_changed(cls, book_ids):
+        """Pages des livres recalculés (liste des similaires) : nouvelle version (ETag) et purge du cache"""
+        for chunk in cls.chunks(book_ids):
+            Book.bump_circulation_version(*chunk)
+        PageCacheService.invalidate(*(PageCacheService.book_tag(book_id) for book_id in book_ids))
+
+    @classmethod
+    def similar_books(cls, book, limit=None):
+        """Livres similaires d'un livre, par rang (une requête indexée)"""
+        limit = limit or cls.TOP_K
+        return [
+            entry.similar
+            for entry in SimilarBook.objects.filter(book=book).select_related('similar').order_by('rank')[:limit]
+        ]
@@ -0,0 +1,93 @@
+"""
+Statistiques des pages de gestion (achats, livraisons) : une requête agrégée par page, mise en cache
+"""
+
+import hashlib
+from urllib.parse import urlencode
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from .models import Delivery
+
+
+class AdminStatsService:
+    """
+    Les compteurs par statut et les montants d'une page sont calculés en un seul
+    SELECT (agrégats conditionnels COUNT/SUM ... FILTER), puis mis en cache quelques
+    secondes par jeu de filtres normalisé. Toute modification d'un achat ou d'une
+    livraison rend obsolètes les statistiques de sa page (version de clé).
+    """
+
+    CACHE_PREFIX = 'adminstats'
+    CACHE_TIMEOUT = 60
+
+    PURCHASE_STATUSES = ['pending', 'confirmed', 'paid', 'delivered', 'cancelled']
+    PURCHASE_REVENUE_STATUSES = ['paid', 'delivered']
+    PURCHASE_PENDING_REVENUE_STATUSES = ['pending', 'confirmed']
+    DELIVERY_STATUSES = ['pending', 'preparing', 'shipped', 'in_transit', 'delivered', 'failed']
+    DELIVERY_OPEN_STATUSES = ['pending', 'preparing', 'shipped', 'in_transit']
+
+    # ----- Cache -----
+
+    @classmethod
+    def version(cls, page):
+        return cache.get(f'{cls.CACHE_PREFIX}:{page}:version', 0)
+
+    @classmethod
+    def make_key(cls, page, params):
+        """Clé : page, version et filtres normalisés (triés, sans valeurs vides)"""
+        normalized = sorted((name, str(value)) for name, value in params.items() if value not in (None, ''))
+        digest = hashlib.sha1(urlencode(normalized).encode()).hexdigest()
+        return f'{cls.CACHE_PREFIX}:{page}:v{cls.version(page)}:{digest}'
+
+    @classmethod
+    def invalidate(cls, page):
+        key = f'{cls.CACHE_PREFIX}:{page}:version'
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+    @classmethod
+    def cached(cls, page, params, compute):
+        key = cls.make_key(page, params)
+        stats = cache.get(key)
+        if stats is None:
+            stats = compute()
+            cache.set(key, stats, cls.CACHE_TIMEOUT)
+        return stats
+
+    # ----- Pages -----
+
+    @classmethod
+    def purchase_stats(cls, purchases, params):
+        """Compteurs par statut et revenus des achats filtrés"""
+        def compute():
+            stats = purchases.order_by().aggregate(
+                total_purchases=Count('pk'),
+                total_revenue=Sum('total_price', filter=Q(status__in=cls.PURCHASE_REVENUE_STATUSES)),
+                pending_revenue=Sum('total_price', filter=Q(status__in=cls.PURCHASE_PENDING_REVENUE_STATUSES)),
+                **{f'{status}_count': Count('pk', filter=Q(status=status)) for status in cls.PURCHASE_STATUSES},
+            )
+            stats['total_revenue'] = stats['total_revenue'] or 0
+            stats['pending_revenue'] = stats['pending_revenue'] or 0
+            return stats
+
+        return cls.cached('purchases', params, compute)
+
+    @classmethod
+    def delivery_stats(cls, filters, params):
+        """
+        Compteurs par statut des livraisons correspondant à filters (Q), et nombre total
+        de livraisons en retard (tous filtres confondus), dans la même requête.
+        """
+        def compute():
+            overdue = Q(estimated_delivery_date__lt=timezone.now(), status__in=cls.DELIVERY_OPEN_STATUSES)
+            return Delivery.objects.aggregate(
+                total_deliveries=Count('pk', filter=filters),
+                overdue_deliveries=Count('pk', filter=overdue),
+                **{f'{status}_count': Count('pk', filter=filters & Q(status=status)) for status in cls.DELIVERY_STATUSES},
+            )
+
+        return cls.cached('deliveries', params, compute)
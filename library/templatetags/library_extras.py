@@ -56,3 +56,18 @@ def get_purchase_discount(user_category):
     """Récupère la remise d'achat pour une catégorie d'utilisateur"""
     from library.models import LibraryConfig
     return LibraryConfig.get_purchase_discount(user_category)
+
+
+@register.simple_tag(takes_context=True)
+def borrowing_eligibility(context, book=None):
+    """
+    Badge « puis-je emprunter / réserver » : verdict du lecteur connecté (dict, None si
+    anonyme), calculé une fois par requête et par livre.
+    Usage : {% borrowing_eligibility book as eligibility %}{% if eligibility.can_borrow %}...
+    """
+    from library.eligibility_services import EligibilityService
+    request = context.get('request')
+    if request is None:
+        return None
+    verdict = EligibilityService.for_request(request, book)
+    return verdict.as_dict() if verdict is not None else None
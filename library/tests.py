@@ -1,3 +1,654 @@
-from django.test import TestCase
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, RequestFactory
+from django.utils import timezone
+
+from . import signals, views
+from .cache_services import PageCacheService
+from .circulation_services import CirculationService
+from .counter_services import StatusCounterService
+from .dashboard_services import DashboardSummaryService
+from .models import (
+    CustomUser, Book, BookPurchase, Delivery, Loan, Payment, Publisher, Reservation, UserDashboardSummary,
+    normalize_isbn13,
+)
+from .reservation_services import ReservationExpiryService, ReservationPromotionService, ReservationService
+from .search_services import FuzzySearchService
+from .similarity_services import ContentSimilarityService
+
+
+class AdminManagementQueryCountTests(TestCase):
+    """Page de gestion : une requête de statistiques et une pour les lignes ; statistiques ensuite en cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'pw')
+        book = Book.objects.create(
+            title='Livre', isbn='9780000000001', language='fr', total_copies=3, available_copies=3,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        for index, status in enumerate(['pending', 'confirmed', 'paid', 'delivered', 'cancelled']):
+            purchase = BookPurchase.objects.create(
+                user=buyer, book=book, unit_price=Decimal('10.00'), total_price=Decimal('10.00'), status=status,
+            )
+            Delivery.objects.create(
+                purchase=purchase, delivery_address='1 rue des Livres', recipient_name='Lecteur',
+                status=['pending', 'preparing', 'shipped', 'in_transit', 'delivered'][index],
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def render_context(self, view, path, params=None):
+        request = self.factory.get(path, params or {})
+        request.user = self.staff
+        captured = {}
+
+        def fake_render(request, template, context):
+            captured.update(context)
+            return HttpResponse()
+
+        with mock.patch.object(views, 'render', fake_render):
+            view(request)
+        return captured
+
+    def test_admin_purchases_stats_query_count(self):
+        with self.assertNumQueries(2):
+            context = self.render_context(views.admin_purchases, '/admin-purchases/', {'book_search': 'Liv'})
+        self.assertEqual(context['total_purchases'], 5)
+        self.assertEqual(context['paid_count'], 1)
+        self.assertEqual(context['total_revenue'], Decimal('20.00'))
+        self.assertEqual(context['pending_revenue'], Decimal('20.00'))
+
+        with self.assertNumQueries(1):
+            self.render_context(views.admin_purchases, '/admin-purchases/', {'book_search': 'Liv', 'status': ''})
+
+    def test_admin_deliveries_stats_query_count(self):
+        with self.assertNumQueries(2):
+            context = self.render_context(views.admin_deliveries, '/admin-deliveries/', {'status': 'shipped'})
+        self.assertEqual(context['total_deliveries'], 1)
+        self.assertEqual(context['shipped_count'], 1)
+        self.assertEqual(context['pending_count'], 0)
+
+        with self.assertNumQueries(1):
+            self.render_context(views.admin_deliveries, '/admin-deliveries/', {'status': 'shipped'})
+
+    def test_stats_invalidated_on_change(self):
+        self.render_context(views.admin_deliveries, '/admin-deliveries/')
+        Delivery.objects.filter(status='pending').first().delete()
+        context = self.render_context(views.admin_deliveries, '/admin-deliveries/')
+        self.assertEqual(context['total_deliveries'], 4)
+
+
+@contextmanager
+def file_backed_database():
+    """
+    La base de test SQLite en mémoire est copiée dans un fichier le temps du bloc : les
+    connexions ouvertes par d'autres threads s'y connectent et se disputent de vrais verrous.
+    """
+    if connection.vendor != 'sqlite' or not connection.is_in_memory_db():
+        yield
+        return
+    connection.ensure_connection()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'stress.sqlite3')
+        target = sqlite3.connect(path)
+        connection.connection.backup(target)
+        target.close()
+        settings_dict = connections.settings[connection.alias]
+        original_name = settings_dict['NAME']
+        settings_dict['NAME'] = path
+        try:
+            yield
+        finally:
+            settings_dict['NAME'] = original_name
+
+
+def run_in_threads(targets):
+    """Lance les fonctions en parallèle (une connexion par thread) ; retourne les erreurs levées"""
+    errors = []
+    barrier = threading.Barrier(len(targets))
+
+    def run(target):
+        try:
+            barrier.wait()
+            target()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+class ReturnPipelineConcurrencyTests(TransactionTestCase):
+    """Retours simultanés d'un titre très demandé : aucun incrément perdu, aucune double promotion"""
+
+    THREADS = 16
+    COPIES = 48
+    WAITING = 30
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(
+            title='Titre demandé', isbn='9780000000002', language='fr', total_copies=self.COPIES,
+            available_copies=0, publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        due_date = timezone.localdate() + datetime.timedelta(days=14)
+        self.loans = [
+            Loan.objects.create(
+                user=CustomUser.objects.create(username=f'lecteur{index}', email=f'lecteur{index}@example.com'),
+                book=self.book, due_date=due_date,
+            )
+            for index in range(self.COPIES)
+        ]
+        for index in range(self.WAITING):
+            Reservation.objects.create(
+                user=CustomUser.objects.create(username=f'attente{index}', email=f'attente{index}@example.com'),
+                book=self.book, expiry_date=timezone.now() + datetime.timedelta(days=7),
+            )
+        mail.outbox = []
+
+    def test_concurrent_returns(self):
+        # Chaque emprunt est rendu par deux guichets à la fois
+        returns = self.loans + self.loans
+        outcomes = []
+
+        def clerk(loans):
+            return lambda: outcomes.extend(CirculationService.return_loan(loan)[0] for loan in loans)
+
+        with file_backed_database():
+            errors = run_in_threads([clerk(returns[index::self.THREADS]) for index in range(self.THREADS)])
+            state = {}
+
+            def read_state():
+                state['available'] = Book.objects.get(pk=self.book.pk).available_copies
+                state['returned'] = Loan.objects.filter(status='returned').count()
+                state['ready'] = Reservation.objects.filter(status='ready').count()
+                state['active'] = Reservation.objects.filter(status='active').count()
+                state['drift'] = StatusCounterService.check_drift()
+
+            errors += run_in_threads([read_state])
+
+        self.assertEqual(errors, [])
+        self.assertEqual(outcomes.count(True), self.COPIES)
+        self.assertEqual(outcomes.count(False), self.COPIES)
+        self.assertEqual(state['available'], self.COPIES)
+        self.assertEqual(state['returned'], self.COPIES)
+        self.assertEqual(state['ready'], self.WAITING)
+        self.assertEqual(state['active'], 0)
+        self.assertEqual(state['drift'], {})
+        self.assertEqual(len(mail.outbox), self.WAITING)
+
+
+class ReturnStockCapTests(TestCase):
+    """Retour sur un stock déjà complet : emprunt rendu, stock plafonné à total_copies"""
+
+    def test_return_does_not_exceed_total_copies(self):
+        book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=1, available_copies=1,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        user = CustomUser.objects.create(username='lecteur', email='lecteur@example.com')
+        loan = Loan.objects.create(user=user, book=book, due_date=timezone.localdate())
+
+        self.assertEqual(CirculationService.return_loan(loan), (True, "Livre remis en stock"))
+        self.assertEqual(Loan.objects.get(pk=loan.pk).status, 'returned')
+        self.assertEqual(Book.objects.get(pk=book.pk).available_copies, 1)
+        self.assertEqual(StatusCounterService.check_drift(), {})
+
+
+class BorrowLoadTests(TransactionTestCase):
+    """200 emprunteurs simultanés pour un titre : exactement autant de prêts que d'exemplaires"""
+
+    BORROWERS = 200
+    COPIES = 50
+
+    def setUp(self):
+        cache.clear()
+        self.book = Book.objects.create(
+            title='Nouveauté', isbn='9780000000003', language='fr', total_copies=self.COPIES,
+            available_copies=self.COPIES, publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        self.borrowers = [
+            CustomUser.objects.create(username=f'emprunteur{index}', email=f'emprunteur{index}@example.com')
+            for index in range(self.BORROWERS)
+        ]
+
+    def test_concurrent_borrowers(self):
+        due_date = timezone.localdate() + datetime.timedelta(days=14)
+        outcomes = []
+
+        def borrower(user):
+            return lambda: outcomes.append(CirculationService.lend(user, self.book, due_date)[0])
+
+        with file_backed_database():
+            errors = run_in_threads([borrower(user) for user in self.borrowers])
+            state = {}
+
+            def read_state():
+                state['available'] = Book.objects.get(pk=self.book.pk).available_copies
+                state['loans'] = Loan.objects.filter(book=self.book).count()
+                state['drift'] = StatusCounterService.check_drift()
+
+            errors += run_in_threads([read_state])
+
+        self.assertEqual(errors, [])
+        self.assertEqual(outcomes.count(True), self.COPIES)
+        self.assertEqual(outcomes.count(False), self.BORROWERS - self.COPIES)
+        self.assertEqual(state['available'], 0)
+        self.assertEqual(state['loans'], self.COPIES)
+        self.assertEqual(state['drift'], {})
+
+
+class IsbnIndexTests(TestCase):
+    """Index ISBN-13 : clés de contrôle vérifiées, doublons d'écriture tenus hors de l'index"""
+
+    def create_book(self, isbn):
+        return Book.objects.create(
+            title='Livre', isbn=isbn, language='fr', total_copies=1, available_copies=1,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+
+    def test_normalize_checks_digits(self):
+        self.assertEqual(normalize_isbn13('ISBN 0-306-40615-2'), '9780306406157')
+        self.assertEqual(normalize_isbn13('978-0-306-40615-7'), '9780306406157')
+        self.assertEqual(normalize_isbn13('0-8044-2957-X'), '9780804429573')
+        self.assertIsNone(normalize_isbn13('0-306-40615-X'))
+        self.assertIsNone(normalize_isbn13('978-0-306-40615-8'))
+
+    def test_other_spelling_stays_out_of_index(self):
+        indexed = self.create_book('978-0-306-40615-7')
+        legacy = self.create_book('0306406152')
+        self.assertEqual(indexed.isbn13, '9780306406157')
+        self.assertIsNone(legacy.isbn13)
+
+        legacy.total_copies = 2
+        legacy.save()
+        legacy.refresh_from_db()
+        self.assertIsNone(legacy.isbn13)
+        legacy.full_clean()
+
+        with self.assertRaises(ValidationError) as raised:
+            Book(
+                title='Doublon', isbn='0-306-40615-2', language='fr', total_copies=1, available_copies=1,
+                publication_date=datetime.date(2000, 1, 1), pages=100,
+            ).full_clean()
+        self.assertIn('isbn', raised.exception.message_dict)
+
+
+class StatusCounterTransactionTests(TransactionTestCase):
+    """Compteurs de statut ajustés dans la transaction de la transition"""
+
+    def test_failed_adjustment_rolls_back_transition(self):
+        book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=1, available_copies=1,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        user = CustomUser.objects.create(username='lecteur', email='lecteur@example.com')
+        loan = Loan.objects.create(user=user, book=book, due_date=timezone.localdate())
+
+        loan.status = 'returned'
+        with mock.patch.object(StatusCounterService, 'adjust', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                loan.save()
+
+        self.assertEqual(Loan.objects.get(pk=loan.pk).status, 'borrowed')
+        self.assertEqual(StatusCounterService.check_drift(), {})
+
+
+class DashboardSummaryDeltaTests(TestCase):
+    """Résumé du tableau de bord ajusté par deltas : identique au recalcul complet"""
+
+    def test_deltas_match_full_recompute(self):
+        user = CustomUser.objects.create(username='lecteur', email='lecteur@example.com')
+        book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=5, available_copies=5,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        DashboardSummaryService.refresh(user.pk)
+
+        loans = [Loan.objects.create(user=user, book=book, due_date=timezone.localdate()) for _ in range(3)]
+        loans[0].status = 'overdue'
+        loans[0].save()
+        loans[1].status = 'returned'
+        loans[1].save()
+        loans[2].delete()
+
+        purchase = BookPurchase.objects.create(
+            user=user, book=book, quantity=3, unit_price=Decimal('9.99'),
+            discount_percentage=Decimal('12.5'), total_price=Decimal('0'),
+        )
+        purchase.status = 'paid'
+        purchase.save()
+        BookPurchase.objects.create(user=user, book=book, unit_price=Decimal('5.00'), total_price=Decimal('5.00'))
+
+        payment = Payment.objects.create(user=user, payment_type='fine', amount=Decimal('2.50'), payment_method='cash')
+        Payment.objects.create(user=user, payment_type='late_fee', amount=Decimal('1.20'), payment_method='cash')
+        payment.status = 'completed'
+        payment.save()
+
+        summary = DashboardSummaryService.get_for_user(user)
+        expected = DashboardSummaryService.compute(user.pk)
+        for name, value in expected.items():
+            self.assertEqual(getattr(summary, name), value, name)
+        self.assertEqual(UserDashboardSummary.objects.get(user=user).top_books, expected['top_books'])
+
+    def test_admin_bulk_status_action_matches_full_recompute(self):
+        user = CustomUser.objects.create(username='acheteur', email='acheteur@example.com')
+        book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=5, available_copies=5,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        BookPurchase.objects.create(user=user, book=book, unit_price=Decimal('10.00'), total_price=Decimal('10.00'))
+        BookPurchase.objects.create(
+            user=user, book=book, quantity=2, unit_price=Decimal('8.00'),
+            discount_percentage=Decimal('10'), total_price=Decimal('0'),
+        )
+        DashboardSummaryService.refresh(user.pk)
+
+        purchase_admin = admin.site._registry[BookPurchase]
+        with mock.patch.object(purchase_admin, 'message_user'):
+            purchase_admin.mark_as_paid(RequestFactory().post('/'), BookPurchase.objects.filter(user=user))
+
+        summary = UserDashboardSummary.objects.get(user=user)
+        expected = DashboardSummaryService.compute(user.pk)
+        self.assertEqual(expected['pending_purchases_count'], 0)
+        for name in ('pending_purchases_count', 'total_purchases_count', 'total_spent', 'total_savings'):
+            self.assertEqual(getattr(summary, name), expected[name], name)
+
+
+class CirculationStampTests(TestCase):
+    """Les mouvements de circulation n'avancent pas updated_date (modifications du contenu)"""
+
+    def test_loan_bumps_circulation_only(self):
+        book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=2, available_copies=2,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        user = CustomUser.objects.create(username='lecteur', email='lecteur@example.com')
+        Loan.objects.create(user=user, book=book, due_date=timezone.localdate())
+
+        stamped = Book.objects.get(pk=book.pk)
+        self.assertEqual(stamped.updated_date, book.updated_date)
+        self.assertEqual(stamped.circulation_version, book.circulation_version + 1)
+        self.assertIsNotNone(stamped.circulation_changed_at)
+
+
+class PublisherRenameTests(TestCase):
+    """Éditeur : seul un renommage réindexe ses livres et purge leurs pages"""
+
+    def test_only_rename_reindexes_books(self):
+        publisher = Publisher.objects.create(name='Gallimard')
+        book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=2, available_copies=2,
+            publication_date=datetime.date(2000, 1, 1), pages=100, publisher=publisher,
+        )
+        with mock.patch.object(signals.CatalogSearchIndex, 'index_books') as index_books, \
+                mock.patch.object(PageCacheService, 'invalidate') as invalidate:
+            publisher.website = 'https://www.gallimard.fr'
+            publisher.save()
+            index_books.assert_not_called()
+            invalidate.assert_not_called()
+
+            publisher.name = 'Éditions Gallimard'
+            publisher.save()
+        index_books.assert_called_once_with([book.pk])
+        invalidate.assert_called_once_with(PageCacheService.book_tag(book.pk), PageCacheService.BOOK_LIST_TAG)
+
+
+class ConditionalBookPageTests(TestCase):
+    """Réponses 304 réservées aux visiteurs anonymes (jeton CSRF et éligibilité propres au lecteur)"""
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=2, available_copies=2,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        self.url = f'/books/{self.book.pk}/queue-info/'
+
+    def test_anonymous_revalidation(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_no_conditional_response_for_readers(self):
+        etag = self.client.get(self.url)['ETag']
+        user = CustomUser.objects.create_user('lecteur', 'lecteur@example.com', 'pw')
+        self.client.force_login(user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class SimilarBooksRebuildTests(TestCase):
+    """Recalcul des livres similaires : les pages des livres recalculés changent de version"""
+
+    def test_rebuild_bumps_rebuilt_books(self):
+        books = [
+            Book.objects.create(
+                title=title, isbn=isbn, language='fr', total_copies=2, available_copies=2,
+                publication_date=datetime.date(2000, 1, 1), pages=100, description='Roman de mer et de tempête',
+            )
+            for title, isbn in [('La Mer', '9780306406157'), ('La Mer cruelle', '9781861972712')]
+        ]
+        versions = dict(Book.objects.values_list('pk', 'circulation_version'))
+        with mock.patch.object(PageCacheService, 'invalidate') as invalidate:
+            stats = ContentSimilarityService.rebuild(full=True)
+
+        self.assertEqual(stats['changed'], 2)
+        for book in books:
+            self.assertEqual(Book.objects.get(pk=book.pk).circulation_version, versions[book.pk] + 1)
+        self.assertEqual(
+            set(invalidate.call_args.args), {PageCacheService.book_tag(book.pk) for book in books}
+        )
+
+
+class BookListPurgeTests(TestCase):
+    """Pages de liste en cache : purgées quand un livre non affiché peut y entrer"""
+
+    def setUp(self):
+        cache.clear()
+        # Gabarits absents des tests : la page se réduit aux titres affichés
+        patcher = mock.patch.object(views, 'render', lambda request, template, context: HttpResponse(
+            '\n'.join(book.title for book in context['page_obj'])
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_book(self, title, isbn):
+        return Book.objects.create(
+            title=title, isbn=isbn, language='fr', total_copies=5, available_copies=5,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+
+    def test_renamed_book_enters_cached_search(self):
+        self.create_book('Alpha', '9780306406157')
+        other = self.create_book('Omega', '9781861972712')
+        response = self.client.get('/books/', {'query': 'alpha'})
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, 'Alpha Centauri')
+
+        other.available_copies = 4
+        other.save()
+        self.assertEqual(self.client.get('/books/', {'query': 'alpha'})['X-Page-Cache'], 'HIT')
+
+        other.title = 'Alpha Centauri'
+        other.save()
+        response = self.client.get('/books/', {'query': 'alpha'})
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Alpha Centauri')
+
+
+class ReservationPromotionTests(TestCase):
+    """Moteur ensembliste : exemplaires libres servis par priorité, mises de côté comptées"""
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=5, available_copies=0,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        self.now = timezone.now()
+
+    def reserve(self, name, priority=0, **fields):
+        user = CustomUser.objects.create(username=name, email=f'{name}@example.com')
+        fields.setdefault('expiry_date', self.now + datetime.timedelta(days=7))
+        return Reservation.objects.create(user=user, book=self.book, priority=priority, **fields)
+
+    def free_copies(self, count):
+        Book.objects.filter(pk=self.book.pk).update(available_copies=count)
+
+    def statuses(self):
+        return dict(Reservation.objects.filter(book=self.book).values_list('pk', 'status'))
+
+    def test_free_copies_promote_queue_head_by_priority(self):
+        late = self.reserve('late', priority=5)
+        first = self.reserve('first')
+        second = self.reserve('second')
+        third = self.reserve('third')
+        self.free_copies(2)
+
+        promoted = ReservationPromotionService.promote([self.book.pk])
+
+        self.assertCountEqual(promoted, [first.pk, second.pk])
+        statuses = self.statuses()
+        self.assertEqual([statuses[r.pk] for r in (first, second, third, late)], ['ready', 'ready', 'active', 'active'])
+        self.assertEqual(Reservation.objects.filter(pk__in=promoted, notification_sent=False).count(), 2)
+
+    def test_ready_holds_take_copies_first(self):
+        self.reserve('held', status='ready', ready_date=self.now - datetime.timedelta(days=1))
+        waiting = self.reserve('waiting')
+        self.reserve('after')
+        self.free_copies(2)
+
+        self.assertEqual(ReservationPromotionService.promote([self.book.pk]), [waiting.pk])
+        self.assertEqual(ReservationPromotionService.promote([self.book.pk]), [])
+
+    def test_expired_active_reservations_are_skipped(self):
+        self.reserve('lapsed', priority=-1, expiry_date=self.now - datetime.timedelta(minutes=1))
+        waiting = self.reserve('waiting')
+        self.free_copies(1)
+
+        self.assertEqual(ReservationPromotionService.promote([self.book.pk]), [waiting.pk])
+
+    def test_preview_matches_promotion(self):
+        self.reserve('held', status='ready', ready_date=self.now)
+        self.reserve('lapsed', expiry_date=self.now - datetime.timedelta(minutes=1))
+        for index in range(4):
+            self.reserve(f'reader{index}', priority=index % 2)
+        self.free_copies(3)
+
+        preview = ReservationPromotionService.preview([self.book.pk])
+        statuses = self.statuses()
+        self.assertEqual(len(preview), 2)
+        self.assertCountEqual(ReservationPromotionService.promote([self.book.pk]), preview)
+        self.assertEqual(ReservationPromotionService.preview([self.book.pk]), [])
+        self.assertEqual({pk for pk, status in self.statuses().items() if status != statuses[pk]}, set(preview))
+
+
+class ReservationQueuePositionTests(TestCase):
+    """Rangs de file maintenus : denses, dans l'ordre de promotion, NULL hors de la file"""
+
+    def setUp(self):
+        self.book = Book.objects.create(
+            title='Livre', isbn='9780306406157', language='fr', total_copies=3, available_copies=0,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        self.reservations = []
+        for index in range(4):
+            user = CustomUser.objects.create(username=f'lecteur{index}', email=f'lecteur{index}@example.com')
+            success, reservation = ReservationService.create_reservation(user, self.book)
+            self.assertTrue(success, reservation)
+            self.reservations.append(reservation)
+
+    def assertQueue(self, expected):
+        """File attendue (réservations dans l'ordre) ; toute autre réservation est hors file"""
+        positions = dict(Reservation.objects.filter(book=self.book).values_list('pk', 'queue_position'))
+        self.assertEqual(
+            positions,
+            {reservation.pk: expected.index(reservation) + 1 if reservation in expected else None
+             for reservation in self.reservations},
+        )
+
+    def test_create_numbers_queue_in_order(self):
+        self.assertQueue(self.reservations)
+        self.assertEqual([r.queue_position for r in self.reservations], [1, 2, 3, 4])
+
+        urgent = self.reservations[3]
+        urgent.priority = -1
+        urgent.save()
+        self.assertQueue([urgent] + self.reservations[:3])
+
+    def test_cancel_closes_the_gap(self):
+        first, second, third, fourth = self.reservations
+        second.cancel()
+        self.assertIsNone(second.queue_position)
+        self.assertQueue([first, third, fourth])
+
+        reservation_admin = admin.site._registry[Reservation]
+        with mock.patch.object(reservation_admin, 'message_user'):
+            reservation_admin.cancel_reservations(RequestFactory().post('/'), Reservation.objects.filter(pk=first.pk))
+        self.assertQueue([third, fourth])
+
+    def test_expiry_closes_the_gap(self):
+        first, second, third, fourth = self.reservations
+        Reservation.objects.filter(pk=third.pk).update(expiry_date=timezone.now() - datetime.timedelta(minutes=1))
+        ReservationExpiryService.expire()
+        self.assertQueue([first, second, fourth])
+
+    def test_promotion_leaves_the_queue(self):
+        first, second, third, fourth = self.reservations
+        Book.objects.filter(pk=self.book.pk).update(available_copies=2)
+        ReservationPromotionService.promote([self.book.pk])
+        self.assertQueue([third, fourth])
+
+
+class FuzzyIndexRefreshTests(TestCase):
+    """Index approximatif : invalidé par les changements de titre, reconstruit hors requête"""
+
+    def setUp(self):
+        cache.clear()
+        FuzzySearchService._index = None
+        self.addCleanup(setattr, FuzzySearchService, '_index', None)
+
+    def test_title_edit_schedules_background_rebuild(self):
+        book = Book.objects.create(
+            title='Germinal', isbn='9780306406157', language='fr', total_copies=2, available_copies=2,
+            publication_date=datetime.date(2000, 1, 1), pages=100,
+        )
+        index = FuzzySearchService.get_index()
+        generation = FuzzySearchService.current_generation()
+
+        book.available_copies = 1
+        book.save()
+        self.assertEqual(FuzzySearchService.current_generation(), generation)
+
+        book.title = 'La Bête humaine'
+        book.save()
+        self.assertEqual(FuzzySearchService.current_generation(), generation + 1)
+
+        with mock.patch.object(FuzzySearchService, 'rebuild_in_background') as rebuild_in_background:
+            self.assertIs(FuzzySearchService.get_index(), index)
+        rebuild_in_background.assert_called_once_with()
+
+        FuzzySearchService.rebuild()
+        self.assertEqual(FuzzySearchService.search('humane')['suggestion'], 'humaine')
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import views, api
 
 urlpatterns = [
     # Pages principales
@@ -18,8 +18,19 @@ urlpatterns = [
     path('favorites/<int:favorite_id>/note/', views.add_favorite_note, name='add_favorite_note'),
 
     # AJAX endpoints
+    path('books/autocomplete/', views.book_autocomplete, name='book_autocomplete'),
     path('books/<int:book_id>/queue-info/', views.get_book_queue_info, name='get_book_queue_info'),
 
+    # API JSON en lecture seule (v1)
+    path('api/v1/books/', api.api_list, {'resource': 'books'}, name='api_books'),
+    path('api/v1/books/<int:pk>/', api.api_detail, {'resource': 'books'}, name='api_book_detail'),
+    path('api/v1/authors/', api.api_list, {'resource': 'authors'}, name='api_authors'),
+    path('api/v1/authors/<int:pk>/', api.api_detail, {'resource': 'authors'}, name='api_author_detail'),
+    path('api/v1/genres/', api.api_list, {'resource': 'genres'}, name='api_genres'),
+    path('api/v1/genres/<int:pk>/', api.api_detail, {'resource': 'genres'}, name='api_genre_detail'),
+    path('api/v1/availability/', api.api_list, {'resource': 'availability'}, name='api_availability'),
+    path('api/v1/availability/<int:pk>/', api.api_detail, {'resource': 'availability'}, name='api_availability_detail'),
+
     # Test pages
     path('test-favorites/', views.test_favorites, name='test_favorites'),
 
@@ -82,6 +93,7 @@ urlpatterns = [
     path('debug/outstanding-fees/', views.debug_outstanding_fees, name='debug_outstanding_fees'),
     path('debug/fix-outstanding-fees/', views.fix_outstanding_fees, name='fix_outstanding_fees'),
     path('admin-statistics/', views.admin_statistics, name='admin_statistics'),
+    path('admin-statistics/page-cache/', views.page_cache_stats, name='page_cache_stats'),
 
     # Emprunts et réservations utilisateur
     path('my-loans/', views.my_loans, name='my_loans'),
@@ -6,17 +6,20 @@ from django.contrib import messages
 from django.db.models import Q, Count, Sum
 from django.core.paginator import Paginator
 from django.http import JsonResponse
+from django.views.decorators.http import condition
 from django.utils import timezone
 from django.db import transaction
 from datetime import timedelta, datetime
 from decimal import Decimal
 from .decorators import (
     super_admin_required, admin_required, staff_or_super_admin_required,
-    user_management_required, check_user_permissions, get_user_admin_context
+    user_management_required, check_user_permissions, get_user_admin_context,
+    cache_anonymous_page
 )
 from .models import (
     Book, Loan, Reservation, CustomUser, Genre, Author,
-    BookPurchase, Payment, Deposit, LibraryConfig, Favorite, Delivery
+    BookPurchase, Payment, Deposit, LibraryConfig, Favorite, Delivery,
+    normalize_isbn13
 )
 from .forms import (
     BookSearchForm, UserRegistrationForm, BookCoverUploadForm,
@@ -24,12 +27,27 @@ from .forms import (
 )
 from .payment_services import PaymentService, PaymentCalculator, PaymentValidator
 from .reservation_services import ReservationService, NotificationService, ReservationValidator
-
-
+from .search_services import CatalogSearchIndex, FuzzySearchService, AutocompleteService, CatalogFacets
+from .activity_services import DailyActivityService
+from .analytics_services import CirculationAnalytics
+from .circulation_services import CirculationService
+from .eligibility_services import EligibilityService
+from .counter_services import StatusCounterService
+from .dashboard_services import DashboardSummaryService
+from .recommendation_services import RecommendationService
+from .similarity_services import ContentSimilarityService
+from .stats_services import AdminStatsService
+from .pagination import KeysetPaginator
+from .cache_services import PageCacheService, book_etag, book_last_modified
+
+
+@cache_anonymous_page()
 def home(request):
     """Page d'accueil"""
+    PageCacheService.tag(request, PageCacheService.BOOK_LIST_TAG, PageCacheService.GENRES_TAG)
     recent_books = Book.objects.filter(available_copies__gt=0).order_by('-added_date')[:6]
-    popular_genres = Genre.objects.annotate(book_count=Count('book')).order_by('-book_count')[:5]
+    PageCacheService.tag(request, *(PageCacheService.book_tag(book.pk) for book in recent_books))
+    popular_genres = CatalogFacets.genres_with_counts(limit=5)
 
     context = {
         'recent_books': recent_books,
@@ -38,43 +56,50 @@ def home(request):
     return render(request, 'library/home.html', context)
 
 
+@cache_anonymous_page()
 def book_list(request):
     """Liste des livres avec recherche et filtres"""
+    PageCacheService.tag(request, PageCacheService.BOOK_LIST_TAG, PageCacheService.GENRES_TAG)
     books = Book.objects.all().prefetch_related('authors', 'genres')
+    base_books = books
+    did_you_mean = None
     form = BookSearchForm(request.GET)
 
     # Recherche
     if form.is_valid():
         query = form.cleaned_data.get('query')
-        genre = form.cleaned_data.get('genre')
         author = form.cleaned_data.get('author')
-        language = form.cleaned_data.get('language')
-        available_only = form.cleaned_data.get('available_only')
 
-        if query:
-            books = books.filter(
-                Q(title__icontains=query) |
-                Q(authors__first_name__icontains=query) |
-                Q(authors__last_name__icontains=query) |
-                Q(isbn__icontains=query)
-            ).distinct()
-
-        if genre:
-            books = books.filter(genres=genre)
+        isbn13 = normalize_isbn13(query)
+        if isbn13:
+            # Saisie de type ISBN (douchette) : recherche exacte sur l'index unique
+            books = books.filter(isbn13=isbn13)
+            if not books.exists():
+                # ISBN hors de l'index (doublon d'écriture historique) : recherche plein texte
+                books = CatalogSearchIndex.search(base_books, query)
+        elif query:
+            # Recherche via l'index plein texte, triée par pertinence
+            books = CatalogSearchIndex.search(books, query)
+
+            # Aucun résultat : proposer une correction (fautes de frappe)
+            if not books.exists():
+                fuzzy = FuzzySearchService.search(query)
+                if fuzzy['suggestion']:
+                    did_you_mean = fuzzy['suggestion']
+                    books = CatalogSearchIndex.search(base_books, did_you_mean)
 
         if author:
             books = books.filter(authors=author)
 
-        if language:
-            books = books.filter(language=language)
-
-        if available_only:
-            books = books.filter(available_copies__gt=0)
+    # Facettes : comptages de la recherche courante, puis filtres sélectionnés
+    selected_facets = form.selected_facets()
+    form.set_facet_counts(CatalogFacets.counts(books, selected_facets))
+    books = CatalogFacets.apply(books, selected_facets)
 
-    # Pagination
-    paginator = Paginator(books, 12)  # 12 livres par page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (ni COUNT(*) complet ni OFFSET sur les grandes tables)
+    paginator = KeysetPaginator(books, 12)  # 12 livres par page
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    PageCacheService.tag(request, *(PageCacheService.book_tag(book.pk) for book in page_obj))
 
     # Ajouter les informations de favoris pour l'utilisateur connecté
     if request.user.is_authenticated:
@@ -97,12 +122,30 @@ def book_list(request):
         'form': form,
         'page_obj': page_obj,
         'books': page_obj,
+        'did_you_mean': did_you_mean,
     }
     return render(request, 'library/book_list.html', context)
 
 
+def book_autocomplete(request):
+    """Suggestions à la frappe pour la barre de recherche (AJAX)"""
+    query = request.GET.get('q', '')[:100]
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
+
+    return JsonResponse({
+        'query': query,
+        'suggestions': AutocompleteService.suggest(query, limit=limit),
+    })
+
+
+@condition(etag_func=book_etag, last_modified_func=book_last_modified)
+@cache_anonymous_page()
 def book_detail(request, book_id):
     """Détail d'un livre"""
+    PageCacheService.tag(request, PageCacheService.book_tag(book_id))
     book = get_object_or_404(Book, id=book_id)
     user_has_reservation = False
     user_current_loan = None
@@ -140,8 +183,13 @@ def book_detail(request, book_id):
         estimated_position = queue_info['active_count'] + 1
         estimated_wait_days = estimated_position * LibraryConfig.get_loan_duration(request.user.category)
 
+    # Livres au contenu proche (précalculés par build_similar_books)
+    similar_books = ContentSimilarityService.similar_books(book, limit=6)
+    PageCacheService.tag(request, *(PageCacheService.book_tag(similar.pk) for similar in similar_books))
+
     context = {
         'book': book,
+        'similar_books': similar_books,
         'user_has_reservation': user_has_reservation,
         'user_current_loan': user_current_loan,
         'user_has_favorite': user_has_favorite,
@@ -157,17 +205,20 @@ def dashboard(request):
     """Tableau de bord utilisateur enrichi"""
     user = request.user
 
-    # Emprunts actuels
-    current_loans = Loan.objects.filter(
+    # Compteurs, montants et préférences : une seule ligne matérialisée
+    summary = DashboardSummaryService.get_for_user(user)
+
+    # Emprunts actuels (petite liste, évaluée une seule fois)
+    current_loans = list(Loan.objects.filter(
         user=user,
         status__in=['borrowed', 'overdue']
-    ).select_related('book').order_by('due_date')
+    ).select_related('book').order_by('due_date'))
 
     # Réservations actives
-    active_reservations = Reservation.objects.filter(
+    active_reservations = list(Reservation.objects.filter(
         user=user,
         status='active'
-    ).select_related('book').order_by('reservation_date')
+    ).select_related('book').order_by('reservation_date'))
 
     # Historique des emprunts récents
     recent_loans = Loan.objects.filter(
@@ -179,63 +230,24 @@ def dashboard(request):
         user=user
     ).select_related('book').order_by('-purchase_date')[:3]
 
-    # Statistiques d'achats
     pending_purchases = BookPurchase.objects.filter(user=user, status='pending')
-    total_spent = BookPurchase.objects.filter(
-        user=user,
-        status__in=['paid', 'confirmed']
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    # Économies réalisées grâce aux remises (calculé manuellement)
-    paid_purchases = BookPurchase.objects.filter(
-        user=user,
-        status__in=['paid', 'confirmed']
-    )
-    total_savings = sum(purchase.discount_amount for purchase in paid_purchases)
-
-    # Statistiques personnelles
-    total_loans_count = Loan.objects.filter(user=user).count()
-    total_purchases_count = BookPurchase.objects.filter(user=user).count()
 
     # Emprunts en retard
-    overdue_loans = current_loans.filter(status='overdue')
+    overdue_loans = [loan for loan in current_loans if loan.status == 'overdue']
 
     # Réservations prêtes (livre disponible)
-    ready_reservations = active_reservations.filter(book__available_copies__gt=0)
-
-    # Livres favoris (les plus empruntés par l'utilisateur)
-    favorite_books = Book.objects.filter(
-        loans__user=user
-    ).annotate(
-        loan_count=Count('loans', filter=Q(loans__user=user))
-    ).order_by('-loan_count')[:3]
-
-    # Genres préférés
-    favorite_genres = Genre.objects.filter(
-        book__loans__user=user
-    ).annotate(
-        loan_count=Count('book__loans', filter=Q(book__loans__user=user))
-    ).order_by('-loan_count')[:3]
-
-    # Recommandations basées sur les genres préférés
-    if favorite_genres.exists():
-        recommended_books = Book.objects.filter(
-            genres__in=favorite_genres,
-            available_copies__gt=0
-        ).exclude(
-            loans__user=user
-        ).distinct()[:4]
-    else:
-        # Recommandations générales (livres populaires)
-        recommended_books = Book.objects.filter(
-            available_copies__gt=0
-        ).annotate(
-            loan_count=Count('loans')
-        ).order_by('-loan_count')[:4]
+    ready_reservations = [reservation for reservation in active_reservations if reservation.book.available_copies > 0]
+
+    # Livres favoris et genres préférés (les plus empruntés par l'utilisateur)
+    favorite_books = summary.top_books
+    favorite_genres = summary.top_genres
+
+    # Recommandations par co-emprunts (voisins précalculés, livres populaires à défaut)
+    recommended_books = RecommendationService.recommended_books(user, limit=4)
 
     # Limites et quotas
     max_books = LibraryConfig.get_max_books(user.category)
-    current_books_count = current_loans.count()
+    current_books_count = len(current_loans)
     remaining_books = max_books - current_books_count
 
     # Calculs pour la barre de progression
@@ -243,12 +255,12 @@ def dashboard(request):
     quota_warning_threshold = max_books * 0.8 if max_books > 0 else 0
 
     # Prochaines échéances
-    upcoming_due_dates = current_loans.filter(
-        due_date__lte=timezone.now().date() + timedelta(days=3)
-    ).order_by('due_date')
+    upcoming_limit = timezone.now().date() + timedelta(days=3)
+    upcoming_due_dates = [loan for loan in current_loans if loan.due_date <= upcoming_limit]
 
-    # Vérifier les frais impayés
-    outstanding_amount, outstanding_payments = PaymentService.calculate_outstanding_fees(user)
+    # Frais impayés (montant matérialisé, détail chargé seulement s'il y en a)
+    outstanding_amount = summary.outstanding_amount
+    outstanding_payments = Payment.objects.filter(user=user, status='pending')
 
     context = {
         'current_loans': current_loans,
@@ -256,10 +268,11 @@ def dashboard(request):
         'recent_loans': recent_loans,
         'recent_purchases': recent_purchases,
         'pending_purchases': pending_purchases,
-        'total_spent': total_spent,
-        'total_savings': total_savings,
-        'total_loans_count': total_loans_count,
-        'total_purchases_count': total_purchases_count,
+        'summary': summary,
+        'total_spent': summary.total_spent,
+        'total_savings': summary.total_savings,
+        'total_loans_count': summary.total_loans_count,
+        'total_purchases_count': summary.total_purchases_count,
         'overdue_loans': overdue_loans,
         'ready_reservations': ready_reservations,
         'favorite_books': favorite_books,
@@ -293,7 +306,9 @@ def reserve_book(request, book_id):
             # Import local pour éviter les imports circulaires
             from .reservation_services import ReservationService
 
-            success, result = ReservationService.create_reservation(user, book)
+            success, result = ReservationService.create_reservation(
+                user, book, verdict=EligibilityService.for_request(request, book)
+            )
 
             if success:
                 message = f"Votre réservation pour '{book.title}' a été enregistrée. Vous serez notifié quand le livre sera disponible."
@@ -332,9 +347,9 @@ def reserve_book(request, book_id):
                 return redirect('book_detail', book_id=book.id)
 
     # Vérifications pour l'affichage
-    from .reservation_services import ReservationValidator, ReservationService
+    from .reservation_services import ReservationService
 
-    can_reserve, message = ReservationValidator.can_user_reserve(user, book)
+    can_reserve, message = EligibilityService.for_request(request, book).can_reserve('validator')
     if not can_reserve:
         messages.error(request, message)
         if "disponible" in message:
@@ -467,8 +482,10 @@ def bulk_upload_covers(request):
     return render(request, 'library/bulk_upload_covers.html', context)
 
 
+@cache_anonymous_page()
 def book_gallery(request):
     """Galerie des livres avec leurs couvertures"""
+    PageCacheService.tag(request, PageCacheService.BOOK_LIST_TAG, PageCacheService.GENRES_TAG)
     books = Book.objects.filter(cover_image__isnull=False).exclude(cover_image='').prefetch_related('authors', 'genres')
 
     # Filtrage par genre si spécifié
@@ -480,9 +497,10 @@ def book_gallery(request):
     paginator = Paginator(books, 20)  # 20 livres par page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    PageCacheService.tag(request, *(PageCacheService.book_tag(book.pk) for book in page_obj))
 
     # Liste des genres pour le filtre
-    genres = Genre.objects.annotate(book_count=Count('book')).filter(book_count__gt=0)
+    genres = CatalogFacets.genres_with_counts()
 
     context = {
         'page_obj': page_obj,
@@ -781,19 +799,12 @@ def quick_loan(request):
             duration = LibraryConfig.get_loan_duration(user.category)
             due_date = timezone.now().date() + timedelta(days=duration)
 
-            loan = Loan.objects.create(
-                user=user,
-                book=book,
-                due_date=due_date,
-                notes=notes
-            )
-
-            # Mettre à jour la disponibilité du livre
-            book.available_copies -= 1
-            book.save()
-
-            messages.success(request, f"Emprunt créé: {book.title} pour {user.get_full_name()}")
-            return redirect('admin:library_loan_change', loan.id)
+            # Décrément conditionnel du stock et création de l'emprunt (une transaction)
+            success, result = CirculationService.lend(user, book, due_date, notes=notes)
+            if success:
+                messages.success(request, f"Emprunt créé: {book.title} pour {user.get_full_name()}")
+                return redirect('admin:library_loan_change', result.id)
+            messages.error(request, result)
     else:
         form = QuickLoanForm()
 
@@ -803,6 +814,7 @@ def quick_loan(request):
     return render(request, 'library/quick_loan.html', context)
 
 
+@cache_anonymous_page(timeout=3600)
 def library_conditions(request):
     """Afficher les conditions de la bibliothèque"""
     # Créer un objet avec les paramètres pour le template
@@ -839,17 +851,18 @@ def library_conditions(request):
 def admin_dashboard(request):
     """Tableau de bord administrateur personnalisé"""
 
-    # Statistiques générales
-    total_books = Book.objects.count()
-    total_users = CustomUser.objects.filter(is_active_member=True).count()
-    total_loans = Loan.objects.count()
+    # Statistiques générales (compteurs maintenus)
+    counters = StatusCounterService.snapshot()
+    total_books = counters.total('book')
+    total_users = counters.get('user', 'member')
+    total_loans = counters.total('loan')
 
     # Emprunts actuels
-    current_loans = Loan.objects.filter(status__in=['borrowed', 'overdue']).count()
-    overdue_loans = Loan.objects.filter(status='overdue').count()
+    current_loans = counters.get('loan', 'borrowed', 'overdue')
+    overdue_loans = counters.get('loan', 'overdue')
 
     # Réservations actives
-    active_reservations = Reservation.objects.filter(status='active').count()
+    active_reservations = counters.get('reservation', 'active')
 
     # Plus d'amendes dans le système
     total_unpaid_amount = 0
@@ -882,37 +895,23 @@ def admin_dashboard(request):
     pending_purchases = BookPurchase.objects.filter(status='pending').select_related('user', 'book')[:10]
 
     # Statistiques de livraisons
-    total_deliveries = Delivery.objects.count()
-    pending_deliveries = Delivery.objects.filter(status='pending').count()
-    in_transit_deliveries = Delivery.objects.filter(status__in=['shipped', 'in_transit']).count()
+    total_deliveries = counters.total('delivery')
+    pending_deliveries = counters.get('delivery', 'pending')
+    in_transit_deliveries = counters.get('delivery', 'shipped', 'in_transit')
     overdue_deliveries = Delivery.objects.filter(
         estimated_delivery_date__lt=timezone.now(),
         status__in=['pending', 'preparing', 'shipped', 'in_transit']
     ).count()
 
-    # Statistiques par mois (derniers 6 mois)
-    monthly_stats = []
-    for i in range(6):
-        month_start = (timezone.now().replace(day=1) - timedelta(days=30*i)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-
-        loans_count = Loan.objects.filter(
-            loan_date__gte=month_start,
-            loan_date__lte=month_end
-        ).count()
-
-        purchases_count = BookPurchase.objects.filter(
-            purchase_date__gte=month_start,
-            purchase_date__lte=month_end
-        ).count()
-
-        monthly_stats.append({
-            'month': month_start.strftime('%B %Y'),
-            'loans': loans_count,
-            'purchases': purchases_count
-        })
-
-    monthly_stats.reverse()
+    # Statistiques par mois (6 derniers mois, depuis les agrégats quotidiens)
+    monthly_stats = [
+        {
+            'month': row['month'].strftime('%B %Y'),
+            'loans': row['loans_started'],
+            'purchases': row['purchases'],
+        }
+        for row in DailyActivityService.monthly_totals(months=6, metrics=['loans_started', 'purchases'])
+    ]
 
     context = {
         'total_books': total_books,
@@ -1009,7 +1008,10 @@ def admin_books_management(request):
     elif availability == 'unavailable':
         books = books.filter(available_copies=0)
 
-    if search:
+    isbn13 = normalize_isbn13(search)
+    if isbn13 and books.filter(isbn13=isbn13).exists():
+        books = books.filter(isbn13=isbn13)
+    elif search:
         books = books.filter(
             Q(title__icontains=search) |
             Q(isbn__icontains=search) |
@@ -1036,33 +1038,48 @@ def admin_books_management(request):
     return render(request, 'admin/books_management.html', context)
 
 
+@staff_member_required
+def page_cache_stats(request):
+    """Compteurs du cache de pages anonymes (AJAX)"""
+    if request.method == 'POST' and request.POST.get('reset'):
+        PageCacheService.reset_stats()
+    return JsonResponse(PageCacheService.get_stats())
+
+
 @staff_member_required
 def admin_statistics(request):
     """Statistiques détaillées pour l'administration"""
 
+    counters = StatusCounterService.snapshot()
+    durations = CirculationAnalytics.loan_duration_stats()
+
     # Statistiques des emprunts
     loan_stats = {
-        'total': Loan.objects.count(),
-        'active': Loan.objects.filter(status__in=['borrowed', 'overdue']).count(),
-        'overdue': Loan.objects.filter(status='overdue').count(),
-        'returned': Loan.objects.filter(status='returned').count(),
-        'avg_duration': None,  # Calcul de durée moyenne non supporté avec SQLite
+        'total': counters.total('loan'),
+        'active': counters.get('loan', 'borrowed', 'overdue'),
+        'overdue': counters.get('loan', 'overdue'),
+        'returned': counters.get('loan', 'returned'),
+        'avg_duration': durations['mean_days'],
+        'median_duration': durations['median_days'],
+        'duration_percentiles': durations['percentiles'],
+        'duration_histogram': durations['histogram'],
     }
 
-    # Statistiques des utilisateurs par catégorie
+    # Statistiques des utilisateurs par catégorie (emprunts depuis les agrégats quotidiens)
+    loans_by_category = DailyActivityService.totals_by_category('loans_started')
     user_stats = {}
     for category, label in CustomUser.USER_CATEGORIES:
         user_stats[category] = {
             'label': label,
-            'count': CustomUser.objects.filter(category=category, is_active_member=True).count(),
-            'loans': Loan.objects.filter(user__category=category).count(),
+            'count': counters.get('user', f'member_category:{category}'),
+            'loans': loans_by_category.get(category) or 0,
         }
 
     # Statistiques des livres
     book_stats = {
-        'total': Book.objects.count(),
-        'available': Book.objects.filter(available_copies__gt=0).count(),
-        'unavailable': Book.objects.filter(available_copies=0).count(),
+        'total': counters.total('book'),
+        'available': counters.get('book', 'available'),
+        'unavailable': counters.get('book', 'unavailable'),
         'for_sale': Book.objects.filter(is_for_sale=True).count(),
         'most_popular': Book.objects.annotate(
             loan_count=Count('loans')
@@ -1074,7 +1091,7 @@ def admin_statistics(request):
         'total_purchases': BookPurchase.objects.aggregate(
             total=Sum('total_price')
         )['total'] or 0,
-        'pending_purchases': BookPurchase.objects.filter(status='pending').count(),
+        'pending_purchases': counters.get('purchase', 'pending'),
     }
 
     context = {
@@ -1082,6 +1099,8 @@ def admin_statistics(request):
         'user_stats': user_stats,
         'book_stats': book_stats,
         'financial_stats': financial_stats,
+        'overdue_rates': CirculationAnalytics.overdue_rates(),
+        'wait_stats': CirculationAnalytics.wait_time_stats(),
     }
 
     return render(request, 'admin/statistics.html', context)
@@ -1113,6 +1132,7 @@ def admin_purchases(request):
     if book_search:
         purchases = purchases.filter(book__title__icontains=book_search)
 
+    date_from_obj = date_to_obj = None
     if date_from:
         try:
             from datetime import datetime
@@ -1129,27 +1149,18 @@ def admin_purchases(request):
         except ValueError:
             pass
 
-    # Statistiques pour la page
-    total_purchases = purchases.count()
-    pending_count = purchases.filter(status='pending').count()
-    confirmed_count = purchases.filter(status='confirmed').count()
-    paid_count = purchases.filter(status='paid').count()
-    delivered_count = purchases.filter(status='delivered').count()
-    cancelled_count = purchases.filter(status='cancelled').count()
-
-    # Revenus
-    total_revenue = purchases.filter(
-        status__in=['paid', 'delivered']
-    ).aggregate(total=Sum('total_price'))['total'] or 0
+    # Statistiques et revenus pour la page (une requête, en cache par jeu de filtres)
+    stats = AdminStatsService.purchase_stats(purchases, {
+        'status': status,
+        'user_search': user_search,
+        'book_search': book_search,
+        'date_from': date_from_obj,
+        'date_to': date_to_obj,
+    })
 
-    pending_revenue = purchases.filter(
-        status__in=['pending', 'confirmed']
-    ).aggregate(total=Sum('total_price'))['total'] or 0
-
-    # Pagination
-    paginator = Paginator(purchases, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (ni COUNT(*) complet ni OFFSET sur les grandes tables)
+    paginator = KeysetPaginator(purchases, 25)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'page_obj': page_obj,
@@ -1160,14 +1171,7 @@ def admin_purchases(request):
         'current_book_search': book_search,
         'current_date_from': date_from,
         'current_date_to': date_to,
-        'total_purchases': total_purchases,
-        'pending_count': pending_count,
-        'confirmed_count': confirmed_count,
-        'paid_count': paid_count,
-        'delivered_count': delivered_count,
-        'cancelled_count': cancelled_count,
-        'total_revenue': total_revenue,
-        'pending_revenue': pending_revenue,
+        **stats,
     }
     return render(request, 'admin/purchases_management.html', context)
 
@@ -1521,22 +1525,21 @@ def update_delivery_status(request, delivery_id):
 @staff_member_required
 def admin_deliveries(request):
     """Gestion des livraisons pour l'administration"""
-    deliveries = Delivery.objects.all().select_related('purchase__user', 'purchase__book').order_by('-created_date')
-
-    # Filtres
+    # Filtres (regroupés dans un Q, partagé par la liste et les statistiques)
     status = request.GET.get('status')
     method = request.GET.get('method')
     user_search = request.GET.get('user_search')
     overdue_only = request.GET.get('overdue_only')
 
+    filters = Q()
     if status:
-        deliveries = deliveries.filter(status=status)
+        filters &= Q(status=status)
 
     if method:
-        deliveries = deliveries.filter(delivery_method=method)
+        filters &= Q(delivery_method=method)
 
     if user_search:
-        deliveries = deliveries.filter(
+        filters &= (
             Q(purchase__user__username__icontains=user_search) |
             Q(purchase__user__first_name__icontains=user_search) |
             Q(purchase__user__last_name__icontains=user_search) |
@@ -1545,30 +1548,26 @@ def admin_deliveries(request):
 
     if overdue_only:
         # Filtrer les livraisons en retard
-        deliveries = deliveries.filter(
+        filters &= Q(
             estimated_delivery_date__lt=timezone.now(),
             status__in=['pending', 'preparing', 'shipped', 'in_transit']
         )
 
-    # Statistiques
-    total_deliveries = deliveries.count()
-    pending_count = deliveries.filter(status='pending').count()
-    preparing_count = deliveries.filter(status='preparing').count()
-    shipped_count = deliveries.filter(status='shipped').count()
-    in_transit_count = deliveries.filter(status='in_transit').count()
-    delivered_count = deliveries.filter(status='delivered').count()
-    failed_count = deliveries.filter(status='failed').count()
-
-    # Livraisons en retard
-    overdue_deliveries = Delivery.objects.filter(
-        estimated_delivery_date__lt=timezone.now(),
-        status__in=['pending', 'preparing', 'shipped', 'in_transit']
-    ).count()
+    deliveries = Delivery.objects.filter(filters).select_related(
+        'purchase__user', 'purchase__book'
+    ).order_by('-created_date')
 
-    # Pagination
-    paginator = Paginator(deliveries, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Statistiques et livraisons en retard (une requête, en cache par jeu de filtres)
+    stats = AdminStatsService.delivery_stats(filters, {
+        'status': status,
+        'method': method,
+        'user_search': user_search,
+        'overdue_only': overdue_only,
+    })
+
+    # Pagination par curseur (ni COUNT(*) complet ni OFFSET sur les grandes tables)
+    paginator = KeysetPaginator(deliveries, 25)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'page_obj': page_obj,
@@ -1579,14 +1578,7 @@ def admin_deliveries(request):
         'current_method': method,
         'current_user_search': user_search,
         'current_overdue_only': overdue_only,
-        'total_deliveries': total_deliveries,
-        'pending_count': pending_count,
-        'preparing_count': preparing_count,
-        'shipped_count': shipped_count,
-        'in_transit_count': in_transit_count,
-        'delivered_count': delivered_count,
-        'failed_count': failed_count,
-        'overdue_deliveries': overdue_deliveries,
+        **stats,
     }
     return render(request, 'admin/deliveries_management.html', context)
 
@@ -1595,18 +1587,19 @@ def admin_deliveries(request):
 def super_admin_dashboard(request):
     """Tableau de bord super administrateur"""
 
-    # Statistiques des utilisateurs
-    total_users = CustomUser.objects.count()
-    active_users = CustomUser.objects.filter(is_active=True).count()
-    staff_users = CustomUser.objects.filter(is_staff=True).count()
-    super_admin_users = CustomUser.objects.filter(is_super_admin=True).count()
+    # Statistiques des utilisateurs (compteurs maintenus)
+    counters = StatusCounterService.snapshot()
+    total_users = counters.total('user')
+    active_users = counters.get('user', 'active')
+    staff_users = counters.get('user', 'staff')
+    super_admin_users = counters.get('user', 'super_admin')
 
     # Statistiques par catégorie
     user_categories = {}
     for category, label in CustomUser.USER_CATEGORIES:
         user_categories[category] = {
             'label': label,
-            'count': CustomUser.objects.filter(category=category, is_active=True).count()
+            'count': counters.get('user', f'active_category:{category}')
         }
 
     # Activité récente
@@ -1621,14 +1614,14 @@ def super_admin_dashboard(request):
 
     # Statistiques système
     system_stats = {
-        'total_books': Book.objects.count(),
-        'total_loans': Loan.objects.count(),
-        'total_purchases': BookPurchase.objects.count(),
-        'total_deliveries': Delivery.objects.count(),
-        'active_loans': Loan.objects.filter(status__in=['borrowed', 'overdue']).count(),
-        'overdue_loans': Loan.objects.filter(status='overdue').count(),
-        'pending_purchases': BookPurchase.objects.filter(status='pending').count(),
-        'pending_deliveries': Delivery.objects.filter(status='pending').count(),
+        'total_books': counters.total('book'),
+        'total_loans': counters.total('loan'),
+        'total_purchases': counters.total('purchase'),
+        'total_deliveries': counters.total('delivery'),
+        'active_loans': counters.get('loan', 'borrowed', 'overdue'),
+        'overdue_loans': counters.get('loan', 'overdue'),
+        'pending_purchases': counters.get('purchase', 'pending'),
+        'pending_deliveries': counters.get('delivery', 'pending'),
     }
 
     context = {
@@ -1766,21 +1759,22 @@ def promote_user(request, user_id):
 def system_settings(request):
     """Paramètres système pour super admin"""
 
-    # Statistiques système
+    # Statistiques système (compteurs maintenus)
+    counters = StatusCounterService.snapshot()
     system_info = {
-        'total_users': CustomUser.objects.count(),
-        'active_users': CustomUser.objects.filter(is_active=True).count(),
-        'staff_count': CustomUser.objects.filter(is_staff=True).count(),
-        'super_admin_count': CustomUser.objects.filter(is_super_admin=True).count(),
-        'total_books': Book.objects.count(),
-        'available_books': Book.objects.filter(available_copies__gt=0).count(),
-        'total_loans': Loan.objects.count(),
-        'active_loans': Loan.objects.filter(status__in=['borrowed', 'overdue']).count(),
-        'overdue_loans': Loan.objects.filter(status='overdue').count(),
-        'total_purchases': BookPurchase.objects.count(),
-        'pending_purchases': BookPurchase.objects.filter(status='pending').count(),
-        'total_deliveries': Delivery.objects.count(),
-        'pending_deliveries': Delivery.objects.filter(status='pending').count(),
+        'total_users': counters.total('user'),
+        'active_users': counters.get('user', 'active'),
+        'staff_count': counters.get('user', 'staff'),
+        'super_admin_count': counters.get('user', 'super_admin'),
+        'total_books': counters.total('book'),
+        'available_books': counters.get('book', 'available'),
+        'total_loans': counters.total('loan'),
+        'active_loans': counters.get('loan', 'borrowed', 'overdue'),
+        'overdue_loans': counters.get('loan', 'overdue'),
+        'total_purchases': counters.total('purchase'),
+        'pending_purchases': counters.get('purchase', 'pending'),
+        'total_deliveries': counters.total('delivery'),
+        'pending_deliveries': counters.get('delivery', 'pending'),
     }
 
     # Configuration de la bibliothèque
@@ -1999,10 +1993,9 @@ def admin_payments(request):
     failed_count = payments.filter(status='failed').count()
     cancelled_count = payments.filter(status='cancelled').count()
 
-    # Pagination
-    paginator = Paginator(payments, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (ni COUNT(*) complet ni OFFSET sur les grandes tables)
+    paginator = KeysetPaginator(payments, 25)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'page_obj': page_obj,
@@ -2864,95 +2857,67 @@ def borrow_book(request, book_id):
     book = get_object_or_404(Book, id=book_id)
     user = request.user
 
-    # Vérifications
-    if not book.is_available:
-        messages.error(request, f"Le livre '{book.title}' n'est pas disponible pour l'emprunt.")
-        return redirect('book_detail', book_id=book.id)
-
-    # Vérifier les limites d'emprunt
-    current_loans = Loan.objects.filter(
-        user=user,
-        status__in=['borrowed', 'overdue']
-    ).count()
-
-    max_books = LibraryConfig.get_max_books(user.category)
-    if current_loans >= max_books:
-        messages.error(request, f"Vous avez atteint votre limite d'emprunts ({max_books} livres).")
+    # Vérifications (limite, retards, emprunt en cours, frais impayés : une seule requête)
+    verdict = EligibilityService.for_request(request, book)
+    problems = verdict.borrow_problems()
+    if problems:
+        code, message = problems[0]
+        if code == 'already_borrowed':
+            messages.warning(request, message)
+        else:
+            messages.error(request, message)
+        if code in ('overdue', 'outstanding_fees'):
+            return redirect('my_loans')
         return redirect('book_detail', book_id=book.id)
 
-    # Vérifier s'il y a des emprunts en retard
-    overdue_loans = Loan.objects.filter(
-        user=user,
-        status='overdue'
-    ).count()
-
-    if overdue_loans > 0:
-        messages.error(request, f"Vous avez {overdue_loans} livre(s) en retard. Veuillez les retourner avant d'emprunter de nouveaux livres.")
-        return redirect('my_loans')
-
-    # Vérifier si l'utilisateur a déjà emprunté ce livre
-    existing_loan = Loan.objects.filter(
-        user=user,
-        book=book,
-        status__in=['borrowed', 'overdue']
-    ).first()
-
-    if existing_loan:
-        messages.warning(request, f"Vous avez déjà emprunté '{book.title}'.")
-        return redirect('book_detail', book_id=book.id)
+    current_loans = verdict.current_loans
+    max_books = verdict.max_books
+    outstanding_amount = verdict.outstanding_fees
+    outstanding_payments = Payment.objects.filter(user=user, status='pending')
 
     # Calculer les frais d'emprunt
     loan_fee = PaymentCalculator.calculate_loan_fee(user.category)
     deposit_amount = PaymentCalculator.calculate_deposit_amount(user.category)
 
-    # Vérifier les frais impayés
-    outstanding_amount, outstanding_payments = PaymentService.calculate_outstanding_fees(user)
-    if outstanding_amount > 0:
-        messages.error(request, f"Vous avez {outstanding_amount}€ de frais impayés. Veuillez les régler avant d'emprunter de nouveaux livres.")
-        return redirect('my_loans')
-
     if request.method == 'POST':
         payment_method = request.POST.get('payment_method', 'cash')
 
         try:
-            # Créer l'emprunt
             loan_duration = LibraryConfig.get_loan_duration(user.category)
             due_date = timezone.now().date() + timedelta(days=loan_duration)
 
-            loan = Loan.objects.create(
-                user=user,
-                book=book,
-                due_date=due_date,
-                status='borrowed'
-            )
-
-            # Créer le paiement pour l'emprunt
-            loan_payment = PaymentService.create_loan_payment(
-                loan=loan,
-                payment_method=payment_method,
-                processed_by=request.user if request.user.is_staff else None
-            )
+            # Stock, emprunt et paiements dans une seule transaction
+            with transaction.atomic():
+                # Créer l'emprunt (décrément conditionnel : échoue si le dernier exemplaire vient de partir)
+                success, result = CirculationService.lend(user, book, due_date, status='borrowed')
+                if not success:
+                    messages.error(request, f"Le livre '{book.title}' n'est plus disponible pour l'emprunt.")
+                    return redirect('book_detail', book_id=book.id)
+                loan = result
 
-            # Créer le paiement pour la caution si nécessaire
-            deposit_payment = None
-            if deposit_amount > 0:
-                deposit_payment = PaymentService.create_deposit_payment(
-                    user=user,
+                # Créer le paiement pour l'emprunt
+                loan_payment = PaymentService.create_loan_payment(
                     loan=loan,
                     payment_method=payment_method,
                     processed_by=request.user if request.user.is_staff else None
                 )
 
-            # Si c'est gratuit, marquer comme payé automatiquement
-            if loan_fee == 0:
-                PaymentService.process_payment(loan_payment, processed_by=request.user if request.user.is_staff else None)
+                # Créer le paiement pour la caution si nécessaire
+                deposit_payment = None
+                if deposit_amount > 0:
+                    deposit_payment = PaymentService.create_deposit_payment(
+                        user=user,
+                        loan=loan,
+                        payment_method=payment_method,
+                        processed_by=request.user if request.user.is_staff else None
+                    )
 
-            if deposit_payment and deposit_amount == 0:
-                PaymentService.process_payment(deposit_payment, processed_by=request.user if request.user.is_staff else None)
+                # Si c'est gratuit, marquer comme payé automatiquement
+                if loan_fee == 0:
+                    PaymentService.process_payment(loan_payment, processed_by=request.user if request.user.is_staff else None)
 
-            # Mettre à jour le stock
-            book.available_copies -= 1
-            book.save()
+                if deposit_payment and deposit_amount == 0:
+                    PaymentService.process_payment(deposit_payment, processed_by=request.user if request.user.is_staff else None)
 
             # Message de succès avec informations de paiement
             success_message = f"Livre '{book.title}' emprunté avec succès ! À retourner avant le {due_date.strftime('%d/%m/%Y')}."
@@ -3208,10 +3173,9 @@ def admin_loans(request):
     if overdue_only:
         loans = loans.filter(status='overdue')
 
-    # Pagination
-    paginator = Paginator(loans, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (ni COUNT(*) complet ni OFFSET sur les grandes tables)
+    paginator = KeysetPaginator(loans, 25)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'page_obj': page_obj,
@@ -3255,10 +3219,9 @@ def admin_reservations(request):
             book__available_copies__gt=0
         )
 
-    # Pagination
-    paginator = Paginator(reservations, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination par curseur (ni COUNT(*) complet ni OFFSET sur les grandes tables)
+    paginator = KeysetPaginator(reservations, 25)
+    page_obj = paginator.get_page(request.GET.get('cursor'))
 
     context = {
         'page_obj': page_obj,
@@ -3278,22 +3241,13 @@ def return_book(request, loan_id):
     loan = get_object_or_404(Loan, id=loan_id)
 
     if request.method == 'POST':
-        if loan.status in ['borrowed', 'overdue', 'renewed']:
-            loan.status = 'returned'
-            loan.return_date = timezone.now()
-            loan.save()
-
-            # Remettre le livre en stock
-            loan.book.available_copies += 1
-            loan.book.save()
-
-            # Traiter les réservations en attente
-            from .reservation_services import ReservationService
-            reservation_message = ReservationService.handle_book_return(loan.book)
+        # Retour, remise en stock et promotion des réservations dans une seule transaction
+        success, reservation_message = CirculationService.return_loan(loan)
 
+        if success:
             messages.success(request, f"Livre '{loan.book.title}' retourné par {loan.user.get_full_name()}. {reservation_message}")
         else:
-            messages.error(request, "Ce livre a déjà été retourné.")
+            messages.error(request, reservation_message)
 
     return redirect('admin_loans')
 
@@ -3434,6 +3388,7 @@ def add_favorite_note(request, favorite_id):
 
 # ===== VUES AJAX POUR LES INFORMATIONS DE RÉSERVATION =====
 
+@condition(etag_func=book_etag, last_modified_func=book_last_modified)
 def get_book_queue_info(request, book_id):
     """Obtenir les informations de file d'attente pour un livre (AJAX)"""
     book = get_object_or_404(Book, id=book_id)